@@ -88,6 +88,14 @@ def create_app():
     login_manager.login_message = 'Inicie sesión para acceder a esta página'
     login_manager.login_message_category = 'warning'
 
+    # Métricas por request: consultas SQL, Server-Timing y /metrics
+    from app.instrumentation import init_instrumentacion
+    init_instrumentacion(app)
+
+    # Resúmenes diarios de ventas, abonos y movimientos para los reportes
+    from app.resumenes import init_resumenes
+    init_resumenes()
+
     # Ruta para servir el favicon.ico desde la carpeta static
     @app.route('/favicon.ico')
     def favicon():
@@ -176,5 +184,17 @@ def create_app():
                 db.session.commit()
         except Exception as e:
             print(f"Error inicializando DB: {e}")
+
+        # Resúmenes diarios recién creados en una base con datos: llenarlos
+        # antes de que los reportes y el dashboard los lean en cero
+        try:
+            from app.resumenes import poblar_resumenes_vacios
+            filas = poblar_resumenes_vacios()
+            db.session.commit()
+            if filas:
+                app.logger.info(f"Resúmenes diarios poblados al iniciar ({filas} filas)")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning(f"No se pudieron poblar los resúmenes diarios: {e}")
     
     return app
@@ -9,3 +9,5 @@ from app.api import sync_data
 from app.api import clientes
 from app.api import ventas
 from app.api import abonos
+from app.api import sync
+from app.api import compression
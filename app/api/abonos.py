@@ -1,8 +1,11 @@
 # app/api/abonos.py
 from flask import jsonify, request, current_app
 from app import db
-from app.models import Abono, Venta, Caja, MovimientoCaja, Usuario
+from app.models import Abono, Venta, Cliente, Caja, MovimientoCaja, Usuario
 from app.api import api
+from app.api.etag import leer_since, version_coleccion, no_modificado, respuesta_no_modificada, respuesta_coleccion
+from app.api.paginacion import leer_paginacion, leer_campos, aplicar_proyeccion, paginar, serializar
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 import uuid
 
@@ -40,122 +43,77 @@ def require_api_auth(f):
 
     return decorated_function
 
+# Campos disponibles en GET /abonos (?fields=)
+COLUMNAS_ABONO = {
+    'id': (Abono.id, lambda a: a.id),
+    'uuid': (Abono.uuid, lambda a: a.uuid),
+    'venta_id': (Abono.venta_id, lambda a: a.venta_id),
+    'credito_id': (Abono.credito_id, lambda a: a.credito_id),
+    'monto': (Abono.monto, lambda a: float(a.monto)),
+    'cobrador_id': (Abono.cobrador_id, lambda a: a.cobrador_id),
+    'caja_id': (Abono.caja_id, lambda a: a.caja_id),
+    'notas': (Abono.notas, lambda a: a.notas or ''),
+    'fecha': (Abono.fecha, lambda a: a.fecha.isoformat() if a.fecha else datetime.now().isoformat()),
+    'updated_at': (Abono.updated_at, lambda a: a.updated_at.isoformat() if a.updated_at else None)
+}
+
+RELACIONES_ABONO = {
+    'cliente_id': (
+        joinedload(Abono.venta).load_only(Venta.cliente_id),
+        lambda a: a.venta.cliente_id if a.venta else None
+    ),
+    'cliente_nombre': (
+        joinedload(Abono.venta).load_only(Venta.cliente_id)
+            .joinedload(Venta.cliente).load_only(Cliente.nombre),
+        lambda a: a.venta.cliente.nombre if a.venta and a.venta.cliente else None
+    ),
+    'cobrador_nombre': (
+        joinedload(Abono.cobrador).load_only(Usuario.nombre),
+        lambda a: a.cobrador.nombre if a.cobrador else None
+    ),
+    'caja_nombre': (
+        joinedload(Abono.caja).load_only(Caja.nombre),
+        lambda a: a.caja.nombre if a.caja else None
+    )
+}
+
+CAMPOS_ABONO_DEFECTO = ('id', 'uuid', 'venta_id', 'credito_id', 'monto', 'cobrador_id',
+                        'caja_id', 'notas', 'fecha')
+
 @api.route('/abonos', methods=['GET'])
 @require_api_auth
 def get_abonos(dispositivo=None):
     """Obtener lista de abonos para sincronización"""
     try:
-        abonos = Abono.query.all()
-        
-        abonos_data = []
-        for abono in abonos:
-            abonos_data.append({
-                'id': abono.id,
-                'uuid': getattr(abono, 'uuid', str(uuid.uuid4())),
-                'venta_id': abono.venta_id,
-                'credito_id': abono.credito_id,
-                'monto': float(abono.monto),
-                'cobrador_id': abono.cobrador_id,
-                'caja_id': abono.caja_id,
-                'notas': abono.notas or '',
-                'fecha': abono.fecha.isoformat() if abono.fecha else datetime.now().isoformat()
-            })
+        since, error = leer_since()
+        if error:
+            return error
+
+        limit, after_id, error = leer_paginacion()
+        if error:
+            return error
+
+        campos, error = leer_campos(COLUMNAS_ABONO, RELACIONES_ABONO, CAMPOS_ABONO_DEFECTO)
+        if error:
+            return error
+
+        # Versión de la colección: si el cliente ya la tiene, 304 sin tocar las filas
+        etag, total, watermark = version_coleccion(Abono)
+        if no_modificado(etag):
+            return respuesta_no_modificada(etag)
+
+        query = aplicar_proyeccion(Abono.query, campos, COLUMNAS_ABONO, RELACIONES_ABONO)
+        if since:
+            # Delta: solo filas modificadas después de la marca del cliente
+            query = query.filter(Abono.updated_at > since)
+
+        abonos, has_more, next_after_id = paginar(query, Abono, limit, after_id)
+        abonos_data = serializar(abonos, campos, COLUMNAS_ABONO, RELACIONES_ABONO)
 
-        return jsonify({
-            'success': True,
-            'data': abonos_data,
-            'count': len(abonos_data)
-        }), 200
+        return respuesta_coleccion(abonos_data, etag, total, watermark, has_more, next_after_id), 200
 
     except Exception as e:
         current_app.logger.error(f"Error obteniendo abonos: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@api.route('/abonos', methods=['POST'])
-@require_api_auth
-def crear_abono(dispositivo=None):
-    """Crear abono desde sincronización offline"""
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'No se recibieron datos'}), 400
-            
-        # Buscar caja por defecto si no se especifica
-        caja_id = data.get('caja_id')
-        if not caja_id:
-            caja_default = Caja.query.first()
-            if not caja_default:
-                caja_default = Caja(
-                    nombre='Caja Principal',
-                    tipo='efectivo',
-                    saldo_inicial=0,
-                    saldo_actual=0
-                )
-                db.session.add(caja_default)
-                db.session.flush()
-            caja_id = caja_default.id
-            
-        # Crear nuevo abono
-        nuevo_abono = Abono(
-            venta_id=int(data.get('venta_id')) if data.get('venta_id') else None,
-            credito_id=int(data.get('credito_id')) if data.get('credito_id') else None,
-            monto=float(data.get('monto')),
-            cobrador_id=dispositivo.usuario_id,
-            caja_id=caja_id,
-            notas=data.get('notas', '')
-        )
-
-        # Asegurar que tenga UUID si no lo tiene
-        if not hasattr(nuevo_abono, 'uuid') or not nuevo_abono.uuid:
-            nuevo_abono.uuid = str(uuid.uuid4())
-
-        db.session.add(nuevo_abono)
-        db.session.flush()
-
-        # Actualizar saldo de venta si es abono a venta
-        if nuevo_abono.venta_id:
-            venta = Venta.query.get(nuevo_abono.venta_id)
-            if venta:
-                venta.saldo_pendiente -= nuevo_abono.monto
-                if venta.saldo_pendiente <= 0:
-                    venta.estado = 'pagado'
-                    venta.saldo_pendiente = 0
-
-        # Registrar movimiento en caja
-        movimiento = MovimientoCaja(
-            caja_id=caja_id,
-            tipo='entrada',
-            monto=nuevo_abono.monto,
-            descripcion=f'Abono #{nuevo_abono.id}',
-            abono_id=nuevo_abono.id
-        )
-        db.session.add(movimiento)
-        
-        # Actualizar saldo de caja
-        caja = Caja.query.get(caja_id)
-        if caja:
-            caja.saldo_actual += nuevo_abono.monto
-
-        db.session.commit()
-
-        current_app.logger.info(f"Abono creado vía API: #{nuevo_abono.id}")
-
-        return jsonify({
-            'success': True,
-            'id': nuevo_abono.id,
-            'message': f'Abono de ${float(nuevo_abono.monto):,.0f} creado exitosamente',
-            'action': 'created',
-            'data': {
-                'id': nuevo_abono.id,
-                'monto': float(nuevo_abono.monto),
-                'venta_id': nuevo_abono.venta_id,
-                'uuid': nuevo_abono.uuid
-            }
-        }), 201
-
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error creando abono vía API: {str(e)}")
-        import traceback
-        current_app.logger.error(f"Traceback: {traceback.format_exc()}")
-        return jsonify({'error': f'Error creando abono: {str(e)}'}), 500
+# POST /abonos lo atiende sync_data.sync_crear_abono
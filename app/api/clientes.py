@@ -3,7 +3,8 @@ from flask import jsonify, request, current_app
 from app import db
 from app.models import Cliente, Usuario
 from app.api import api
-from datetime import datetime
+from app.api.etag import leer_since, version_coleccion, no_modificado, respuesta_no_modificada, respuesta_coleccion
+from app.api.paginacion import leer_paginacion, leer_campos, aplicar_proyeccion, paginar, serializar
 import uuid
 
 # Token simple para testing
@@ -40,31 +41,55 @@ def require_api_auth(f):
 
     return decorated_function
 
+# Campos disponibles en GET /clientes (?fields=)
+COLUMNAS_CLIENTE = {
+    'id': (Cliente.id, lambda c: c.id),
+    'uuid': (Cliente.uuid, lambda c: c.uuid),
+    'nombre': (Cliente.nombre, lambda c: c.nombre),
+    'cedula': (Cliente.cedula, lambda c: c.cedula),
+    'telefono': (Cliente.telefono, lambda c: c.telefono or ''),
+    'email': (Cliente.email, lambda c: c.email or ''),
+    'direccion': (Cliente.direccion, lambda c: c.direccion or ''),
+    'fecha_registro': (Cliente.fecha_registro, lambda c: c.fecha_registro.isoformat() if c.fecha_registro else None),
+    'updated_at': (Cliente.updated_at, lambda c: c.updated_at.isoformat() if c.updated_at else None)
+}
+
+RELACIONES_CLIENTE = {}
+
+CAMPOS_CLIENTE_DEFECTO = ('id', 'uuid', 'nombre', 'cedula', 'telefono', 'email',
+                          'direccion', 'fecha_registro')
+
 @api.route('/clientes', methods=['GET'])
 @require_api_auth
 def get_clientes(dispositivo=None):
     """Obtener lista de clientes para sincronización"""
     try:
-        clientes = Cliente.query.all()
-        
-        clientes_data = []
-        for cliente in clientes:
-            clientes_data.append({
-                'id': cliente.id,
-                'uuid': getattr(cliente, 'uuid', str(uuid.uuid4())),
-                'nombre': cliente.nombre,
-                'cedula': cliente.cedula,
-                'telefono': cliente.telefono or '',
-                'email': cliente.email or '',
-                'direccion': cliente.direccion or '',
-                'fecha_registro': cliente.fecha_registro.isoformat() if hasattr(cliente, 'fecha_registro') and cliente.fecha_registro else datetime.now().isoformat()
-            })
+        since, error = leer_since()
+        if error:
+            return error
 
-        return jsonify({
-            'success': True,
-            'data': clientes_data,
-            'count': len(clientes_data)
-        }), 200
+        limit, after_id, error = leer_paginacion()
+        if error:
+            return error
+
+        campos, error = leer_campos(COLUMNAS_CLIENTE, RELACIONES_CLIENTE, CAMPOS_CLIENTE_DEFECTO)
+        if error:
+            return error
+
+        # Versión de la colección: si el cliente ya la tiene, 304 sin tocar las filas
+        etag, total, watermark = version_coleccion(Cliente)
+        if no_modificado(etag):
+            return respuesta_no_modificada(etag)
+
+        query = aplicar_proyeccion(Cliente.query, campos, COLUMNAS_CLIENTE, RELACIONES_CLIENTE)
+        if since:
+            # Delta: solo filas modificadas después de la marca del cliente
+            query = query.filter(Cliente.updated_at > since)
+
+        clientes, has_more, next_after_id = paginar(query, Cliente, limit, after_id)
+        clientes_data = serializar(clientes, campos, COLUMNAS_CLIENTE, RELACIONES_CLIENTE)
+
+        return respuesta_coleccion(clientes_data, etag, total, watermark, has_more, next_after_id), 200
 
     except Exception as e:
         current_app.logger.error(f"Error obteniendo clientes: {str(e)}")
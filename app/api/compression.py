@@ -0,0 +1,133 @@
+# app/api/compression.py
+"""
+Compresión transparente para el blueprint /api/v1
+
+- Respuestas: negociación por Accept-Encoding (br si está instalado brotli, si no gzip)
+  a partir de API_COMPRESSION_MIN_SIZE bytes. Las respuestas en streaming
+  (NDJSON de sync/pull) se comprimen por bloques.
+- Peticiones: acepta cuerpos con Content-Encoding: gzip (p. ej. sync/push).
+"""
+from flask import request, current_app, jsonify
+from app.api import api
+from io import BytesIO
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS_SOPORTADOS = ('br', 'gzip') if brotli else ('gzip',)
+
+# Calidad 5 de brotli cuesta en CPU lo mismo que gzip 6 y comprime más
+BROTLI_QUALITY = 5
+
+# Tipos de contenido que vale la pena comprimir
+TIPOS_COMPRIMIBLES = (
+    'application/json',
+    'application/x-ndjson',
+    'text/'
+)
+
+def comprimir(datos, encoding, nivel=6):
+    """Comprime bytes con el encoding indicado ('gzip' o 'br')"""
+    if encoding == 'br':
+        return brotli.compress(datos, quality=BROTLI_QUALITY)
+    return gzip.compress(datos, compresslevel=nivel)
+
+def descomprimir_gzip(datos, max_bytes=None):
+    """Descomprime gzip limitando el tamaño resultante (protección contra zip bombs)"""
+    descompresor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if max_bytes is None:
+        return descompresor.decompress(datos) + descompresor.flush()
+
+    resultado = descompresor.decompress(datos, max_bytes + 1)
+    if len(resultado) > max_bytes or descompresor.unconsumed_tail:
+        raise ValueError('Cuerpo descomprimido demasiado grande')
+    return resultado + descompresor.flush()
+
+def _comprimir_stream(iterable, encoding, nivel):
+    """Comprime un iterable de bloques sin acumularlo en memoria"""
+    if encoding == 'br':
+        compresor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for bloque in iterable:
+            if isinstance(bloque, str):
+                bloque = bloque.encode('utf-8')
+            salida = compresor.process(bloque) + compresor.flush()
+            if salida:
+                yield salida
+        yield compresor.finish()
+    else:
+        compresor = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for bloque in iterable:
+            if isinstance(bloque, str):
+                bloque = bloque.encode('utf-8')
+            # Z_SYNC_FLUSH para que el cliente pueda procesar cada bloque al llegar
+            salida = compresor.compress(bloque) + compresor.flush(zlib.Z_SYNC_FLUSH)
+            if salida:
+                yield salida
+        yield compresor.flush()
+
+def _encoding_aceptado():
+    """Mejor encoding soportado según Accept-Encoding, o None"""
+    return request.accept_encodings.best_match(ENCODINGS_SOPORTADOS)
+
+@api.before_request
+def descomprimir_peticion():
+    """Reemplaza el cuerpo de peticiones con Content-Encoding: gzip por su versión plana"""
+    content_encoding = request.headers.get('Content-Encoding', '').strip().lower()
+    if not content_encoding or content_encoding == 'identity':
+        return None
+
+    if content_encoding != 'gzip':
+        return jsonify({'error': f'Content-Encoding {content_encoding} no soportado'}), 415
+
+    try:
+        datos = descomprimir_gzip(
+            request.get_data(cache=False),
+            current_app.config.get('MAX_CONTENT_LENGTH')
+        )
+    except (OSError, ValueError, zlib.error) as e:
+        current_app.logger.warning(f"Cuerpo gzip inválido en {request.path}: {str(e)}")
+        return jsonify({'error': 'Cuerpo comprimido inválido'}), 400
+
+    # Sustituir el stream de entrada antes de que Flask lea el JSON/form
+    request.environ['wsgi.input'] = BytesIO(datos)
+    request.environ['CONTENT_LENGTH'] = str(len(datos))
+    request.environ.pop('HTTP_CONTENT_ENCODING', None)
+    request.__dict__.pop('stream', None)
+    return None
+
+@api.after_request
+def comprimir_respuesta(response):
+    """Comprime la respuesta si el cliente lo acepta y supera el umbral"""
+    if (request.method == 'HEAD'
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or not response.mimetype.startswith(TIPOS_COMPRIMIBLES)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encoding = _encoding_aceptado()
+    if not encoding:
+        return response
+
+    nivel = current_app.config.get('API_COMPRESSION_LEVEL', 6)
+
+    if response.is_streamed:
+        response.response = _comprimir_stream(response.response, encoding, nivel)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    datos = response.get_data()
+    if len(datos) < current_app.config.get('API_COMPRESSION_MIN_SIZE', 1024):
+        return response
+
+    response.set_data(comprimir(datos, encoding, nivel))
+    response.headers['Content-Encoding'] = encoding
+    return response
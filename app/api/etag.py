@@ -0,0 +1,94 @@
+# app/api/etag.py
+"""
+Versionado barato de colecciones para los endpoints de catálogo (GET /clientes,
+/ventas, /abonos): ETag / If-None-Match y deltas con ?since=
+"""
+from flask import request, jsonify, make_response
+from app import db
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+import hashlib
+
+def leer_since():
+    """
+    Lee el parámetro ?since= (ISO 8601). Retorna (datetime UTC sin zona o None, error)
+    donde error es una respuesta 400 lista para retornar.
+    """
+    since = request.args.get('since')
+    if not since:
+        return None, None
+    try:
+        dt = datetime.fromisoformat(since.replace('Z', '+00:00'))
+    except ValueError:
+        return None, (jsonify({'error': 'Parámetro since inválido'}), 400)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt, None
+
+def firma_consulta():
+    """
+    Huella de los parámetros de la consulta (?since=, ?fields=, ?limit=,
+    ?after_id=...) normalizados: ordenados por nombre, sin valores vacíos y con
+    los campos de ?fields= ordenados. Cadena vacía si no hay parámetros.
+    """
+    parametros = []
+    for clave, valor in request.args.items(multi=True):
+        valor = valor.strip()
+        if clave == 'fields':
+            valor = ','.join(sorted({campo.strip() for campo in valor.split(',') if campo.strip()}))
+        if valor:
+            parametros.append((clave, valor))
+    if not parametros:
+        return ''
+    return hashlib.sha1(urlencode(sorted(parametros)).encode('utf-8')).hexdigest()[:16]
+
+def version_coleccion(modelo, query=None):
+    """
+    Calcula la versión de una colección con una sola consulta agregada:
+    count, max(updated_at) y max(sync_version). Retorna (etag, count, max_updated_at).
+    El ETag incluye la firma de los parámetros de la consulta, porque cada
+    combinación (delta, proyección, página) es una representación distinta.
+    """
+    query = query if query is not None else db.session.query(modelo)
+    count, max_updated_at, max_version = query.with_entities(
+        db.func.count(modelo.id),
+        db.func.max(modelo.updated_at),
+        db.func.max(modelo.sync_version)
+    ).one()
+
+    marca = max_updated_at.isoformat() if max_updated_at else '0'
+    etag = f"{modelo.__tablename__}-{count}-{marca}-{max_version or 0}"
+    firma = firma_consulta()
+    if firma:
+        etag = f"{etag}-{firma}"
+    return etag, count, max_updated_at
+
+def no_modificado(etag):
+    """Indica si el cliente ya tiene esta versión (If-None-Match)"""
+    return request.if_none_match.contains_weak(etag)
+
+def respuesta_no_modificada(etag):
+    """Respuesta 304 con el ETag vigente"""
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def respuesta_coleccion(data, etag, count_total, watermark, has_more=False, next_after_id=None):
+    """
+    Respuesta JSON de una colección con su ETag. 'watermark' es el valor a enviar
+    como ?since= en la siguiente consulta (una vez recorridas todas las páginas);
+    'total' permite al cliente detectar eliminaciones (si su copia local difiere
+    debe pedir la colección completa).
+    """
+    response = jsonify({
+        'success': True,
+        'data': data,
+        'count': len(data),
+        'total': count_total,
+        'has_more': has_more,
+        'next_after_id': next_after_id,
+        'watermark': watermark.isoformat() if watermark else None
+    })
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
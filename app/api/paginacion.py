@@ -0,0 +1,96 @@
+# app/api/paginacion.py
+"""
+Paginación por keyset (limit / after_id) y proyección de campos (fields=) para
+los listados de la API. Cada endpoint declara sus campos:
+
+    COLUMNAS   = {'nombre': (Modelo.columna, serializador)}
+    RELACIONES = {'nombre': (opcion_de_carga, serializador)}
+
+Solo se cargan las columnas pedidas y las relaciones pedidas se cargan en la
+misma consulta (o en una consulta extra por página), nunca una por fila.
+
+La paginación es opcional: sin ?limit= ni ?after_id= la respuesta trae la
+colección completa (has_more = false), como esperan los clientes anteriores.
+Con cualquiera de los dos se pagina (API_PAGE_SIZE por defecto, como máximo
+API_MAX_PAGE_SIZE) y el cliente sigue pidiendo con after_id = next_after_id
+mientras has_more sea true.
+"""
+from flask import request, current_app, jsonify
+from sqlalchemy.orm import load_only
+
+def leer_paginacion():
+    """
+    Lee ?limit= y ?after_id=. Retorna (limit, after_id, error) donde error es
+    una respuesta 400 lista para retornar; limit es None si no se pidió paginar.
+    """
+    if 'limit' not in request.args and 'after_id' not in request.args:
+        return None, 0, None
+
+    por_defecto = current_app.config.get('API_PAGE_SIZE', 500)
+    maximo = current_app.config.get('API_MAX_PAGE_SIZE', 1000)
+    try:
+        limit = int(request.args.get('limit', por_defecto))
+        after_id = int(request.args.get('after_id', 0))
+    except ValueError:
+        return None, None, (jsonify({'error': 'Parámetros limit/after_id inválidos'}), 400)
+
+    if limit < 1 or after_id < 0:
+        return None, None, (jsonify({'error': 'Parámetros limit/after_id inválidos'}), 400)
+
+    return min(limit, maximo), after_id, None
+
+def leer_campos(columnas, relaciones, por_defecto):
+    """
+    Lee ?fields=a,b,c. Sin el parámetro retorna los campos por defecto.
+    'id' siempre se incluye porque es el cursor. Retorna (campos, error).
+    """
+    fields = request.args.get('fields')
+    if not fields:
+        return list(por_defecto), None
+
+    campos = []
+    for campo in fields.split(','):
+        campo = campo.strip()
+        if campo and campo not in campos:
+            campos.append(campo)
+
+    desconocidos = [c for c in campos if c not in columnas and c not in relaciones]
+    if desconocidos:
+        return None, (jsonify({
+            'error': f"Campos desconocidos: {', '.join(desconocidos)}",
+            'disponibles': list(columnas) + list(relaciones)
+        }), 400)
+
+    if 'id' not in campos:
+        campos.insert(0, 'id')
+    return campos, None
+
+def aplicar_proyeccion(query, campos, columnas, relaciones):
+    """Restringe el SELECT a las columnas pedidas y agrega el eager loading necesario"""
+    atributos = [columnas[c][0] for c in campos if c in columnas]
+    opciones = [load_only(*atributos)]
+    opciones.extend(relaciones[c][0] for c in campos if c in relaciones)
+    return query.options(*opciones)
+
+def paginar(query, modelo, limit, after_id):
+    """
+    Keyset sobre la clave primaria: WHERE id > after_id ORDER BY id LIMIT limit+1.
+    Con limit None retorna todas las filas. Retorna (filas, has_more, next_after_id).
+    """
+    query = query.filter(modelo.id > after_id).order_by(modelo.id)
+    if limit is None:
+        return query.all(), False, None
+
+    filas = query.limit(limit + 1).all()
+    has_more = len(filas) > limit
+    filas = filas[:limit]
+    next_after_id = filas[-1].id if has_more else None
+    return filas, has_more, next_after_id
+
+def serializar(filas, campos, columnas, relaciones):
+    """Convierte las filas en diccionarios con solo los campos pedidos"""
+    serializadores = [
+        (c, columnas[c][1] if c in columnas else relaciones[c][1])
+        for c in campos
+    ]
+    return [{c: serializador(fila) for c, serializador in serializadores} for fila in filas]
@@ -1,13 +1,14 @@
 """
 Endpoints de sincronización offline-first
 """
-from flask import jsonify, request, current_app
+from flask import jsonify, request, current_app, Response, stream_with_context
 from app import db
 from app.models import *
 from app.models_sync import DispositivoMovil, ChangeLog, SyncSession, ConflictoSync
 from app.api import api
 from app.api.auth import hash_token
-from datetime import datetime
+from app.saldos import recalcular_saldos_clientes, recalcular_saldos_creditos
+from datetime import datetime, timezone
 import json
 import uuid
 from functools import wraps
@@ -43,12 +44,31 @@ def require_api_auth(f):
 @require_api_auth
 def sync_pull(dispositivo=None):
     """
-    Obtiene cambios desde el servidor (delta sync)
-    Cliente envía: { "last_sync": "2024-01-01T00:00:00Z" }
+    Obtiene cambios desde el servidor (delta sync paginado)
+    Cliente envía: { "last_sync": "2024-01-01T00:00:00Z", "cursor": "1234", "limit": 500 }
+    Mientras "has_more" sea true, el cliente debe repetir la llamada con "cursor" = "next_cursor"
+    Con "Accept: application/x-ndjson" la respuesta se transmite en streaming (ver _sync_pull_ndjson)
     """
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         last_sync = data.get('last_sync')
+        cursor = data.get('cursor')
+        
+        # Tamaño de página elegido por el cliente, limitado por SYNC_MAX_BATCH_SIZE
+        max_batch = current_app.config.get('SYNC_MAX_BATCH_SIZE', 1000)
+        try:
+            limite = int(data.get('limit') or max_batch)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Parámetro limit inválido'}), 400
+        limite = max(1, min(limite, max_batch))
+        
+        # El cursor es el último ChangeLog.id entregado (secuencia del servidor)
+        cursor_id = None
+        if cursor is not None:
+            try:
+                cursor_id = int(cursor)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Cursor inválido'}), 400
         
         # Crear sesión de sincronización
         session = SyncSession(
@@ -58,20 +78,36 @@ def sync_pull(dispositivo=None):
         db.session.add(session)
         db.session.commit()
         
-        # Determinar fecha de última sincronización
-        if last_sync:
-            try:
-                last_sync_dt = datetime.fromisoformat(last_sync.replace('Z', '+00:00'))
-            except:
-                last_sync_dt = dispositivo.ultima_sincronizacion
-        else:
-            last_sync_dt = dispositivo.ultima_sincronizacion or datetime(2000, 1, 1)
+        # No enviar sus propios cambios (los cambios del servidor tienen dispositivo_id NULL)
+        # Los cambios remotos en conflicto quedan pendientes hasta resolverse
+        query = ChangeLog.query.filter(
+            db.or_(ChangeLog.dispositivo_id.is_(None), ChangeLog.dispositivo_id != dispositivo.id),
+            ChangeLog.conflicto.isnot(True)
+        )
         
-        # Obtener cambios desde última sincronización
-        cambios = ChangeLog.query.filter(
-            ChangeLog.timestamp > last_sync_dt,
-            ChangeLog.dispositivo_id != dispositivo.id  # No enviar sus propios cambios
-        ).order_by(ChangeLog.timestamp).limit(1000).all()  # Limitar para evitar sobrecarga
+        if cursor_id is not None:
+            # Continuar desde la última página entregada (keyset sobre la PK)
+            query = query.filter(ChangeLog.id > cursor_id)
+        else:
+            # Primera página: determinar fecha de última sincronización
+            if last_sync:
+                try:
+                    last_sync_dt = datetime.fromisoformat(last_sync.replace('Z', '+00:00'))
+                except:
+                    last_sync_dt = dispositivo.ultima_sincronizacion
+            else:
+                last_sync_dt = dispositivo.ultima_sincronizacion or datetime(2000, 1, 1)
+            query = query.filter(ChangeLog.timestamp > last_sync_dt)
+        
+        if acepta_ndjson():
+            # En streaming solo se pagina si el cliente lo pide explícitamente
+            limite_stream = limite if data.get('limit') else None
+            return _sync_pull_ndjson(query, limite_stream, cursor_id, session, dispositivo)
+        
+        # Pedir una fila extra para saber si quedan más cambios sin contarlos
+        cambios = query.order_by(ChangeLog.id).limit(limite + 1).all()
+        has_more = len(cambios) > limite
+        cambios = cambios[:limite]
         
         # Serializar cambios
         cambios_serializados = []
@@ -86,13 +122,17 @@ def sync_pull(dispositivo=None):
                 'version': cambio.version
             })
         
+        next_cursor = str(cambios[-1].id) if cambios else (str(cursor_id) if cursor_id is not None else None)
+        
         # Actualizar sesión
         session.cambios_enviados = len(cambios_serializados)
         session.fin = datetime.utcnow()
         session.estado = 'completado'
         
-        # Actualizar última sincronización del dispositivo
-        dispositivo.ultima_sincronizacion = datetime.utcnow()
+        # Solo mover la última sincronización cuando el dispositivo vació la cola,
+        # de lo contrario un reintento sin cursor perdería las páginas restantes
+        if not has_more:
+            dispositivo.ultima_sincronizacion = datetime.utcnow()
         
         db.session.commit()
         
@@ -101,7 +141,8 @@ def sync_pull(dispositivo=None):
             'session_id': session.uuid,
             'changes': cambios_serializados,
             'sync_timestamp': datetime.utcnow().isoformat(),
-            'has_more': len(cambios) == 1000  # Indica si hay más cambios
+            'next_cursor': next_cursor,
+            'has_more': has_more
         }), 200
         
     except Exception as e:
@@ -112,114 +153,148 @@ def sync_pull(dispositivo=None):
             db.session.commit()
         return jsonify({'error': 'Error en sincronización'}), 500
 
-@api.route('/sync/push', methods=['POST'])
-@require_api_auth
-def sync_push(dispositivo=None):
+NDJSON_MIMETYPE = 'application/x-ndjson'
+NDJSON_CHUNK_ROWS = 500
+
+def acepta_ndjson():
+    """Indica si el cliente pidió la respuesta como NDJSON"""
+    return NDJSON_MIMETYPE in request.headers.get('Accept', '')
+
+def _sync_pull_ndjson(query, limite, cursor_id, session, dispositivo):
     """
-    Recibe cambios desde el cliente
-    Cliente envía: { "changes": [...], "device_timestamp": "..." }
+    Transmite los cambios como NDJSON: una línea por cambio y una línea final
+    {"type": "end", ...} con next_cursor/has_more. datos_json se copia tal cual
+    desde la base de datos, sin json.loads/json.dumps por fila.
     """
-    try:
-        data = request.get_json()
-        changes = data.get('changes', [])
-        device_timestamp = data.get('device_timestamp')
-        
-        # Crear sesión de sincronización
-        session = SyncSession(
-            dispositivo_id=dispositivo.id,
-            estado='en_progreso'
-        )
-        db.session.add(session)
-        db.session.commit()
-        
-        cambios_aplicados = []
-        conflictos_detectados = []
-        
-        for change in changes:
-            try:
-                # Verificar si el cambio ya existe (idempotencia)
-                cambio_existente = ChangeLog.query.filter_by(
-                    uuid=change.get('uuid')
-                ).first()
-                
-                if cambio_existente:
-                    cambios_aplicados.append({
-                        'uuid': change['uuid'],
-                        'status': 'already_exists'
-                    })
-                    continue
-                
-                # Aplicar cambio según la operación
-                resultado = aplicar_cambio(change, dispositivo, session)
+    columnas = query.with_entities(
+        ChangeLog.id,
+        ChangeLog.uuid,
+        ChangeLog.tabla,
+        ChangeLog.registro_uuid,
+        ChangeLog.operacion,
+        ChangeLog.datos_json,
+        ChangeLog.timestamp,
+        ChangeLog.version
+    ).order_by(ChangeLog.id)
+    
+    if limite is not None:
+        columnas = columnas.limit(limite + 1)
+    
+    def generar():
+        enviados = 0
+        ultimo_id = cursor_id  # último id ya transmitido al cliente
+        ultimo_id_buffer = cursor_id
+        has_more = False
+        buffer = []
+        
+        try:
+            # Cursor del lado del servidor: solo NDJSON_CHUNK_ROWS filas en memoria
+            for fila in columnas.yield_per(NDJSON_CHUNK_ROWS):
+                if limite is not None and enviados >= limite:
+                    has_more = True
+                    break
                 
-                if resultado['status'] == 'conflict':
-                    conflictos_detectados.append(resultado)
-                else:
-                    cambios_aplicados.append(resultado)
-                    
-            except Exception as e:
-                current_app.logger.error(f"Error aplicando cambio {change.get('uuid')}: {str(e)}")
-                cambios_aplicados.append({
-                    'uuid': change.get('uuid'),
-                    'status': 'error',
-                    'error': str(e)
+                cabecera = json.dumps({
+                    'uuid': fila.uuid,
+                    'tabla': fila.tabla,
+                    'registro_uuid': fila.registro_uuid,
+                    'operacion': fila.operacion,
+                    'timestamp': fila.timestamp.isoformat(),
+                    'version': fila.version
                 })
-        
-        # Actualizar sesión
-        session.cambios_recibidos = len(changes)
-        session.conflictos = len(conflictos_detectados)
-        session.fin = datetime.utcnow()
-        session.estado = 'completado'
-        
-        # Actualizar timestamp del dispositivo
-        if device_timestamp:
-            try:
-                dispositivo.ultima_sincronizacion = datetime.fromisoformat(
-                    device_timestamp.replace('Z', '+00:00')
-                )
-            except:
-                pass
-        
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'session_id': session.uuid,
-            'applied': cambios_aplicados,
-            'conflicts': conflictos_detectados,
-            'sync_timestamp': datetime.utcnow().isoformat()
-        }), 200
-        
-    except Exception as e:
-        current_app.logger.error(f"Error en sync push: {str(e)}")
-        if 'session' in locals():
+                buffer.append(f'{cabecera[:-1]}, "datos": {fila.datos_json or "null"}}}\n')
+                enviados += 1
+                ultimo_id_buffer = fila.id
+                
+                if len(buffer) >= NDJSON_CHUNK_ROWS:
+                    yield ''.join(buffer)
+                    buffer = []
+                    ultimo_id = ultimo_id_buffer
+            
+            if buffer:
+                yield ''.join(buffer)
+                ultimo_id = ultimo_id_buffer
+            
+            session.cambios_enviados = enviados
+            session.fin = datetime.utcnow()
+            session.estado = 'completado'
+            if not has_more:
+                dispositivo.ultima_sincronizacion = datetime.utcnow()
+            db.session.commit()
+            
+            yield json.dumps({
+                'type': 'end',
+                'success': True,
+                'session_id': session.uuid,
+                'count': enviados,
+                'sync_timestamp': datetime.utcnow().isoformat(),
+                'next_cursor': str(ultimo_id) if ultimo_id is not None else None,
+                'has_more': has_more
+            }) + '\n'
+            
+        except Exception as e:
+            current_app.logger.error(f"Error en sync pull (ndjson): {str(e)}")
+            db.session.rollback()
             session.estado = 'error'
             session.error_mensaje = str(e)
             db.session.commit()
-        return jsonify({'error': 'Error en sincronización'}), 500
+            # El cliente puede reanudar desde el último cursor recibido
+            yield json.dumps({
+                'type': 'end',
+                'success': False,
+                'error': 'Error en sincronización',
+                'next_cursor': str(ultimo_id) if ultimo_id is not None else None,
+                'has_more': True
+            }) + '\n'
+    
+    response = Response(stream_with_context(generar()), mimetype=NDJSON_MIMETYPE)
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# POST /sync/push lo atiende sync_data.sync_push_bulk (inserción por lotes con
+# savepoints); aquí solo se aplican cambios sueltos al resolver conflictos.
+
+# Mapeo de tablas a modelos
+MODELO_MAP = {
+    'clientes': Cliente,
+    'productos': Producto,
+    'ventas': Venta,
+    'detalle_ventas': DetalleVenta,
+    'abonos': Abono,
+    'cajas': Caja,
+    'movimiento_caja': MovimientoCaja,
+    'usuarios': Usuario
+}
+
+# Columnas calculadas en el servidor que un dispositivo no puede sobrescribir
+COLUMNAS_DERIVADAS = {
+    'clientes': {'saldo_pendiente_total'},
+    'creditos': {'saldo_pendiente'}
+}
 
-def aplicar_cambio(change, dispositivo, session):
+def _parse_timestamp(timestamp):
+    """Convierte un timestamp ISO del cliente a datetime UTC sin zona horaria"""
+    if not timestamp:
+        return datetime.utcnow()
+    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def aplicar_cambio(change, dispositivo, forzar=False):
     """
-    Aplica un cambio individual y detecta conflictos
+    Aplica un cambio individual y detecta conflictos: si el registro tiene en
+    el ChangeLog un cambio más reciente que el recibido, el cambio queda
+    registrado como conflicto sin aplicarse (salvo con forzar, que usa la
+    resolución de conflictos). Si toca ventas o abonos recalcula el saldo
+    guardado de los clientes o créditos afectados.
     """
     tabla = change.get('tabla')
     registro_uuid = change.get('registro_uuid')
     operacion = change.get('operacion')
-    datos = change.get('datos', {})
-    timestamp = change.get('timestamp')
+    datos = change.get('datos') or {}
     version = change.get('version', 1)
-    
-    # Mapeo de tablas a modelos
-    MODELO_MAP = {
-        'clientes': Cliente,
-        'productos': Producto,
-        'ventas': Venta,
-        'detalle_ventas': DetalleVenta,
-        'abonos': Abono,
-        'cajas': Caja,
-        'movimiento_caja': MovimientoCaja,
-        'usuarios': Usuario
-    }
+    change_uuid = change.get('uuid') or str(uuid.uuid4())
     
     modelo = MODELO_MAP.get(tabla)
     if not modelo:
@@ -229,91 +304,131 @@ def aplicar_cambio(change, dispositivo, session):
             'error': f'Tabla {tabla} no soportada'
         }
     
-    # Buscar registro existente por UUID
-    registro = None
-    if hasattr(modelo, 'uuid'):
-        registro = modelo.query.filter_by(uuid=registro_uuid).first()
-    
-    # Detectar conflictos
-    if registro and operacion in ['INSERT', 'UPDATE']:
-        # Verificar si hay cambios más recientes
-        cambio_reciente = ChangeLog.query.filter(
-            ChangeLog.tabla == tabla,
-            ChangeLog.registro_uuid == registro_uuid,
-            ChangeLog.timestamp > datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-        ).first()
-        
-        if cambio_reciente:
-            # Hay un conflicto
-            conflicto = ConflictoSync(
-                tabla=tabla,
-                registro_uuid=registro_uuid,
-                cambio_local_id=cambio_reciente.id,
-                datos_local_json=cambio_reciente.datos_json,
-                datos_remoto_json=json.dumps(datos)
-            )
-            db.session.add(conflicto)
-            
-            return {
-                'uuid': change.get('uuid'),
-                'status': 'conflict',
-                'conflict_id': conflicto.uuid,
-                'local_version': cambio_reciente.version,
-                'remote_version': version
-            }
-    
-    # Aplicar cambio
-    try:
-        if operacion == 'INSERT':
-            if not registro:
-                registro = modelo()
-                if hasattr(registro, 'uuid'):
-                    registro.uuid = registro_uuid
-                
-                # Aplicar datos
-                for key, value in datos.items():
-                    if hasattr(registro, key) and key not in ['id', 'uuid']:
-                        setattr(registro, key, value)
-                
-                db.session.add(registro)
-        
-        elif operacion == 'UPDATE':
-            if registro:
-                for key, value in datos.items():
-                    if hasattr(registro, key) and key not in ['id', 'uuid']:
-                        setattr(registro, key, value)
-        
-        elif operacion == 'DELETE':
-            if registro:
-                db.session.delete(registro)
-        
-        # Registrar en change log
-        nuevo_cambio = ChangeLog(
-            uuid=change.get('uuid', str(uuid.uuid4())),
-            tabla=tabla,
-            registro_uuid=registro_uuid,
-            operacion=operacion,
-            datos_json=json.dumps(datos),
-            usuario_id=dispositivo.usuario_id,
-            dispositivo_id=dispositivo.id,
-            timestamp=datetime.fromisoformat(timestamp.replace('Z', '+00:00')),
-            version=version,
-            sincronizado=True
-        )
-        db.session.add(nuevo_cambio)
-        
+    if operacion not in ('INSERT', 'UPDATE', 'DELETE'):
         return {
             'uuid': change.get('uuid'),
-            'status': 'applied',
-            'registro_uuid': registro_uuid
+            'status': 'error',
+            'error': f'Operación {operacion} no soportada'
         }
-        
-    except Exception as e:
+    
+    try:
+        timestamp = _parse_timestamp(change.get('timestamp'))
+    except (AttributeError, TypeError, ValueError):
         return {
             'uuid': change.get('uuid'),
             'status': 'error',
-            'error': str(e)
+            'error': 'Timestamp inválido'
         }
+    
+    registro = modelo.query.filter_by(uuid=registro_uuid).first()
+    
+    # Detectar conflictos: hay cambios más recientes sobre el registro
+    if registro is not None and not forzar:
+        conflicto = _registrar_conflicto(
+            tabla, registro_uuid, change_uuid, operacion, datos, timestamp, version, dispositivo
+        )
+        if conflicto is not None:
+            return conflicto
+    
+    columnas = set(modelo.__table__.columns.keys()) - {'id', 'uuid'} - COLUMNAS_DERIVADAS.get(tabla, set())
+    valores = {k: v for k, v in datos.items() if k in columnas}
+    
+    # Clientes y créditos cuyo saldo guardado cambia (antes y después del cambio)
+    clientes = {registro.cliente_id} if tabla == 'ventas' and registro is not None else set()
+    creditos = {registro.credito_id} if tabla == 'abonos' and registro is not None else set()
+    
+    if operacion == 'INSERT':
+        if registro is None:
+            registro = modelo(uuid=registro_uuid, **valores)
+            db.session.add(registro)
+    
+    elif operacion == 'UPDATE':
+        if registro is not None:
+            for key, value in valores.items():
+                setattr(registro, key, value)
+    
+    elif operacion == 'DELETE':
+        if registro is not None:
+            db.session.delete(registro)
+            registro = None
+    
+    # Registrar en change log
+    db.session.add(ChangeLog(
+        uuid=change_uuid,
+        tabla=tabla,
+        registro_uuid=registro_uuid,
+        operacion=operacion,
+        datos_json=json.dumps(datos),
+        usuario_id=dispositivo.usuario_id,
+        dispositivo_id=dispositivo.id,
+        timestamp=timestamp,
+        version=version,
+        sincronizado=True
+    ))
+    db.session.flush()
+    
+    if tabla == 'ventas':
+        clientes.add(registro.cliente_id if registro is not None else None)
+        recalcular_saldos_clientes(clientes)
+    elif tabla == 'abonos':
+        creditos.add(registro.credito_id if registro is not None else None)
+        recalcular_saldos_creditos(creditos)
+    
+    return {
+        'uuid': change.get('uuid'),
+        'status': 'applied',
+        'registro_uuid': registro_uuid
+    }
+
+def _registrar_conflicto(tabla, registro_uuid, change_uuid, operacion, datos, timestamp, version, dispositivo):
+    """
+    Si el registro tiene en el ChangeLog un cambio posterior a timestamp, guarda
+    el cambio remoto como conflictivo frente a ese cambio local y retorna el
+    resultado 'conflict'. Sin un cambio local más reciente retorna None y el
+    cambio se aplica.
+    """
+    cambio_local = ChangeLog.query.filter(
+        ChangeLog.tabla == tabla,
+        ChangeLog.registro_uuid == registro_uuid,
+        ChangeLog.timestamp > timestamp
+    ).order_by(ChangeLog.timestamp.desc()).first()
+    
+    if cambio_local is None:
+        return None
+    
+    # El cambio remoto queda en el log marcado como conflicto (sync_pull no lo envía)
+    cambio_remoto = ChangeLog(
+        uuid=change_uuid,
+        tabla=tabla,
+        registro_uuid=registro_uuid,
+        operacion=operacion,
+        datos_json=json.dumps(datos),
+        usuario_id=dispositivo.usuario_id,
+        dispositivo_id=dispositivo.id,
+        timestamp=timestamp,
+        version=version,
+        sincronizado=False,
+        conflicto=True
+    )
+    conflicto = ConflictoSync(
+        uuid=str(uuid.uuid4()),
+        tabla=tabla,
+        registro_uuid=registro_uuid,
+        cambio_local=cambio_local,
+        cambio_remoto=cambio_remoto,
+        datos_local_json=cambio_local.datos_json or '{}',
+        datos_remoto_json=json.dumps(datos)
+    )
+    db.session.add(cambio_remoto)
+    db.session.add(conflicto)
+    
+    return {
+        'uuid': change_uuid,
+        'status': 'conflict',
+        'conflict_id': conflicto.uuid,
+        'local_version': cambio_local.version,
+        'remote_version': version
+    }
 
 @api.route('/sync/conflicts', methods=['GET'])
 @require_api_auth
@@ -368,15 +483,15 @@ def resolve_conflict(uuid, dispositivo=None):
             # Mantener versión local, no hacer nada
             pass
         elif resolution == 'remote':
-            # Aplicar versión remota
+            # Aplicar versión remota con su operación (UPDATE o DELETE)
             aplicar_cambio({
                 'tabla': conflicto.tabla,
                 'registro_uuid': conflicto.registro_uuid,
-                'operacion': 'UPDATE',
+                'operacion': conflicto.cambio_remoto.operacion,
                 'datos': json.loads(conflicto.datos_remoto_json),
                 'timestamp': datetime.utcnow().isoformat(),
                 'version': conflicto.cambio_remoto.version + 1
-            }, dispositivo, None)
+            }, dispositivo, forzar=True)
         elif resolution == 'merge' and merged_data:
             # Aplicar datos combinados
             aplicar_cambio({
@@ -386,7 +501,7 @@ def resolve_conflict(uuid, dispositivo=None):
                 'datos': merged_data,
                 'timestamp': datetime.utcnow().isoformat(),
                 'version': max(conflicto.cambio_local.version, conflicto.cambio_remoto.version) + 1
-            }, dispositivo, None)
+            }, dispositivo, forzar=True)
         
         # Marcar conflicto como resuelto
         conflicto.resuelto = True
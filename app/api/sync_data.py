@@ -3,6 +3,8 @@ from flask import jsonify, request, current_app
 from app import db
 from app.models import Cliente, Producto, Venta, DetalleVenta, Usuario, Abono, Caja, MovimientoCaja
 from app.api import api
+from app.saldos import ajustar_saldo_cliente, ajustar_saldo_credito, recalcular_saldos_clientes
+from app.resumenes import recalcular_resumenes
 from datetime import datetime
 import json
 import uuid
@@ -40,35 +42,7 @@ def require_api_auth(f):
 
 # --- ENDPOINTS DE SINCRONIZACIÓN PRINCIPALES ---
 
-@api.route('/clientes', methods=['GET'])
-@require_api_auth
-def sync_get_clientes(dispositivo=None):
-    """Obtener lista de clientes para caché"""
-    try:
-        clientes = Cliente.query.all()
-        
-        clientes_data = []
-        for cliente in clientes:
-            clientes_data.append({
-                'id': cliente.id,
-                'uuid': getattr(cliente, 'uuid', None),
-                'nombre': cliente.nombre,
-                'cedula': cliente.cedula,
-                'telefono': cliente.telefono or '',
-                'email': cliente.email or '',
-                'direccion': cliente.direccion or '',
-                'fecha_registro': cliente.fecha_registro.isoformat() if hasattr(cliente, 'fecha_registro') and cliente.fecha_registro else None
-            })
-
-        return jsonify({
-            'success': True,
-            'data': clientes_data,
-            'count': len(clientes_data)
-        }), 200
-
-    except Exception as e:
-        current_app.logger.error(f"Error obteniendo clientes: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+# GET /clientes está en app/api/clientes.py
 
 @api.route('/clientes', methods=['POST'])
 @require_api_auth
@@ -148,6 +122,9 @@ def sync_crear_venta(dispositivo=None):
             )
             db.session.add(detalle)
         
+        if nueva_venta.tipo == 'credito':
+            ajustar_saldo_cliente(nueva_venta.cliente_id, nueva_venta.saldo_pendiente)
+        
         db.session.commit()
 
         return jsonify({
@@ -185,9 +162,15 @@ def sync_crear_abono(dispositivo=None):
                 db.session.flush()
             caja_id = caja_default.id
             
-        # Crear abono
+        # Crear abono a una venta a crédito o a un crédito directo
+        venta_id = int(data.get('venta_id')) if data.get('venta_id') else None
+        credito_id = int(data.get('credito_id')) if data.get('credito_id') else None
+        if not venta_id and not credito_id:
+            return jsonify({'error': 'Se requiere venta_id o credito_id'}), 400
+        
         nuevo_abono = Abono(
-            venta_id=int(data.get('venta_id')),
+            venta_id=venta_id,
+            credito_id=credito_id,
             monto=float(data.get('monto')),
             cobrador_id=dispositivo.usuario_id,
             caja_id=caja_id,
@@ -195,21 +178,29 @@ def sync_crear_abono(dispositivo=None):
         )
 
         db.session.add(nuevo_abono)
+        db.session.flush()
         
         # Actualizar saldo de venta
-        venta = Venta.query.get(nuevo_abono.venta_id)
-        if venta:
-            venta.saldo_pendiente -= nuevo_abono.monto
-            if venta.saldo_pendiente <= 0:
-                venta.estado = 'pagado'
-                venta.saldo_pendiente = 0
+        if venta_id:
+            venta = Venta.query.get(venta_id)
+            if venta:
+                saldo_anterior = venta.saldo_pendiente
+                venta.saldo_pendiente -= nuevo_abono.monto
+                if venta.saldo_pendiente <= 0:
+                    venta.estado = 'pagado'
+                    venta.saldo_pendiente = 0
+                ajustar_saldo_cliente(venta.cliente_id, venta.saldo_pendiente - saldo_anterior)
+        
+        # Descontar del saldo guardado del crédito directo
+        if credito_id:
+            ajustar_saldo_credito(credito_id, -nuevo_abono.monto)
         
         # Registrar movimiento en caja
         movimiento = MovimientoCaja(
             caja_id=caja_id,
             tipo='entrada',
             monto=nuevo_abono.monto,
-            descripcion=f'Abono a venta #{nuevo_abono.venta_id}',
+            descripcion=f'Abono a venta #{venta_id}' if venta_id else f'Abono a crédito #{credito_id}',
             abono_id=nuevo_abono.id
         )
         db.session.add(movimiento)
@@ -234,10 +225,18 @@ def sync_crear_abono(dispositivo=None):
 
 # --- ENDPOINT DE SINCRONIZACIÓN BULK ---
 
+# Máximo de valores por cláusula IN (límite de parámetros de SQLite)
+IN_CHUNK_SIZE = 500
+
 @api.route('/sync/push', methods=['POST'])
 @require_api_auth
 def sync_push_bulk(dispositivo=None):
-    """Recibe múltiples cambios desde el cliente"""
+    """
+    Recibe múltiples cambios desde el cliente.
+    Las cédulas existentes y la caja por defecto se precargan una sola vez y
+    cada micro-lote se inserta con un executemany por tipo, de modo que el
+    número de consultas depende de la cantidad de lotes y no de cambios.
+    """
     try:
         # Verificar si es JSON o FormData
         if request.is_json:
@@ -265,40 +264,25 @@ def sync_push_bulk(dispositivo=None):
 
         results = []
         errors = []
-
-        # Procesar cada cambio
-        for change in changes:
-            try:
-                change_type = change.get('type', '')
-                operation = change.get('operation', 'CREATE')
-                change_data = change.get('data', {})
-
-                if change_type == 'cliente' and operation == 'CREATE':
-                    result = crear_cliente_bulk(change_data, dispositivo)
-                elif change_type == 'venta' and operation == 'CREATE':
-                    result = crear_venta_bulk(change_data, dispositivo)
-                elif change_type == 'abono' and operation == 'CREATE':
-                    result = crear_abono_bulk(change_data, dispositivo)
-                else:
-                    result = {
-                        'status': 'not_implemented',
-                        'message': f'Tipo {change_type} operación {operation} no implementada'
-                    }
-
-                results.append(result)
-
-            except Exception as e:
-                current_app.logger.error(f"Error procesando cambio: {str(e)}")
-                errors.append({
-                    'change': change,
-                    'error': str(e)
-                })
-
-        # Commit si hay resultados exitosos
-        if any(r.get('status') == 'success' for r in results):
-            db.session.commit()
-        else:
-            db.session.rollback()
+        contexto = preparar_contexto_bulk(changes)
+
+        # Cada micro-lote corre dentro de un SAVEPOINT: un cambio fallido no
+        # invalida la sesión ni arrastra a los demás
+        tamano_lote = max(1, current_app.config.get('SYNC_PUSH_SAVEPOINT_BATCH', 500))
+        for inicio in range(0, len(changes), tamano_lote):
+            lote = list(enumerate(changes[inicio:inicio + tamano_lote], start=inicio))
+            lote_results, lote_errors = aplicar_lote_savepoint(lote, dispositivo, contexto)
+            results.extend(lote_results)
+            errors.extend(lote_errors)
+
+        # Los INSERT por lotes no pasan por el ORM: saldos y resúmenes de lo insertado
+        if contexto['clientes']:
+            recalcular_saldos_clientes(contexto['clientes'])
+        for modelo, fechas in contexto['resumenes'].items():
+            recalcular_resumenes(fechas=fechas, modelos=[modelo])
+
+        # Solo quedan en la transacción los cambios cuyo SAVEPOINT se liberó
+        db.session.commit()
 
         return jsonify({
             'success': True,
@@ -313,75 +297,26 @@ def sync_push_bulk(dispositivo=None):
         current_app.logger.error(f"Error en sync push bulk: {str(e)}")
         return jsonify({'error': f'Error en sincronización: {str(e)}'}), 500
 
-def crear_cliente_bulk(data, dispositivo):
-    """Crear cliente en operación bulk"""
-    try:
-        # Verificar si ya existe
-        cedula = data.get('cedula')
-        if cedula:
-            existente = Cliente.query.filter_by(cedula=cedula).first()
-            if existente:
-                return {
-                    'status': 'duplicate',
-                    'id': existente.id,
-                    'message': f'Cliente con cédula {cedula} ya existe'
-                }
-
-        # Crear nuevo
-        cliente = Cliente(
-            nombre=data.get('nombre', ''),
-            cedula=data.get('cedula', ''),
-            telefono=data.get('telefono'),
-            email=data.get('email'),
-            direccion=data.get('direccion')
-        )
-
-        db.session.add(cliente)
-        db.session.flush()
-
-        return {
-            'status': 'success',
-            'id': cliente.id,
-            'message': f'Cliente {cliente.nombre} creado'
-        }
-
-    except Exception as e:
-        return {
-            'status': 'error',
-            'error': str(e)
-        }
-
-def crear_venta_bulk(data, dispositivo):
-    """Crear venta en operación bulk"""
-    try:
-        venta = Venta(
-            cliente_id=int(data.get('cliente_id')),
-            vendedor_id=dispositivo.usuario_id,
-            total=float(data.get('total', 0)),
-            tipo=data.get('tipo', 'contado'),
-            saldo_pendiente=float(data.get('total', 0)) if data.get('tipo') == 'credito' else 0,
-            estado='pendiente' if data.get('tipo') == 'credito' else 'pagado'
+def preparar_contexto_bulk(changes):
+    """
+    Precarga lo que los cambios consultaban uno por uno: las cédulas ya
+    registradas (consultas IN) y la caja por defecto de los abonos.
+    """
+    cedulas = list({
+        (change.get('data') or {}).get('cedula')
+        for change in changes
+        if change.get('type') == 'cliente' and change.get('operation', 'CREATE') == 'CREATE'
+    } - {None, ''})
+
+    existentes = {}
+    for inicio in range(0, len(cedulas), IN_CHUNK_SIZE):
+        existentes.update(
+            db.session.query(Cliente.cedula, Cliente.id)
+            .filter(Cliente.cedula.in_(cedulas[inicio:inicio + IN_CHUNK_SIZE]))
         )
 
-        db.session.add(venta)
-        db.session.flush()
-
-        return {
-            'status': 'success',
-            'id': venta.id,
-            'message': f'Venta #{venta.id} creada'
-        }
-
-    except Exception as e:
-        return {
-            'status': 'error',
-            'error': str(e)
-        }
-
-def crear_abono_bulk(data, dispositivo):
-    """Crear abono en operación bulk"""
-    try:
-        # Buscar caja por defecto
+    caja_id = None
+    if any(change.get('type') == 'abono' for change in changes):
         caja = Caja.query.first()
         if not caja:
             caja = Caja(
@@ -392,30 +327,178 @@ def crear_abono_bulk(data, dispositivo):
             )
             db.session.add(caja)
             db.session.flush()
-
-        abono = Abono(
-            venta_id=int(data.get('venta_id', data.get('credito_id', 0))),
-            monto=float(data.get('monto')),
-            cobrador_id=dispositivo.usuario_id,
-            caja_id=caja.id,
-            notas=data.get('notas', '')
-        )
-
-        db.session.add(abono)
-        db.session.flush()
-
-        return {
-            'status': 'success',
-            'id': abono.id,
-            'message': f'Abono de ${abono.monto} creado'
-        }
-
+        caja_id = caja.id
+
+    return {
+        'cedulas': existentes,  # cédula -> id, incluye los clientes creados en este push
+        'caja_id': caja_id,
+        'clientes': set(),      # clientes con ventas a crédito nuevas
+        'resumenes': {}         # modelo -> días con registros nuevos
+    }
+
+def aplicar_lote_savepoint(lote, dispositivo, contexto):
+    """
+    Aplica un micro-lote [(indice, change), ...] dentro de un SAVEPOINT.
+    Si algo falla se revierte el SAVEPOINT y, si el lote tenía más de un
+    cambio, se reintenta cada uno en su propio SAVEPOINT para reportar solo
+    los que realmente fallan. Retorna (results, errors) con el índice de cada cambio.
+    """
+    savepoint = db.session.begin_nested()
+    try:
+        results, nuevos = aplicar_lote_bulk(lote, dispositivo, contexto)
+        savepoint.commit()
     except Exception as e:
-        return {
-            'status': 'error',
+        savepoint.rollback()
+
+        if len(lote) > 1:
+            results = []
+            errors = []
+            for item in lote:
+                item_results, item_errors = aplicar_lote_savepoint([item], dispositivo, contexto)
+                results.extend(item_results)
+                errors.extend(item_errors)
+            return results, errors
+
+        indice, change = lote[0]
+        current_app.logger.error(f"Error procesando cambio {indice}: {str(e)}")
+        return [], [{
+            'index': indice,
+            'change': change,
             'error': str(e)
+        }]
+
+    # Lo insertado por el lote solo cuenta una vez liberado su SAVEPOINT
+    contexto['cedulas'].update(nuevos['cedulas'])
+    contexto['clientes'].update(nuevos['clientes'])
+    for modelo, fechas in nuevos['resumenes'].items():
+        contexto['resumenes'].setdefault(modelo, set()).update(fechas)
+    return results, []
+
+def fila_cliente_bulk(data, dispositivo, contexto, ahora):
+    return {
+        'nombre': data.get('nombre', ''),
+        'cedula': data.get('cedula', ''),
+        'telefono': data.get('telefono'),
+        'email': data.get('email'),
+        'direccion': data.get('direccion')
+    }
+
+def fila_venta_bulk(data, dispositivo, contexto, ahora):
+    return {
+        'cliente_id': int(data.get('cliente_id')),
+        'vendedor_id': dispositivo.usuario_id,
+        'total': float(data.get('total', 0)),
+        'tipo': data.get('tipo', 'contado'),
+        'saldo_pendiente': float(data.get('total', 0)) if data.get('tipo') == 'credito' else 0,
+        'estado': 'pendiente' if data.get('tipo') == 'credito' else 'pagado',
+        'fecha': ahora
+    }
+
+def fila_abono_bulk(data, dispositivo, contexto, ahora):
+    return {
+        'venta_id': int(data.get('venta_id', data.get('credito_id', 0))),
+        'monto': float(data.get('monto')),
+        'cobrador_id': dispositivo.usuario_id,
+        'caja_id': contexto['caja_id'],
+        'notas': data.get('notas', ''),
+        'fecha': ahora
+    }
+
+# Tipo de cambio -> (modelo, constructor de la fila, mensaje de éxito)
+CREADORES_BULK = {
+    'cliente': (Cliente, fila_cliente_bulk, lambda fila, id: f"Cliente {fila['nombre']} creado"),
+    'venta': (Venta, fila_venta_bulk, lambda fila, id: f'Venta #{id} creada'),
+    'abono': (Abono, fila_abono_bulk, lambda fila, id: f"Abono de ${fila['monto']} creado")
+}
+
+def aplicar_lote_bulk(lote, dispositivo, contexto):
+    """
+    Inserta un micro-lote con un INSERT ... RETURNING (executemany) por tipo.
+    Los datos inválidos se reportan como resultado 'error' sin tocar la base.
+    Retorna (results, nuevos) con lo que el lote agrega al contexto.
+    """
+    ahora = datetime.utcnow()
+    resultados = {}
+    filas = {tipo: [] for tipo in CREADORES_BULK}  # tipo -> [(indice, fila)]
+    cedulas_lote = {}  # cédula -> índice del cliente nuevo que la registra
+    repetidos = []     # (indice, cédula) de clientes repetidos dentro del lote
+
+    for indice, change in lote:
+        change_type = change.get('type', '')
+        operation = change.get('operation', 'CREATE')
+
+        if operation != 'CREATE' or change_type not in CREADORES_BULK:
+            resultados[indice] = {
+                'status': 'not_implemented',
+                'message': f'Tipo {change_type} operación {operation} no implementada'
+            }
+            continue
+
+        try:
+            fila = CREADORES_BULK[change_type][1](change.get('data', {}), dispositivo, contexto, ahora)
+        except (TypeError, ValueError) as e:
+            resultados[indice] = {'status': 'error', 'error': str(e)}
+            continue
+
+        if change_type == 'cliente' and fila['cedula']:
+            cedula = fila['cedula']
+            if cedula in contexto['cedulas']:
+                resultados[indice] = {
+                    'status': 'duplicate',
+                    'id': contexto['cedulas'][cedula],
+                    'message': f'Cliente con cédula {cedula} ya existe'
+                }
+                continue
+            if cedula in cedulas_lote:
+                repetidos.append((indice, cedula))
+                continue
+            cedulas_lote[cedula] = indice
+
+        filas[change_type].append((indice, fila))
+
+    nuevos = {'cedulas': {}, 'clientes': set(), 'resumenes': {}}
+    for change_type, pendientes in filas.items():
+        if not pendientes:
+            continue
+        modelo, _, mensaje = CREADORES_BULK[change_type]
+        tabla = modelo.__table__
+        # El uuid generado aquí identifica cada fila en el RETURNING (sin depender de su orden)
+        for _, fila in pendientes:
+            fila['uuid'] = str(uuid.uuid4())
+        insertados = dict(db.session.execute(
+            tabla.insert().returning(tabla.c.uuid, tabla.c.id),
+            [fila for _, fila in pendientes]
+        ).all())
+
+        for indice, fila in pendientes:
+            registro_id = insertados[fila['uuid']]
+            resultados[indice] = {
+                'status': 'success',
+                'id': registro_id,
+                'message': mensaje(fila, registro_id)
+            }
+            if change_type == 'cliente' and fila['cedula']:
+                nuevos['cedulas'][fila['cedula']] = registro_id
+            elif change_type == 'venta' and fila['tipo'] == 'credito':
+                nuevos['clientes'].add(fila['cliente_id'])
+
+        if modelo in (Venta, Abono):
+            nuevos['resumenes'][modelo] = {ahora}
+
+    for indice, cedula in repetidos:
+        resultados[indice] = {
+            'status': 'duplicate',
+            'id': nuevos['cedulas'][cedula],
+            'message': f'Cliente con cédula {cedula} ya existe'
         }
 
+    results = []
+    for indice, _ in lote:
+        resultado = resultados[indice]
+        resultado['index'] = indice
+        results.append(resultado)
+    return results, nuevos
+
 # --- ENDPOINT DE PRUEBA ---
 
 @api.route('/test-auth', methods=['GET'])
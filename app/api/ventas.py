@@ -3,6 +3,9 @@ from flask import jsonify, request, current_app
 from app import db
 from app.models import Venta, DetalleVenta, Cliente, Producto, Usuario
 from app.api import api
+from app.api.etag import leer_since, version_coleccion, no_modificado, respuesta_no_modificada, respuesta_coleccion
+from app.api.paginacion import leer_paginacion, leer_campos, aplicar_proyeccion, paginar, serializar
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime
 import json
 import uuid
@@ -41,95 +44,77 @@ def require_api_auth(f):
 
     return decorated_function
 
+# Campos disponibles en GET /ventas (?fields=)
+COLUMNAS_VENTA = {
+    'id': (Venta.id, lambda v: v.id),
+    'uuid': (Venta.uuid, lambda v: v.uuid),
+    'cliente_id': (Venta.cliente_id, lambda v: v.cliente_id),
+    'vendedor_id': (Venta.vendedor_id, lambda v: v.vendedor_id),
+    'total': (Venta.total, lambda v: float(v.total)),
+    'tipo': (Venta.tipo, lambda v: v.tipo),
+    'saldo_pendiente': (Venta.saldo_pendiente, lambda v: float(v.saldo_pendiente) if v.saldo_pendiente else 0),
+    'estado': (Venta.estado, lambda v: v.estado),
+    'fecha': (Venta.fecha, lambda v: v.fecha.isoformat() if v.fecha else datetime.now().isoformat()),
+    'updated_at': (Venta.updated_at, lambda v: v.updated_at.isoformat() if v.updated_at else None)
+}
+
+RELACIONES_VENTA = {
+    'cliente_nombre': (
+        joinedload(Venta.cliente).load_only(Cliente.nombre),
+        lambda v: v.cliente.nombre if v.cliente else None
+    ),
+    'vendedor_nombre': (
+        joinedload(Venta.vendedor).load_only(Usuario.nombre),
+        lambda v: v.vendedor.nombre if v.vendedor else None
+    ),
+    'detalles': (
+        selectinload(Venta.detalles),
+        lambda v: [{
+            'producto_id': d.producto_id,
+            'cantidad': d.cantidad,
+            'precio_unitario': float(d.precio_unitario),
+            'subtotal': float(d.subtotal)
+        } for d in v.detalles]
+    )
+}
+
+CAMPOS_VENTA_DEFECTO = ('id', 'uuid', 'cliente_id', 'vendedor_id', 'total', 'tipo',
+                        'saldo_pendiente', 'estado', 'fecha')
+
 @api.route('/ventas', methods=['GET'])
 @require_api_auth
 def get_ventas(dispositivo=None):
     """Obtener lista de ventas para sincronización"""
     try:
-        ventas = Venta.query.all()
-        
-        ventas_data = []
-        for venta in ventas:
-            ventas_data.append({
-                'id': venta.id,
-                'uuid': getattr(venta, 'uuid', str(uuid.uuid4())),
-                'cliente_id': venta.cliente_id,
-                'vendedor_id': venta.vendedor_id,
-                'total': float(venta.total),
-                'tipo': venta.tipo,
-                'saldo_pendiente': float(venta.saldo_pendiente) if venta.saldo_pendiente else 0,
-                'estado': venta.estado,
-                'fecha': venta.fecha.isoformat() if venta.fecha else datetime.now().isoformat()
-            })
+        since, error = leer_since()
+        if error:
+            return error
+
+        limit, after_id, error = leer_paginacion()
+        if error:
+            return error
+
+        campos, error = leer_campos(COLUMNAS_VENTA, RELACIONES_VENTA, CAMPOS_VENTA_DEFECTO)
+        if error:
+            return error
+
+        # Versión de la colección: si el cliente ya la tiene, 304 sin tocar las filas
+        etag, total, watermark = version_coleccion(Venta)
+        if no_modificado(etag):
+            return respuesta_no_modificada(etag)
+
+        query = aplicar_proyeccion(Venta.query, campos, COLUMNAS_VENTA, RELACIONES_VENTA)
+        if since:
+            # Delta: solo filas modificadas después de la marca del cliente
+            query = query.filter(Venta.updated_at > since)
 
-        return jsonify({
-            'success': True,
-            'data': ventas_data,
-            'count': len(ventas_data)
-        }), 200
+        ventas, has_more, next_after_id = paginar(query, Venta, limit, after_id)
+        ventas_data = serializar(ventas, campos, COLUMNAS_VENTA, RELACIONES_VENTA)
+
+        return respuesta_coleccion(ventas_data, etag, total, watermark, has_more, next_after_id), 200
 
     except Exception as e:
         current_app.logger.error(f"Error obteniendo ventas: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@api.route('/ventas', methods=['POST'])
-@require_api_auth
-def crear_venta(dispositivo=None):
-    """Crear venta desde sincronización offline"""
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'No se recibieron datos'}), 400
-            
-        # Crear nueva venta
-        nueva_venta = Venta(
-            cliente_id=int(data.get('cliente_id')),
-            vendedor_id=dispositivo.usuario_id,
-            total=float(data.get('total', 0)),
-            tipo=data.get('tipo', 'contado'),
-            saldo_pendiente=float(data.get('saldo_pendiente', 0)),
-            estado=data.get('estado', 'pendiente')
-        )
-
-        # Asegurar que tenga UUID si no lo tiene
-        if not hasattr(nueva_venta, 'uuid') or not nueva_venta.uuid:
-            nueva_venta.uuid = str(uuid.uuid4())
-
-        db.session.add(nueva_venta)
-        db.session.flush()  # Para obtener el ID
-
-        # Procesar productos si vienen
-        productos = data.get('productos', [])
-        for producto_data in productos:
-            detalle = DetalleVenta(
-                venta_id=nueva_venta.id,
-                producto_id=int(producto_data.get('id')),
-                cantidad=int(producto_data.get('cantidad', 1)),
-                precio_unitario=float(producto_data.get('precio_venta', 0)),
-                subtotal=float(producto_data.get('cantidad', 1)) * float(producto_data.get('precio_venta', 0))
-            )
-            db.session.add(detalle)
-
-        db.session.commit()
-
-        current_app.logger.info(f"Venta creada vía API: #{nueva_venta.id}")
-
-        return jsonify({
-            'success': True,
-            'id': nueva_venta.id,
-            'message': f'Venta #{nueva_venta.id} creada exitosamente',
-            'action': 'created',
-            'data': {
-                'id': nueva_venta.id,
-                'total': float(nueva_venta.total),
-                'tipo': nueva_venta.tipo,
-                'uuid': nueva_venta.uuid
-            }
-        }), 201
-
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error creando venta vía API: {str(e)}")
-        import traceback
-        current_app.logger.error(f"Traceback: {traceback.format_exc()}")
-        return jsonify({'error': f'Error creando venta: {str(e)}'}), 500
+# POST /ventas lo atiende sync_data.sync_crear_venta
@@ -0,0 +1,152 @@
+# app/busqueda_clientes.py
+"""
+Búsqueda de clientes para los campos typeahead de los formularios.
+
+Busca en nombre, cédula y teléfono, ordena por relevancia y retorna a lo sumo
+`limite` resultados, de modo que los formularios de venta y abono piden
+candidatos a medida que se escribe en lugar de recibir toda la tabla.
+
+- PostgreSQL: ILIKE '%termino%' más el operador de similitud de pg_trgm,
+  resueltos con los índices GIN de trigramas (ver
+  models_update.habilitar_busqueda_clientes). Primero los que empiezan por el
+  término, luego por similarity(nombre, termino).
+- SQLite: tabla virtual FTS5 clientes_fts (creada en el primer uso y
+  mantenida por triggers) con búsqueda por prefijo y orden por bm25.
+- Si ninguna de las dos está disponible se usa ILIKE sin índice.
+"""
+import re
+from flask import current_app
+from sqlalchemy import case, column, exists, func, or_, table, text
+from app import db
+from app.models import Cliente, Venta
+
+_ESQUEMA_FTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5(
+        nombre, cedula, telefono,
+        content='clientes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS clientes_fts_ai AFTER INSERT ON clientes BEGIN
+        INSERT INTO clientes_fts (rowid, nombre, cedula, telefono)
+        VALUES (new.id, new.nombre, new.cedula, new.telefono);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS clientes_fts_ad AFTER DELETE ON clientes BEGIN
+        INSERT INTO clientes_fts (clientes_fts, rowid, nombre, cedula, telefono)
+        VALUES ('delete', old.id, old.nombre, old.cedula, old.telefono);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS clientes_fts_au AFTER UPDATE OF nombre, cedula, telefono ON clientes BEGIN
+        INSERT INTO clientes_fts (clientes_fts, rowid, nombre, cedula, telefono)
+        VALUES ('delete', old.id, old.nombre, old.cedula, old.telefono);
+        INSERT INTO clientes_fts (rowid, nombre, cedula, telefono)
+        VALUES (new.id, new.nombre, new.cedula, new.telefono);
+    END""",
+]
+
+_clientes_fts = table('clientes_fts', column('rowid'))
+
+# Motor disponible por URL de base de datos: 'trgm', 'fts5' o 'ilike'
+_motores = {}
+
+def _detectar_motor():
+    url = str(db.engine.url)
+    if url in _motores:
+        return _motores[url]
+
+    motor = 'ilike'
+    try:
+        if db.engine.dialect.name == 'postgresql':
+            with db.engine.connect() as connection:
+                if connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first():
+                    motor = 'trgm'
+        elif db.engine.dialect.name == 'sqlite':
+            with db.engine.begin() as connection:
+                existia = connection.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'clientes_fts'"
+                )).first()
+                for sentencia in _ESQUEMA_FTS:
+                    connection.execute(text(sentencia))
+                if not existia:
+                    connection.execute(text("INSERT INTO clientes_fts (clientes_fts) VALUES ('rebuild')"))
+            motor = 'fts5'
+    except Exception as e:
+        current_app.logger.warning(f"Búsqueda de clientes sin índice de texto: {str(e)}")
+
+    _motores[url] = motor
+    return motor
+
+def _escapar_like(termino):
+    return termino.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def nombre_contiene(nombre, termino):
+    """
+    ILIKE '%termino%' sobre una columna de nombre (la de Cliente o la de un
+    alias) con % y _ del término escapados, para los filtros de los listados
+    """
+    return nombre.ilike(f"%{_escapar_like(termino)}%", escape='\\')
+
+def _consulta_base(con_saldo, vendedor_id):
+    query = db.session.query(Cliente)
+    if con_saldo:
+        query = query.filter(Cliente.saldo_pendiente_total > 0)
+        if vendedor_id:
+            # El vendedor solo cobra sus propias ventas
+            query = query.filter(exists().where(
+                Venta.cliente_id == Cliente.id,
+                Venta.vendedor_id == vendedor_id,
+                Venta.tipo == 'credito',
+                Venta.saldo_pendiente > 0
+            ))
+    return query
+
+def _condiciones_ilike(termino):
+    """Condiciones ILIKE sobre las tres columnas y el orden por coincidencia de prefijo"""
+    patron = f"%{_escapar_like(termino)}%"
+    prefijo = f"{_escapar_like(termino)}%"
+    empieza = case(
+        (Cliente.cedula.like(prefijo, escape='\\'), 0),
+        (Cliente.nombre.ilike(prefijo, escape='\\'), 1),
+        else_=2
+    )
+    condiciones = [
+        nombre_contiene(Cliente.nombre, termino),
+        Cliente.cedula.ilike(patron, escape='\\'),
+        Cliente.telefono.ilike(patron, escape='\\'),
+    ]
+    return condiciones, empieza
+
+def buscar_clientes(termino, limite=20, con_saldo=False, vendedor_id=None):
+    """
+    Retorna hasta `limite` clientes ordenados por relevancia para `termino`.
+    Con con_saldo=True solo clientes con saldo pendiente (y, si se indica
+    vendedor_id, con ventas a crédito pendientes de ese vendedor).
+    """
+    termino = (termino or '').strip()
+    query = _consulta_base(con_saldo, vendedor_id)
+
+    if not termino:
+        return query.order_by(Cliente.nombre, Cliente.id).limit(limite).all()
+
+    motor = _detectar_motor()
+
+    if motor == 'fts5':
+        palabras = re.findall(r'\w+', termino)
+        if palabras:
+            coincidencia = ' '.join(f'"{p}"*' for p in palabras)
+            return query.join(
+                _clientes_fts, _clientes_fts.c.rowid == Cliente.id
+            ).filter(
+                text('clientes_fts MATCH :coincidencia')
+            ).params(coincidencia=coincidencia).order_by(
+                text('bm25(clientes_fts)'), Cliente.nombre
+            ).limit(limite).all()
+
+    condiciones, empieza = _condiciones_ilike(termino)
+
+    if motor == 'trgm':
+        # nombre % termino tolera errores de tipeo (umbral de pg_trgm.similarity_threshold)
+        condiciones.append(Cliente.nombre.op('%')(termino))
+        return query.filter(or_(*condiciones)).order_by(
+            empieza, func.similarity(Cliente.nombre, termino).desc(), Cliente.nombre
+        ).limit(limite).all()
+
+    return query.filter(or_(*condiciones)).order_by(empieza, Cliente.nombre).limit(limite).all()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -43,6 +44,54 @@ class Config:
     SYNC_TTL = int(os.getenv('SYNC_TTL', '86400'))  # 24 horas en segundos
     SYNC_MAX_BATCH_SIZE = int(os.getenv('SYNC_MAX_BATCH_SIZE', '1000'))
     SYNC_CONFLICT_RESOLUTION = os.getenv('SYNC_CONFLICT_RESOLUTION', 'last_write_wins')
+    SYNC_PUSH_SAVEPOINT_BATCH = int(os.getenv('SYNC_PUSH_SAVEPOINT_BATCH', '500'))  # cambios por SAVEPOINT (y por executemany)
+    
+    # Compresión de respuestas de la API (/api/v1)
+    API_COMPRESSION_MIN_SIZE = int(os.getenv('API_COMPRESSION_MIN_SIZE', '1024'))  # bytes
+    API_COMPRESSION_LEVEL = int(os.getenv('API_COMPRESSION_LEVEL', '6'))  # nivel gzip 1-9
+
+    # Paginación de los listados de la API (limit / after_id); sin ninguno se retorna la colección completa
+    API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '500'))
+    API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '1000'))
+
+    # Búsqueda typeahead de clientes (/clientes/buscar)
+    CLIENTES_BUSQUEDA_LIMITE = int(os.getenv('CLIENTES_BUSQUEDA_LIMITE', '20'))
+    CLIENTES_BUSQUEDA_LIMITE_MAX = int(os.getenv('CLIENTES_BUSQUEDA_LIMITE_MAX', '50'))
+
+    # Exportación de reportes: filas leídas por lote del cursor y por bloque del CSV
+    EXPORTACION_LOTE = int(os.getenv('EXPORTACION_LOTE', '1000'))
+
+    # Exportaciones en segundo plano (app/trabajos.py, worker_reportes.py)
+    TRABAJOS_EN_SEGUNDO_PLANO = os.getenv('TRABAJOS_EN_SEGUNDO_PLANO', 'True').lower() in ('true', '1', 't')
+    TRABAJOS_DIR = os.getenv('TRABAJOS_DIR', os.path.join(tempfile.gettempdir(), 'creditapp_trabajos'))
+    TRABAJOS_INTERVALO = float(os.getenv('TRABAJOS_INTERVALO', '2'))  # segundos entre consultas del worker
+    TRABAJOS_TIMEOUT = int(os.getenv('TRABAJOS_TIMEOUT', '1800'))  # segundos antes de reencolar uno abandonado
+    TRABAJOS_MAX_INTENTOS = int(os.getenv('TRABAJOS_MAX_INTENTOS', '3'))
+    TRABAJOS_RETENCION_HORAS = int(os.getenv('TRABAJOS_RETENCION_HORAS', '24'))
+
+    # Caché de la tabla de configuración (por proceso)
+    CONFIG_CACHE_TTL = int(os.getenv('CONFIG_CACHE_TTL', '60'))  # segundos
+
+    # Caché de KPIs del dashboard (archivo SQLite compartido entre workers)
+    KPI_CACHE_ENABLED = os.getenv('KPI_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+    KPI_CACHE_PATH = os.getenv('KPI_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'creditapp_kpi_cache.sqlite3'))
+    KPI_CACHE_TTL = int(os.getenv('KPI_CACHE_TTL', '300'))  # segundos
+
+    # Instrumentación de requests (Server-Timing, log JSON y /metrics)
+    REQUEST_METRICS_LOG = os.getenv('REQUEST_METRICS_LOG', 'True').lower() in ('true', '1', 't')
+    REQUEST_QUERY_BUDGET = int(os.getenv('REQUEST_QUERY_BUDGET', '50'))  # consultas por request
+    QUERY_BUDGETS = {  # presupuestos por endpoint (ver check_query_counts.py)
+        'dashboard.index': 4,
+        'ventas.index': 4,
+        'abonos.index': 4,
+        'creditos.index': 3,
+        'clientes.index': 3,
+        'clientes.buscar': 2,
+        'productos.catalogo': 3,
+        'api.sync_push_bulk': 25,
+    }
+    METRICS_WINDOW = int(os.getenv('METRICS_WINDOW', '1000'))  # muestras por endpoint para percentiles
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # Bearer para el scraper de Prometheus
 
 # Configuración de logging
 import logging
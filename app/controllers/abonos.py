@@ -5,7 +5,14 @@ from app.models import Abono, Cliente, Credito, CreditoVenta, Venta, Caja, Movim
 from app.forms import AbonoForm
 from app.decorators import cobrador_required, vendedor_cobrador_required
 from app.utils import registrar_movimiento_caja, calcular_comision
+from app.kpi_cache import invalidar_kpis
+from app.query_profiles import perfil
+from app.paginas import cursor_valido, paginar
+from app.saldos import ajustar_saldo_cliente
+from app.busqueda_clientes import nombre_contiene
 from app.pdf.abono import generar_pdf_abono
+from sqlalchemy import func, or_
+from sqlalchemy.orm import aliased
 from datetime import datetime
 import logging
 from decimal import Decimal, InvalidOperation
@@ -13,17 +20,31 @@ from app.utils import shorten_url
 
 abonos_bp = Blueprint('abonos', __name__, url_prefix='/abonos')
 
+# Tamaño de página y orden (keyset, descendente) del listado de abonos
+ABONOS_POR_PAGINA = 50
+ORDEN_ABONOS = (Abono.fecha, Abono.id)
+
+def ventas_pendientes_cliente(cliente_id, usuario):
+    """Ventas a crédito con saldo pendiente del cliente; el vendedor solo ve las suyas"""
+    query = Venta.query.filter(
+        Venta.cliente_id == cliente_id,
+        Venta.tipo == 'credito',
+        Venta.saldo_pendiente > 0
+    )
+    if usuario.is_vendedor() and not usuario.is_admin():
+        query = query.filter(Venta.vendedor_id == usuario.id)
+    return query
+
 @abonos_bp.route('/')
 @login_required
 @vendedor_cobrador_required
 def index():
     try:
         # Obtener parámetros de filtro
-        busqueda = request.args.get('busqueda', '')
+        busqueda = request.args.get('busqueda', '').strip()
         desde_str = request.args.get('desde', '')
         hasta_str = request.args.get('hasta', '')
         
-        # Consulta base simplificada - evitar joins complejos que causan errores
         query = Abono.query
         
         # Si es vendedor, filtrar solo sus propios abonos
@@ -32,6 +53,19 @@ def index():
             ventas_vendedor = db.session.query(Venta.id).filter(Venta.vendedor_id == current_user.id).subquery()
             query = query.filter(Abono.venta_id.in_(ventas_vendedor))
         
+        # Búsqueda por nombre del cliente (de la venta o del crédito) en SQL
+        if busqueda:
+            cliente_venta = aliased(Cliente)
+            cliente_credito = aliased(Cliente)
+            query = query.outerjoin(Venta, Abono.venta_id == Venta.id) \
+                .outerjoin(cliente_venta, Venta.cliente_id == cliente_venta.id) \
+                .outerjoin(Credito, Abono.credito_id == Credito.id) \
+                .outerjoin(cliente_credito, Credito.cliente_id == cliente_credito.id) \
+                .filter(or_(
+                    nombre_contiene(cliente_venta.nombre, busqueda),
+                    nombre_contiene(cliente_credito.nombre, busqueda)
+                ))
+        
         # Aplicar filtros de fecha
         if desde_str:
             try:
@@ -48,37 +82,40 @@ def index():
             except ValueError:
                 flash('Fecha "hasta" inválida.', 'warning')
 
-        # Obtener abonos ordenados por fecha
-        abonos = query.order_by(Abono.fecha.desc()).all()
-        
-        # Filtrar por búsqueda en memoria para evitar joins complejos
-        if busqueda and abonos:
-            abonos_filtrados = []
-            for abono in abonos:
-                try:
-                    if (abono.venta and abono.venta.cliente and 
-                        busqueda.lower() in abono.venta.cliente.nombre.lower()):
-                        abonos_filtrados.append(abono)
-                except AttributeError:
-                    # Si hay problemas con las relaciones, incluir el abono sin filtrar
-                    abonos_filtrados.append(abono)
-            abonos = abonos_filtrados
-        
-        # Calcular total de abonos con manejo de errores
-        total_abonos = 0
-        for abono in abonos:
-            try:
-                if abono.monto:
-                    total_abonos += float(abono.monto)
-            except (ValueError, TypeError):
-                continue
+        # Conteo y total de todo el filtro en una sola consulta agregada
+        total_abonos_count, total_abonos = query.with_entities(
+            func.count(Abono.id),
+            func.coalesce(func.sum(Abono.monto), 0)
+        ).one()
+        total_abonos = float(total_abonos)
+
+        # Paginación por keyset sobre (fecha, id) descendente
+        cursor = request.args.get('cursor', '')
+        if not cursor_valido(ORDEN_ABONOS, cursor):
+            flash('Página inválida, mostrando los abonos más recientes.', 'warning')
+            cursor = ''
+
+        # Relaciones que muestra la plantilla cargadas en la misma consulta
+        abonos, siguiente_cursor = paginar(query.options(*perfil('abono_lista')), ORDEN_ABONOS,
+                                           cursor, ABONOS_POR_PAGINA, descendente=True)
+
+        # Filtros activos para conservarlos en los enlaces de paginación
+        filtros = {clave: valor for clave, valor in {
+            'busqueda': busqueda,
+            'desde': desde_str,
+            'hasta': hasta_str
+        }.items() if valor}
         
         return render_template('abonos/index.html', 
                               abonos=abonos, 
                               total_abonos=total_abonos,
+                              total_abonos_count=total_abonos_count,
                               busqueda=busqueda,
                               desde=desde_str,
-                              hasta=hasta_str)
+                              hasta=hasta_str,
+                              filtros=filtros,
+                              cursor=cursor,
+                              siguiente_cursor=siguiente_cursor)
                               
     except Exception as e:
         current_app.logger.error(f"Error en abonos index: {str(e)}")
@@ -88,9 +125,13 @@ def index():
         return render_template('abonos/index.html', 
                               abonos=[], 
                               total_abonos=0,
+                              total_abonos_count=0,
                               busqueda='',
                               desde='',
-                              hasta='')
+                              hasta='',
+                              filtros={},
+                              cursor='',
+                              siguiente_cursor=None)
 
 @abonos_bp.route('/crear', methods=['GET', 'POST'])
 @login_required
@@ -120,13 +161,20 @@ def crear():
                 Venta.saldo_pendiente > 0
             ).distinct().order_by(Cliente.nombre)
         
-        clientes = clientes_query.all()
+        # Los clientes se buscan con el typeahead (/clientes/buscar?con_saldo=1):
+        # el select solo lleva el cliente preseleccionado o el enviado
+        clientes_iniciales = {cliente_id, request.form.get('cliente_id', type=int)}
+        if venta_id:
+            clientes_iniciales.add(db.session.query(Venta.cliente_id).filter(Venta.id == venta_id).scalar())
+        clientes_iniciales.discard(None)
+        
+        clientes = clientes_query.filter(Cliente.id.in_(clientes_iniciales)).all() if clientes_iniciales else []
 
         # Configurar opciones para el select de clientes
         if clientes:
             form.cliente_id.choices = [(c.id, f"{c.nombre} - {c.cedula}") for c in clientes]
         else:
-            form.cliente_id.choices = [(-1, "No hay clientes con créditos pendientes")]
+            form.cliente_id.choices = [(-1, "Busque un cliente con créditos pendientes")]
         
         # Inicialmente, configurar opciones para ventas (esto se actualizará dinámicamente)
         form.venta_id.choices = [(-1, "Seleccione un cliente primero")]
@@ -145,16 +193,7 @@ def crear():
                     client_selected = True
                     
                     # Cargar las ventas de este cliente (filtrar por vendedor si es necesario)
-                    ventas_query = Venta.query.filter(
-                        Venta.cliente_id == cliente_id,
-                        Venta.tipo == 'credito', 
-                        Venta.saldo_pendiente > 0
-                    )
-                    
-                    if current_user.is_vendedor() and not current_user.is_admin():
-                        ventas_query = ventas_query.filter(Venta.vendedor_id == current_user.id)
-                    
-                    ventas_pendientes = ventas_query.all()
+                    ventas_pendientes = ventas_pendientes_cliente(cliente_id, current_user).all()
                     
                     if ventas_pendientes:
                         form.venta_id.choices = [
@@ -186,16 +225,7 @@ def crear():
                         client_selected = True
                     
                     # Cargar las ventas de este cliente
-                    ventas_query = Venta.query.filter(
-                        Venta.cliente_id == cliente_id,
-                        Venta.tipo == 'credito', 
-                        Venta.saldo_pendiente > 0
-                    )
-                    
-                    if current_user.is_vendedor() and not current_user.is_admin():
-                        ventas_query = ventas_query.filter(Venta.vendedor_id == current_user.id)
-                    
-                    ventas_pendientes = ventas_query.all()
+                    ventas_pendientes = ventas_pendientes_cliente(cliente_id, current_user).all()
                     
                     if ventas_pendientes:
                         form.venta_id.choices = [
@@ -319,12 +349,15 @@ def crear():
                 db.session.flush()
                 
                 # Actualizar el saldo pendiente de la venta
+                saldo_anterior = venta.saldo_pendiente
                 venta.saldo_pendiente -= monto
                 
                 if venta.saldo_pendiente <= 0:
                     venta.estado = 'pagado'
                     venta.saldo_pendiente = 0
                 
+                ajustar_saldo_cliente(venta.cliente_id, venta.saldo_pendiente - saldo_anterior)
+                
                 # Registrar movimiento en caja
                 try:
                     movimiento = MovimientoCaja(
@@ -353,6 +386,7 @@ def crear():
                 
                 # Commit de todos los cambios
                 db.session.commit()
+                invalidar_kpis('abono creado')
                 
                 monto_formateado = f"${float(monto):,.0f}"
                 flash(f'Abono de {monto_formateado} registrado exitosamente', 'success')
@@ -376,18 +410,7 @@ def crear():
 @vendedor_cobrador_required
 def cargar_ventas(cliente_id):
     try:
-        # Consulta base para ventas a crédito con saldo pendiente
-        query = Venta.query.filter(
-            Venta.cliente_id == cliente_id,
-            Venta.tipo == 'credito',
-            Venta.saldo_pendiente > 0
-        )
-        
-        # Si es vendedor, filtrar solo sus ventas
-        if current_user.is_vendedor() and not current_user.is_admin():
-            query = query.filter(Venta.vendedor_id == current_user.id)
-        
-        ventas = query.all()
+        ventas = ventas_pendientes_cliente(cliente_id, current_user).all()
         
         # Preparar datos para la respuesta JSON
         ventas_json = []
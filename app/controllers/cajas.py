@@ -63,6 +63,17 @@ def crear():
     
     return render_template('cajas/crear.html', form=form)
 
+def consulta_movimientos(caja_id, desde=None, hasta=None, tipo=None):
+    """Movimientos de la caja en el período, del más reciente al más antiguo"""
+    query = MovimientoCaja.query.filter_by(caja_id=caja_id)
+    if desde:
+        query = query.filter(MovimientoCaja.fecha >= desde)
+    if hasta:
+        query = query.filter(MovimientoCaja.fecha <= hasta)
+    if tipo:
+        query = query.filter_by(tipo=tipo)
+    return query.order_by(MovimientoCaja.fecha.desc())
+
 @cajas_bp.route('/<int:id>/movimientos')
 @login_required
 def movimientos(id):
@@ -73,20 +84,10 @@ def movimientos(id):
     hasta = request.args.get('hasta')
     tipo = request.args.get('tipo')
     
-    query = MovimientoCaja.query.filter_by(caja_id=id)
-    
-    if desde:
-        desde_dt = datetime.strptime(desde, '%Y-%m-%d')
-        query = query.filter(MovimientoCaja.fecha >= desde_dt)
-    
-    if hasta:
-        hasta_dt = datetime.strptime(hasta, '%Y-%m-%d')
-        query = query.filter(MovimientoCaja.fecha <= hasta_dt)
-    
-    if tipo:
-        query = query.filter_by(tipo=tipo)
+    desde_dt = datetime.strptime(desde, '%Y-%m-%d') if desde else None
+    hasta_dt = datetime.strptime(hasta, '%Y-%m-%d') if hasta else None
     
-    movimientos = query.order_by(MovimientoCaja.fecha.desc()).all()
+    movimientos = consulta_movimientos(id, desde_dt, hasta_dt, tipo).all()
     
     # Calcular totales
     total_entradas = sum(m.monto for m in movimientos if m.tipo == 'entrada')
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models import Cliente, Venta, Credito, Abono
@@ -9,19 +9,19 @@ from app.decorators import (
     admin_required
 )
 from app.pdf.cliente import generar_pdf_historial
+from app.query_profiles import perfil
+from app.busqueda_clientes import buscar_clientes
 
 clientes_bp = Blueprint('clientes', __name__, url_prefix='/clientes')
 
-@clientes_bp.route('/')
-@login_required
-def index():
-    busqueda = request.args.get('busqueda', '')
+def clientes_visibles(usuario):
+    """Consulta de los clientes que el usuario puede ver"""
     query = Cliente.query
 
     # Filtrar por vendedor si es vendedor y no admin
-    if current_user.is_vendedor() and not current_user.is_admin():
+    if usuario.is_vendedor() and not usuario.is_admin():
         # Obtener IDs de clientes que tienen ventas hechas por este vendedor O que fueron creados por él
-        clientes_ids_ventas = db.session.query(Venta.cliente_id).filter_by(vendedor_id=current_user.id).distinct()
+        clientes_ids_ventas = db.session.query(Venta.cliente_id).filter_by(vendedor_id=usuario.id).distinct()
         
         # Para clientes creados offline, verificar si tienen un campo created_by
         clientes_ids_creados = db.session.query(Cliente.id).filter(
@@ -29,7 +29,7 @@ def index():
                 db.session.query(Cliente.id).filter(
                     # Aquí puedes agregar lógica para clientes creados por el usuario
                     # Por ejemplo, si agregas un campo created_by al modelo Cliente
-                    Cliente.created_by == current_user.id
+                    Cliente.created_by == usuario.id
                 )
             )
         ).distinct()
@@ -39,12 +39,17 @@ def index():
         query = query.filter(Cliente.id.in_(clientes_ids_comb))
 
     # Si es cobrador, mostrar solo clientes con créditos pendientes
-    elif current_user.is_cobrador() and not current_user.is_admin():
-        clientes_con_creditos = db.session.query(Venta.cliente_id).filter(
-            Venta.tipo == 'credito',
-            Venta.saldo_pendiente > 0
-        ).distinct()
-        query = query.filter(Cliente.id.in_(clientes_con_creditos))
+    elif usuario.is_cobrador() and not usuario.is_admin():
+        query = query.filter(Cliente.saldo_pendiente_total > 0)
+
+    return query
+
+@clientes_bp.route('/')
+@login_required
+def index():
+    busqueda = request.args.get('busqueda', '')
+    orden = request.args.get('orden', '')
+    query = clientes_visibles(current_user)
 
     if busqueda:
         query = query.filter(
@@ -52,12 +57,46 @@ def index():
             Cliente.cedula.ilike(f"%{busqueda}%")
         )
 
-    clientes = query.all()
+    if orden == 'saldo':
+        query = query.order_by(Cliente.saldo_pendiente_total.desc(), Cliente.id)
+
+    clientes = query.options(*perfil('cliente_lista')).all()
 
     # Determinar si el usuario actual solo puede consultar
     solo_consulta = current_user.is_vendedor() and not current_user.is_admin()
 
-    return render_template('clientes/index.html', clientes=clientes, busqueda=busqueda, solo_consulta=solo_consulta)
+    return render_template('clientes/index.html', clientes=clientes, busqueda=busqueda, orden=orden,
+                           solo_consulta=solo_consulta)
+
+@clientes_bp.route('/buscar')
+@login_required
+def buscar():
+    """
+    Typeahead de clientes para los formularios de venta y abono:
+    ?q=término&limite=N&con_saldo=1 retorna [{id, texto, ...}] por relevancia
+    """
+    try:
+        limite = request.args.get('limite', current_app.config['CLIENTES_BUSQUEDA_LIMITE'], type=int)
+        limite = max(1, min(limite, current_app.config['CLIENTES_BUSQUEDA_LIMITE_MAX']))
+        con_saldo = request.args.get('con_saldo') in ('1', 'true')
+
+        vendedor_id = None
+        if con_saldo and current_user.is_vendedor() and not current_user.is_admin():
+            vendedor_id = current_user.id
+
+        clientes = buscar_clientes(request.args.get('q', ''), limite, con_saldo, vendedor_id)
+
+        return jsonify([{
+            'id': c.id,
+            'texto': f"{c.nombre} - {c.cedula}",
+            'nombre': c.nombre,
+            'cedula': c.cedula,
+            'telefono': c.telefono,
+            'saldo_pendiente': c.saldo_pendiente()
+        } for c in clientes])
+    except Exception as e:
+        current_app.logger.error(f"Error buscando clientes: {e}")
+        return jsonify({'error': 'Error buscando clientes'}), 500
 
 @clientes_bp.route('/crear', methods=['GET', 'POST'])
 @login_required
@@ -4,6 +4,7 @@ from app import db
 from app.models import Configuracion
 from app.forms import ConfiguracionForm
 from app.decorators import admin_required
+from app.utils import invalidar_configuracion
 from werkzeug.utils import secure_filename
 import os
 
@@ -54,6 +55,7 @@ def editar():
         # Guardar cambios
         try:
             db.session.commit()
+            invalidar_configuracion()
             flash('Configuración actualizada exitosamente', 'success')
         except Exception as e:
             db.session.rollback()
@@ -5,10 +5,21 @@ from app.models import Credito, Cliente, Venta
 from app.forms import CreditoForm
 from app.decorators import cobrador_required, vendedor_cobrador_required
 from app.pdf.credito import generar_pdf_credito
+from app.query_profiles import perfil
 from datetime import datetime
 
 creditos_bp = Blueprint('creditos', __name__, url_prefix='/creditos')
 
+def creditos_pendientes(usuario):
+    """Ventas a crédito con saldo pendiente; el vendedor solo ve las suyas"""
+    query = Venta.query.filter(
+        Venta.tipo == 'credito',
+        Venta.saldo_pendiente > 0
+    )
+    if usuario.is_vendedor():
+        query = query.filter(Venta.vendedor_id == usuario.id)
+    return query
+
 @creditos_bp.route('/')
 @login_required
 @vendedor_cobrador_required
@@ -19,15 +30,7 @@ def index():
         desde_str = request.args.get('desde', '')
         hasta_str = request.args.get('hasta', '')
         
-        # Consulta base: ventas a crédito con saldo pendiente
-        query = Venta.query.filter(
-            Venta.tipo == 'credito',
-            Venta.saldo_pendiente > 0
-        )
-        
-        # Si es vendedor, filtrar por sus propias ventas
-        if current_user.is_vendedor():
-            query = query.filter(Venta.vendedor_id == current_user.id)
+        query = creditos_pendientes(current_user)
         
         if busqueda:
             # Buscar por nombre de cliente
@@ -49,7 +52,7 @@ def index():
                 flash('Fecha "hasta" inválida.', 'warning')
 
         # Ordenar por fecha descendente
-        creditos = query.order_by(Venta.fecha.desc()).all()
+        creditos = query.options(*perfil('venta_lista')).order_by(Venta.fecha.desc()).all()
         
         # Calcular totales
         total_creditos = sum(c.total for c in creditos)
@@ -1,7 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
+from sqlalchemy.orm import load_only
 from app import db
 from app.models import Producto
+from app.api.etag import leer_since, version_coleccion, no_modificado, respuesta_no_modificada, respuesta_coleccion
 from app.forms import ProductoForm
 from app.decorators import vendedor_required, admin_required
 
@@ -20,6 +22,72 @@ def index():
     solo_consulta = current_user.is_vendedor() and not current_user.is_admin()
     return render_template('productos/index.html', productos=productos, busqueda=busqueda, solo_consulta=solo_consulta)
 
+def _producto_catalogo(p):
+    """Campos del catálogo que usa el formulario de venta"""
+    return {
+        'id': p.id,
+        'codigo': p.codigo,
+        'nombre': p.nombre,
+        'precio_venta': p.precio_venta,
+        'stock': p.stock,
+        'stock_minimo': p.stock_minimo,
+        'updated_at': p.updated_at.isoformat() if p.updated_at else None
+    }
+
+def consulta_catalogo(since=None):
+    """
+    Productos del catálogo (solo las columnas de _producto_catalogo), modificados
+    después de since si se indica. Se ordena por updated_at para que el índice
+    resuelva el filtro y el orden; el cliente indexa la copia por id.
+    """
+    query = Producto.query.options(load_only(
+        Producto.id, Producto.codigo, Producto.nombre, Producto.precio_venta,
+        Producto.stock, Producto.stock_minimo, Producto.updated_at
+    ))
+    if since:
+        query = query.filter(Producto.updated_at > since)
+    return query.order_by(Producto.updated_at, Producto.id)
+
+def producto_por_codigo(codigo):
+    """Búsqueda exacta por código, resuelta por el índice único"""
+    return Producto.query.filter_by(codigo=codigo.strip())
+
+@productos_bp.route('/catalogo')
+@login_required
+@vendedor_required
+def catalogo():
+    """
+    Catálogo versionado para el formulario de venta y su copia offline.
+    If-None-Match con el ETag vigente retorna 304; ?since= retorna solo los
+    productos modificados después de esa marca (incluidos los que quedaron sin
+    stock, para que el cliente los oculte). Si 'total' no coincide con la copia
+    local hubo eliminaciones y el cliente debe pedir el catálogo completo.
+    """
+    try:
+        since, error = leer_since()
+        if error:
+            return error
+
+        etag, total, watermark = version_coleccion(Producto)
+        if no_modificado(etag):
+            return respuesta_no_modificada(etag)
+
+        productos = consulta_catalogo(since).all()
+        return respuesta_coleccion([_producto_catalogo(p) for p in productos], etag, total, watermark)
+    except Exception as e:
+        current_app.logger.error(f"Error obteniendo catálogo de productos: {e}")
+        return jsonify({'error': 'Error obteniendo catálogo de productos'}), 500
+
+@productos_bp.route('/codigo/<path:codigo>')
+@login_required
+@vendedor_required
+def por_codigo(codigo):
+    """Búsqueda exacta por código (lector de código de barras)"""
+    producto = producto_por_codigo(codigo).first()
+    if not producto:
+        return jsonify({'error': f'No existe un producto con código {codigo}'}), 404
+    return jsonify(_producto_catalogo(producto))
+
 @productos_bp.route('/<int:id>')
 @login_required
 @vendedor_required
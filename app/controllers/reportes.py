@@ -1,18 +1,56 @@
-from flask import Blueprint, render_template, redirect, url_for, request, make_response, flash, jsonify, current_app
+from flask import Blueprint, render_template, redirect, url_for, request, make_response, flash, jsonify, current_app, abort, send_file
 from flask_login import login_required, current_user
 from app import db
-from app.models import Comision, Usuario, Venta, Abono, MovimientoCaja
+from app.models import Comision, Usuario, Venta, Abono, MovimientoCaja, TrabajoReporte
 from app.forms import ReporteComisionesForm
 from app.decorators import admin_required, vendedor_extended_required, vendedor_cobrador_required
-from datetime import datetime, timedelta
-import csv
-import io
-import pandas as pd
-from io import BytesIO
+from app.exportacion import responder_exportacion, filtros_comisiones, TIPO_XLSX
+from app.trabajos import construir_exportacion, encolar, serializar_trabajo
+from app.resumenes import resumen_ventas, resumen_abonos, resumen_movimientos
+from app.reportes_datos import (comisiones_dataframe, totales, totales_por_usuario, registros_por_usuario,
+                                pivote, columnas_pivote)
+from app.paginas import cursor_valido, paginar
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from datetime import date, datetime, timedelta
+import os
 
 
 reportes_bp = Blueprint('reportes', __name__, url_prefix='/reportes')
 
+# Comisiones del detalle por página en reportes.comisiones y su orden (keyset)
+COMISIONES_POR_PAGINA = 25
+ORDEN_COMISIONES = (Comision.usuario_id, Comision.fecha_generacion, Comision.id)
+
+# Registros del detalle por página en los reportes de ventas, abonos, egresos y créditos
+REPORTES_POR_PAGINA = 50
+
+def _formato_exportacion():
+    """Formato pedido por el botón de exportar: 'csv' o 'xlsx' (por defecto)"""
+    return 'csv' if request.form.get('export', request.form.get('exportar')) == 'csv' else 'xlsx'
+
+def _exportar(tipo, fecha_inicio, fecha_fin, **filtros):
+    """
+    Encola la exportación y redirige a la página de espera; con
+    TRABAJOS_EN_SEGUNDO_PLANO desactivado la genera en este request
+    """
+    parametros = {'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin}
+    parametros.update({k: v for k, v in filtros.items() if v})
+
+    if not current_app.config['TRABAJOS_EN_SEGUNDO_PLANO']:
+        return responder_exportacion(construir_exportacion(tipo, parametros), _formato_exportacion())
+
+    trabajo = encolar(tipo, parametros, _formato_exportacion(), current_user.id)
+    return redirect(url_for('reportes.trabajo', id=trabajo.id))
+
+def _trabajo_del_usuario(id):
+    """Trabajo de reporte visible para el usuario actual (el suyo, o cualquiera si es admin)"""
+    trabajo = TrabajoReporte.query.get_or_404(id)
+    if trabajo.usuario_id != current_user.id and not current_user.is_admin():
+        abort(404)
+    return trabajo
+
+
 @reportes_bp.route('/comisiones', methods=['GET', 'POST'])
 @login_required
 @vendedor_cobrador_required  
@@ -21,9 +59,11 @@ def comisiones():
     comisiones_por_usuario = {}
     total_base = 0
     total_comision = 0
+    total_cantidad = 0
     fecha_inicio = None
     fecha_fin = None
-    pagination = None
+    cursor = ''
+    siguiente_cursor = None
 
     # Si el usuario es vendedor o cobrador, solo mostrar sus propias comisiones
     if (current_user.is_vendedor() or current_user.is_cobrador()) and not current_user.is_admin():
@@ -60,55 +100,40 @@ def comisiones():
             
             # Usar la función corregida con manejo de errores
             try:
-                # Crear consulta manualmente para mejor control de errores
-                base_query = db.session.query(Comision, Usuario)\
-                    .join(Usuario, Comision.usuario_id == Usuario.id)\
-                    .filter(
-                        Comision.fecha_generacion >= fecha_inicio,
-                        Comision.fecha_generacion <= fecha_fin
-                    )
+                filtros = filtros_comisiones(fecha_inicio, fecha_fin, usuario_id)
                 
-                if usuario_id and usuario_id != 0:
-                    base_query = base_query.filter(Comision.usuario_id == usuario_id)
+                # Si se solicita exportar, se recorre la consulta por lotes sin cargarla aquí
+                if 'export' in request.form:
+                    return _exportar('comisiones', fecha_inicio, fecha_fin, usuario_id=usuario_id or None)
                 
-                # Ejecutar consulta con manejo de errores
-                try:
-                    all_comisiones = base_query.all()
-                except Exception as db_error:
-                    # Rollback y reintentar
-                    db.session.rollback()
-                    current_app.logger.error(f"Error en consulta comisiones: {db_error}")
-                    all_comisiones = base_query.all()
+                # Totales por usuario y generales vectorizados sobre las columnas (sin objetos del ORM)
+                df = comisiones_dataframe(filtros)
+                comisiones_por_usuario = registros_por_usuario(totales_por_usuario(df))
+                suma = totales(df, ['monto_base', 'monto_comision'])
+                total_base = suma['monto_base']
+                total_comision = suma['monto_comision']
+                total_cantidad = len(df)
                 
-                # Procesar resultados
-                comisiones_paginadas = all_comisiones[:25]  # Limitar para evitar problemas
+                for datos in comisiones_por_usuario.values():
+                    datos['comisiones'] = []
                 
-                if not comisiones_paginadas and (current_user.is_vendedor() or current_user.is_cobrador()):
+                if df.empty and (current_user.is_vendedor() or current_user.is_cobrador()):
                     flash('No se encontraron comisiones registradas para este período.', 'info')
                 
-                # Agrupar por usuario
-                for comision, usuario in comisiones_paginadas:
-                    if usuario.id not in comisiones_por_usuario:
-                        comisiones_por_usuario[usuario.id] = {
-                            'usuario': usuario,
-                            'comisiones': [],
-                            'total_base': 0,
-                            'total_comision': 0
-                        }
-
-                    comisiones_por_usuario[usuario.id]['comisiones'].append(comision)
-                    comisiones_por_usuario[usuario.id]['total_base'] += comision.monto_base
-                    comisiones_por_usuario[usuario.id]['total_comision'] += comision.monto_comision
+                # Detalle paginado por keyset sobre (usuario_id, fecha_generacion, id)
+                cursor = request.form.get('cursor', '')
+                if not cursor_valido(ORDEN_COMISIONES, cursor):
+                    flash('Página inválida, mostrando la primera página.', 'warning')
+                    cursor = ''
+                
+                pagina, siguiente_cursor = paginar(Comision.query.options(
+                    joinedload(Comision.venta).joinedload(Venta.cliente), joinedload(Comision.abono)
+                ).filter(*filtros), ORDEN_COMISIONES, cursor, COMISIONES_POR_PAGINA)
                 
-                # Calcular totales generales
-                for comision, usuario in all_comisiones:
-                    total_base += comision.monto_base
-                    total_comision += comision.monto_comision
+                for comision in pagina:
+                    if comision.usuario_id in comisiones_por_usuario:
+                        comisiones_por_usuario[comision.usuario_id]['comisiones'].append(comision)
 
-                # Si se solicita exportar Excel
-                if 'export' in request.form:
-                    return exportar_excel_comisiones([c for c, _ in all_comisiones], fecha_inicio, fecha_fin)
-                    
             except Exception as query_error:
                 current_app.logger.error(f"Error en procesamiento de comisiones: {query_error}")
                 flash("Error al procesar las comisiones. Intente nuevamente.", "danger")
@@ -124,9 +149,11 @@ def comisiones():
                           comisiones_por_usuario=comisiones_por_usuario,
                           total_base=total_base,
                           total_comision=total_comision,
+                          total_cantidad=total_cantidad,
                           fecha_inicio=fecha_inicio,
                           fecha_fin=fecha_fin,
-                          pagination=pagination)
+                          cursor=cursor,
+                          siguiente_cursor=siguiente_cursor)
 
 
 @reportes_bp.route('/comisiones/liquidar-masiva', methods=['GET', 'POST'])
@@ -138,27 +165,19 @@ def liquidar_masiva():
         fecha_inicio = datetime.strptime(request.form['fecha_inicio'], '%Y-%m-%d')
         fecha_fin = datetime.strptime(request.form['fecha_fin'], '%Y-%m-%d')
         usuario_id = request.form.get('usuario_id')
+        filtro_usuario = int(usuario_id) if usuario_id and usuario_id != '0' else None
         
         try:
-            # Construir consulta con mejor manejo de errores
-            query = Comision.query.filter(
-                Comision.fecha_generacion >= fecha_inicio,
-                Comision.fecha_generacion <= fecha_fin,
-                Comision.pagado == False
-            )
-            
-            if usuario_id and usuario_id != '0':
-                query = query.filter(Comision.usuario_id == usuario_id)
+            if 'exportar' in request.form:
+                # Exportar a Excel (o CSV) recorriendo la consulta por lotes
+                return _exportar('liquidacion', fecha_inicio, fecha_fin, usuario_id=filtro_usuario)
             
-            # Ejecutar consulta con manejo de errores
-            try:
-                comisiones = query.all()
-            except Exception as db_error:
-                db.session.rollback()
-                current_app.logger.error(f"Error en consulta liquidación masiva: {db_error}")
-                comisiones = query.all()
+            # Comisiones pendientes del período (las mismas que exporta la liquidación)
+            filtros = filtros_comisiones(fecha_inicio, fecha_fin, filtro_usuario) + [Comision.pagado == False]
             
             if 'liquidar' in request.form:
+                comisiones = Comision.query.filter(*filtros).all()
+                
                 # Marcar todas como pagadas
                 for comision in comisiones:
                     comision.pagado = True
@@ -167,28 +186,19 @@ def liquidar_masiva():
                 total_liquidado = sum(c.monto_comision for c in comisiones)
                 flash(f'Liquidadas {len(comisiones)} comisiones por un total de ${total_liquidado:,.0f}', 'success')
                 return redirect(url_for('reportes.liquidar_masiva'))
-            
-            elif 'exportar' in request.form:
-                # Exportar a Excel
-                return exportar_excel_liquidacion(comisiones, fecha_inicio, fecha_fin)
-            
-            # Agrupar por usuario para mostrar resumen
-            resumen_usuarios = {}
-            for comision in comisiones:
-                if comision.usuario_id not in resumen_usuarios:
-                    resumen_usuarios[comision.usuario_id] = {
-                        'usuario': comision.usuario,
-                        'total_comision': 0,
-                        'cantidad': 0
-                    }
-                resumen_usuarios[comision.usuario_id]['total_comision'] += comision.monto_comision
-                resumen_usuarios[comision.usuario_id]['cantidad'] += 1
+
+            # Resumen por usuario y pendiente por período calculados sobre las columnas, sin cargar las comisiones
+            df = comisiones_dataframe(filtros)
+            resumen_usuarios = registros_por_usuario(totales_por_usuario(df))
+            periodos = columnas_pivote(pivote(df, 'usuario_id', 'periodo', 'monto_comision'),
+                                       resumen_usuarios, 'por_periodo')
             
             return render_template('reportes/liquidar_masiva.html', 
                                  resumen_usuarios=resumen_usuarios,
+                                 periodos=periodos,
                                  fecha_inicio=fecha_inicio,
                                  fecha_fin=fecha_fin,
-                                 total_general=sum(c.monto_comision for c in comisiones))
+                                 total_general=totales(df, ['monto_comision'])['monto_comision'])
         
         except Exception as e:
             current_app.logger.error(f"Error en liquidación masiva: {e}")
@@ -228,97 +238,81 @@ def marcar_todas_pagadas():
     return jsonify({'success': False, 'error': 'No se seleccionaron comisiones'})
 
 
-def exportar_excel_liquidacion(comisiones, fecha_inicio, fecha_fin):
-    """Exporta liquidación de comisiones a Excel"""
-    data = []
-    
-    # Agrupar por usuario
-    usuarios_dict = {}
-    for comision in comisiones:
-        if comision.usuario_id not in usuarios_dict:
-            usuarios_dict[comision.usuario_id] = {
-                'nombre': comision.usuario.nombre,
-                'comisiones': [],
-                'total': 0
-            }
-        usuarios_dict[comision.usuario_id]['comisiones'].append(comision)
-        usuarios_dict[comision.usuario_id]['total'] += comision.monto_comision
-    
-    # Crear data para Excel
-    for usuario_id, datos in usuarios_dict.items():
-        # Fila de resumen del usuario
-        data.append({
-            'EMPLEADO': datos['nombre'],
-            'CONCEPTO': 'TOTAL A PAGAR',
-            'CANTIDAD': len(datos['comisiones']),
-            'MONTO': f"${datos['total']:,.0f}",
-            'PERIODO': f"{fecha_inicio.strftime('%d/%m/%Y')} - {fecha_fin.strftime('%d/%m/%Y')}"
-        })
-        
-        # Detalle de cada comisión
-        for comision in datos['comisiones']:
-            origen = "Venta" if comision.venta_id else "Abono" if comision.abono_id else "N/A"
-            data.append({
-                'EMPLEADO': '',
-                'CONCEPTO': f"{origen} #{comision.venta_id or comision.abono_id or 'N/A'}",
-                'CANTIDAD': f"{comision.porcentaje}%",
-                'MONTO': f"${comision.monto_comision:,.0f}",
-                'PERIODO': comision.fecha_generacion.strftime('%d/%m/%Y')
-            })
-        
-        # Fila vacía entre empleados
-        data.append({'EMPLEADO': '', 'CONCEPTO': '', 'CANTIDAD': '', 'MONTO': '', 'PERIODO': ''})
-    
-    df = pd.DataFrame(data)
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Liquidación Comisiones', index=False)
-        
-        # Formatear el Excel
-        workbook = writer.book
-        worksheet = writer.sheets['Liquidación Comisiones']
-        
-        # Ajustar anchos de columna
-        worksheet.column_dimensions['A'].width = 20
-        worksheet.column_dimensions['B'].width = 25
-        worksheet.column_dimensions['C'].width = 15
-        worksheet.column_dimensions['D'].width = 15
-        worksheet.column_dimensions['E'].width = 20
-    
-    output.seek(0)
-    
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=liquidacion_comisiones_{fecha_inicio.strftime("%Y%m%d")}-{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    
-    return response
-
 # NUEVOS REPORTES
+# Los totales y el desglose por día salen de los resúmenes diarios (app/resumenes.py);
+# el detalle en pantalla se pagina por keyset de a REPORTES_POR_PAGINA registros.
+def _periodo_reporte():
+    """(fecha_inicio, fecha_fin, fin del último día) del formulario; fecha_fin es inclusive"""
+    fecha_inicio = datetime.strptime(request.form['fecha_inicio'], '%Y-%m-%d')
+    fecha_fin = datetime.strptime(request.form['fecha_fin'], '%Y-%m-%d')
+    return fecha_inicio, fecha_fin, datetime.combine(fecha_fin, datetime.max.time())
+
+def _detalle(query, modelo):
+    """
+    Página del detalle del período por keyset sobre (fecha, id) descendente; el
+    cursor llega en el formulario. Retorna (registros, cursor, siguiente_cursor).
+    """
+    orden = (modelo.fecha, modelo.id)
+    cursor = request.form.get('cursor', '')
+    if not cursor_valido(orden, cursor):
+        flash('Página inválida, mostrando la primera página.', 'warning')
+        cursor = ''
+    registros, siguiente_cursor = paginar(query, orden, cursor, REPORTES_POR_PAGINA, descendente=True)
+    return registros, cursor, siguiente_cursor
+
+def ventas_del_periodo(fecha_inicio, fin, vendedor_id=None):
+    """Ventas del período con su cliente y vendedor, del vendedor si se indica"""
+    query = Venta.query.options(joinedload(Venta.cliente), joinedload(Venta.vendedor)).filter(
+        Venta.fecha >= fecha_inicio,
+        Venta.fecha <= fin
+    )
+    if vendedor_id:
+        query = query.filter(Venta.vendedor_id == vendedor_id)
+    return query
+
+def _resumen_abonos_de_vendedor(vendedor_id, fecha_inicio, fin):
+    """
+    Totales por día de los abonos a ventas del vendedor. El resumen de abonos
+    es por cobrador, así que se agrega sobre los abonos con un GROUP BY.
+    """
+    dia = func.date(Abono.fecha)
+    filas = db.session.query(
+        dia.label('fecha'), func.count(Abono.id).label('cantidad'),
+        func.coalesce(func.sum(Abono.monto), 0).label('total')
+    ).join(Venta, Abono.venta_id == Venta.id).filter(
+        Venta.vendedor_id == vendedor_id,
+        Abono.fecha >= fecha_inicio,
+        Abono.fecha <= fin
+    ).group_by(dia).order_by(dia).all()
+
+    por_dia = [{'fecha': f.fecha if isinstance(f.fecha, date) else date.fromisoformat(f.fecha),
+                'cantidad': f.cantidad, 'total': f.total} for f in filas]
+    return {
+        'cantidad': sum(d['cantidad'] for d in por_dia),
+        'total': sum(d['total'] for d in por_dia),
+        'por_dia': por_dia
+    }
+
 @reportes_bp.route('/ventas', methods=['GET', 'POST'])
 @login_required
 @vendedor_cobrador_required
 def ventas():
     if request.method == 'POST':
-        fecha_inicio = datetime.strptime(request.form['fecha_inicio'], '%Y-%m-%d')
-        fecha_fin = datetime.strptime(request.form['fecha_fin'], '%Y-%m-%d')
-        
-        query = Venta.query.filter(
-            Venta.fecha >= fecha_inicio,
-            Venta.fecha <= fecha_fin
-        )
+        fecha_inicio, fecha_fin, fin = _periodo_reporte()
         
         # Si es vendedor, filtrar solo sus ventas
-        if current_user.is_vendedor() and not current_user.is_admin():
-            query = query.filter(Venta.vendedor_id == current_user.id)
-        
-        ventas = query.all()
+        vendedor_id = current_user.id if current_user.is_vendedor() and not current_user.is_admin() else None
         
         if 'export' in request.form:
-            return exportar_excel_ventas(ventas, fecha_inicio, fecha_fin)
+            return _exportar('ventas', fecha_inicio, fecha_fin, vendedor_id=vendedor_id)
+        
+        resumen = resumen_ventas(fecha_inicio, fecha_fin, vendedor_id=vendedor_id)
+        
+        ventas, cursor, siguiente_cursor = _detalle(ventas_del_periodo(fecha_inicio, fin, vendedor_id), Venta)
         
-        return render_template('reportes/ventas.html', ventas=ventas, 
-                             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+        return render_template('reportes/ventas.html', ventas=ventas, resumen=resumen,
+                             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+                             cursor=cursor, siguiente_cursor=siguiente_cursor)
     
     return render_template('reportes/ventas.html')
 
@@ -327,25 +321,34 @@ def ventas():
 @vendedor_cobrador_required
 def abonos():
     if request.method == 'POST':
-        fecha_inicio = datetime.strptime(request.form['fecha_inicio'], '%Y-%m-%d')
-        fecha_fin = datetime.strptime(request.form['fecha_fin'], '%Y-%m-%d')
+        fecha_inicio, fecha_fin, fin = _periodo_reporte()
         
-        query = Abono.query.filter(
+        # Si es vendedor, filtrar solo abonos de sus ventas
+        vendedor_id = current_user.id if current_user.is_vendedor() and not current_user.is_admin() else None
+        
+        if 'export' in request.form:
+            return _exportar('abonos', fecha_inicio, fecha_fin, vendedor_id=vendedor_id)
+        
+        if vendedor_id:
+            resumen = _resumen_abonos_de_vendedor(vendedor_id, fecha_inicio, fin)
+        else:
+            resumen = resumen_abonos(fecha_inicio, fecha_fin)
+        
+        query = Abono.query.options(
+            joinedload(Abono.venta).joinedload(Venta.cliente), joinedload(Abono.cobrador), joinedload(Abono.caja)
+        ).filter(
             Abono.fecha >= fecha_inicio,
-            Abono.fecha <= fecha_fin  
+            Abono.fecha <= fin
         )
         
-        # Si es vendedor, filtrar solo abonos de sus ventas
-        if current_user.is_vendedor() and not current_user.is_admin():
-            query = query.join(Venta).filter(Venta.vendedor_id == current_user.id)
-        
-        abonos = query.all()
+        if vendedor_id:
+            query = query.join(Venta).filter(Venta.vendedor_id == vendedor_id)
         
-        if 'export' in request.form:
-            return exportar_excel_abonos(abonos, fecha_inicio, fecha_fin)
+        abonos, cursor, siguiente_cursor = _detalle(query, Abono)
         
-        return render_template('reportes/abonos.html', abonos=abonos,
-                             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+        return render_template('reportes/abonos.html', abonos=abonos, resumen=resumen,
+                             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+                             cursor=cursor, siguiente_cursor=siguiente_cursor)
     
     return render_template('reportes/abonos.html')
 
@@ -354,215 +357,81 @@ def abonos():
 @admin_required
 def egresos():
     if request.method == 'POST':
-        fecha_inicio = datetime.strptime(request.form['fecha_inicio'], '%Y-%m-%d')
-        fecha_fin = datetime.strptime(request.form['fecha_fin'], '%Y-%m-%d')
+        fecha_inicio, fecha_fin, fin = _periodo_reporte()
         
-        # Ajustar fecha_fin para incluir todo el día
-        fecha_fin_completa = datetime.combine(fecha_fin, datetime.max.time())
+        if 'export' in request.form:
+            return _exportar('egresos', fecha_inicio, fecha_fin)
         
-        egresos = MovimientoCaja.query.filter(
+        resumen = resumen_movimientos(fecha_inicio, fecha_fin, tipo='salida')
+        current_app.logger.info(f"Egresos desde {fecha_inicio} hasta {fin}: {resumen['cantidad']}")
+        
+        egresos, cursor, siguiente_cursor = _detalle(MovimientoCaja.query.options(joinedload(MovimientoCaja.caja)).filter(
             MovimientoCaja.tipo == 'salida',
             MovimientoCaja.fecha >= fecha_inicio,
-            MovimientoCaja.fecha <= fecha_fin_completa
-        ).all()
-        
-        # DEBUG: Agregar información de debug
-        current_app.logger.info(f"Buscando egresos desde {fecha_inicio} hasta {fecha_fin_completa}")
-        current_app.logger.info(f"Encontrados {len(egresos)} egresos")
-        
-        # Si no encuentra egresos, mostrar todos los movimientos para debug
-        if not egresos:
-            todos_movimientos = MovimientoCaja.query.filter(
-                MovimientoCaja.fecha >= fecha_inicio,
-                MovimientoCaja.fecha <= fecha_fin_completa
-            ).all()
-            current_app.logger.info(f"Total movimientos en el período: {len(todos_movimientos)}")
-            for mov in todos_movimientos:
-                current_app.logger.info(f"Movimiento ID: {mov.id}, Tipo: {mov.tipo}, Fecha: {mov.fecha}, Monto: {mov.monto}")
+            MovimientoCaja.fecha <= fin
+        ), MovimientoCaja)
         
-        if 'export' in request.form:
-            return exportar_excel_egresos(egresos, fecha_inicio, fecha_fin)
-        
-        return render_template('reportes/egresos.html', egresos=egresos,
-                             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+        return render_template('reportes/egresos.html', egresos=egresos, resumen=resumen,
+                             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+                             cursor=cursor, siguiente_cursor=siguiente_cursor)
     
     return render_template('reportes/egresos.html')
 
-def exportar_excel_comisiones(comisiones, fecha_inicio, fecha_fin):
-    """Exporta las comisiones a un archivo Excel con formato correcto"""
-    data = []
-    for comision in comisiones:
-        origen = "N/A"
-        if hasattr(comision, 'venta_id') and comision.venta_id and comision.venta:
-            origen = f"Venta #{comision.venta_id} - {comision.venta.cliente.nombre}"
-        elif hasattr(comision, 'abono_id') and comision.abono_id and comision.abono:
-            origen = f"Abono #{comision.abono_id} - Venta #{comision.abono.venta_id}"
-            
-        data.append({
-            'ID': comision.id,
-            'Fecha': comision.fecha_generacion.strftime('%d/%m/%Y %H:%M'),
-            'Usuario': comision.usuario.nombre,
-            'Monto Base': int(comision.monto_base),
-            'Porcentaje': f"{comision.porcentaje}%",
-            'Monto Comision': int(comision.monto_comision),
-            'Periodo': comision.periodo,
-            'Origen': origen,
-            'Pagado': 'Si' if comision.pagado else 'No'
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Crear el archivo Excel en memoria
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Comisiones', index=False)
-    
-    output.seek(0)
-    
-    # Crear respuesta
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=comisiones_{fecha_inicio.strftime("%Y%m%d")}-{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    
-    return response
-
-def exportar_excel_ventas(ventas, fecha_inicio, fecha_fin):
-    """Exporta las ventas a Excel"""
-    data = []
-    for venta in ventas:
-        data.append({
-            'ID': venta.id,
-            'Fecha': venta.fecha.strftime('%d/%m/%Y %H:%M'),
-            'Cliente': venta.cliente.nombre,
-            'Vendedor': venta.vendedor.nombre,
-            'Tipo': venta.tipo.title(),
-            'Total': int(venta.total),
-            'Saldo Pendiente': int(venta.saldo_pendiente) if venta.saldo_pendiente else 0,
-            'Estado': venta.estado.title()
-        })
-    
-    df = pd.DataFrame(data)
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Ventas', index=False)
-    
-    output.seek(0)
-    
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=ventas_{fecha_inicio.strftime("%Y%m%d")}-{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    
-    return response
-
-def exportar_excel_abonos(abonos, fecha_inicio, fecha_fin):
-    """Exporta los abonos a Excel"""
-    data = []
-    for abono in abonos:
-        data.append({
-            'ID': abono.id,
-            'Fecha': abono.fecha.strftime('%d/%m/%Y %H:%M'),
-            'Cliente': abono.venta.cliente.nombre if abono.venta else 'N/A',
-            'Factura': f"#{abono.venta_id}" if abono.venta_id else 'N/A',
-            'Monto': int(abono.monto),
-            'Cobrador': abono.cobrador.nombre,
-            'Caja': abono.caja.nombre if abono.caja else 'N/A',
-            'Notas': abono.notas or 'Sin notas'
-        })
-    
-    df = pd.DataFrame(data)
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Abonos', index=False)
-    
-    output.seek(0)
-    
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=abonos_{fecha_inicio.strftime("%Y%m%d")}-{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    
-    return response
-
-def exportar_excel_egresos(egresos, fecha_inicio, fecha_fin):
-    """Exporta los egresos a Excel"""
-    data = []
-    for egreso in egresos:
-        data.append({
-            'ID': egreso.id,
-            'Fecha': egreso.fecha.strftime('%d/%m/%Y %H:%M'),
-            'Caja': egreso.caja.nombre,
-            'Monto': int(egreso.monto),
-            'Descripcion': egreso.descripcion or 'Sin descripcion'
-        })
-    
-    df = pd.DataFrame(data)
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Egresos', index=False)
-    
-    output.seek(0)
-    
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=egresos_{fecha_inicio.strftime("%Y%m%d")}-{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    
-    return response
-
 @reportes_bp.route('/creditos', methods=['GET', 'POST'])
 @login_required
 @vendedor_cobrador_required
 def creditos():
     if request.method == 'POST':
-        fecha_inicio = datetime.strptime(request.form['fecha_inicio'], '%Y-%m-%d')
-        fecha_fin = datetime.strptime(request.form['fecha_fin'], '%Y-%m-%d')
+        fecha_inicio, fecha_fin, fin = _periodo_reporte()
         
-        query = Venta.query.filter(
+        # Si es vendedor, filtrar solo sus ventas
+        vendedor_id = current_user.id if current_user.is_vendedor() and not current_user.is_admin() else None
+        
+        if 'export' in request.form:
+            return _exportar('creditos', fecha_inicio, fecha_fin, vendedor_id=vendedor_id)
+        
+        resumen = resumen_ventas(fecha_inicio, fecha_fin, vendedor_id=vendedor_id, tipo='credito')
+        
+        query = Venta.query.options(joinedload(Venta.cliente), joinedload(Venta.vendedor)).filter(
             Venta.tipo == 'credito',
             Venta.fecha >= fecha_inicio,
-            Venta.fecha <= fecha_fin
+            Venta.fecha <= fin
         )
         
-        # Si es vendedor, filtrar solo sus ventas
-        if current_user.is_vendedor() and not current_user.is_admin():
-            query = query.filter(Venta.vendedor_id == current_user.id)
-        
-        creditos = query.all()
+        if vendedor_id:
+            query = query.filter(Venta.vendedor_id == vendedor_id)
         
-        if 'export' in request.form:
-            return exportar_excel_creditos(creditos, fecha_inicio, fecha_fin)
+        creditos, cursor, siguiente_cursor = _detalle(query, Venta)
         
-        return render_template('reportes/creditos.html', creditos=creditos,
-                             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+        return render_template('reportes/creditos.html', creditos=creditos, resumen=resumen,
+                             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+                             cursor=cursor, siguiente_cursor=siguiente_cursor)
     
     return render_template('reportes/creditos.html')
 
-def exportar_excel_creditos(creditos, fecha_inicio, fecha_fin):
-    """Exporta los créditos a Excel"""
-    data = []
-    for credito in creditos:
-        data.append({
-            'ID': credito.id,
-            'Fecha': credito.fecha.strftime('%d/%m/%Y %H:%M'),
-            'Cliente': credito.cliente.nombre,
-            'Vendedor': credito.vendedor.nombre,
-            'Total': int(credito.total),
-            'Saldo Pendiente': int(credito.saldo_pendiente) if credito.saldo_pendiente else 0,
-            'Estado': credito.estado.title(),
-            'Días Transcurridos': (datetime.now() - credito.fecha).days
-        })
-    
-    df = pd.DataFrame(data)
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Créditos', index=False)
-    
-    output.seek(0)
-    
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=creditos_{fecha_inicio.strftime("%Y%m%d")}-{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    
-    return response
+# TRABAJOS DE EXPORTACIÓN EN SEGUNDO PLANO
+@reportes_bp.route('/trabajos/<int:id>')
+@login_required
+def trabajo(id):
+    """Página de espera: consulta el estado hasta que el archivo está listo"""
+    return render_template('reportes/trabajo.html', trabajo=_trabajo_del_usuario(id))
+
+@reportes_bp.route('/trabajos/<int:id>/estado')
+@login_required
+def estado_trabajo(id):
+    return jsonify(serializar_trabajo(_trabajo_del_usuario(id)))
+
+@reportes_bp.route('/trabajos/<int:id>/descargar')
+@login_required
+def descargar_trabajo(id):
+    trabajo = _trabajo_del_usuario(id)
+    if trabajo.estado != 'completado' or not trabajo.ruta_resultado or not os.path.exists(trabajo.ruta_resultado):
+        flash('El archivo del reporte no está disponible.', 'warning')
+        return redirect(url_for('reportes.trabajo', id=id))
+
+    return send_file(
+        trabajo.ruta_resultado,
+        as_attachment=True,
+        download_name=trabajo.nombre_archivo,
+        mimetype='text/csv' if trabajo.formato == 'csv' else TIPO_XLSX
+    )
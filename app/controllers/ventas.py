@@ -6,6 +6,12 @@ from app.forms import VentaForm
 from app.decorators import vendedor_required, admin_required, cobrador_required
 from app.pdf.venta import generar_pdf_venta
 from app.utils import registrar_movimiento_caja, calcular_comision
+from app.kpi_cache import invalidar_kpis
+from app.query_profiles import perfil
+from app.paginas import cursor_valido, paginar
+from app.saldos import ajustar_saldo_cliente
+from app.inventario import agrupar_cantidades, bloquear_productos, validar_stock, descontar_stock, devolver_stock
+from sqlalchemy import func, case
 from datetime import datetime
 import traceback
 import json
@@ -14,6 +20,19 @@ from app.utils import shorten_url
 
 ventas_bp = Blueprint('ventas', __name__, url_prefix='/ventas')
 
+# Tamaño de página y orden (keyset, descendente) del listado de ventas
+VENTAS_POR_PAGINA = 50
+ORDEN_VENTAS = (Venta.fecha, Venta.id)
+
+def ventas_visibles(usuario):
+    """Consulta de las ventas que el usuario puede ver"""
+    query = Venta.query
+    # FILTRAR POR VENDEDOR si no es admin - CRÍTICO PARA ROLES
+    if usuario.is_vendedor() and not usuario.is_admin():
+        query = query.filter(Venta.vendedor_id == usuario.id)
+    # Los cobradores pueden ver todas las ventas, pero esto se puede ajustar
+    return query
+
 @ventas_bp.route('/')
 @login_required
 @vendedor_required
@@ -25,14 +44,7 @@ def index():
     tipo_filtro = request.args.get('tipo', '')
     estado_filtro = request.args.get('estado', '')
 
-    query = Venta.query
-    
-    # FILTRAR POR VENDEDOR si no es admin - CRÍTICO PARA ROLES
-    if current_user.is_vendedor() and not current_user.is_admin():
-        query = query.filter(Venta.vendedor_id == current_user.id)
-    elif current_user.is_cobrador() and not current_user.is_admin():
-        # Los cobradores pueden ver todas las ventas, pero esto se puede ajustar
-        pass
+    query = ventas_visibles(current_user)
         
     if busqueda:
         query = query.join(Cliente).filter(Cliente.nombre.ilike(f"%{busqueda}%"))
@@ -59,12 +71,32 @@ def index():
     if estado_filtro:
         query = query.filter(Venta.estado == estado_filtro)
 
-    ventas = query.order_by(Venta.fecha.desc()).all()
-    
-    # Calcular totales para el resumen
-    total_ventas_monto = sum(v.total for v in ventas)
-    ventas_a_credito_count = sum(1 for v in ventas if v.tipo == 'credito')
-    saldo_pendiente_total = sum(v.saldo_pendiente for v in ventas if v.tipo == 'credito' and v.saldo_pendiente is not None)
+    # Totales de todo el filtro en una sola consulta agregada
+    es_credito = Venta.tipo == 'credito'
+    total_ventas_count, total_ventas_monto, ventas_a_credito_count, saldo_pendiente_total = query.with_entities(
+        func.count(Venta.id),
+        func.coalesce(func.sum(Venta.total), 0),
+        func.count(case((es_credito, 1))),
+        func.coalesce(func.sum(case((es_credito, Venta.saldo_pendiente), else_=0)), 0)
+    ).one()
+
+    # Paginación por keyset sobre (fecha, id) descendente
+    cursor = request.args.get('cursor', '')
+    if not cursor_valido(ORDEN_VENTAS, cursor):
+        flash('Página inválida, mostrando las ventas más recientes.', 'warning')
+        cursor = ''
+
+    ventas, siguiente_cursor = paginar(query.options(*perfil('venta_lista')), ORDEN_VENTAS,
+                                       cursor, VENTAS_POR_PAGINA, descendente=True)
+
+    # Filtros activos para conservarlos en los enlaces de paginación
+    filtros = {clave: valor for clave, valor in {
+        'busqueda': busqueda,
+        'desde': desde_str,
+        'hasta': hasta_str,
+        'tipo': tipo_filtro,
+        'estado': estado_filtro
+    }.items() if valor}
 
     return render_template('ventas/index.html', 
                            ventas=ventas,
@@ -73,6 +105,10 @@ def index():
                            hasta=hasta_str,
                            tipo=tipo_filtro,
                            estado=estado_filtro,
+                           filtros=filtros,
+                           cursor=cursor,
+                           siguiente_cursor=siguiente_cursor,
+                           total_ventas_count=total_ventas_count,
                            total_ventas_monto=total_ventas_monto,
                            ventas_a_credito_count=ventas_a_credito_count,
                            saldo_pendiente_total=saldo_pendiente_total
@@ -88,22 +124,23 @@ def crear():
     # Obtener cliente_id de la URL si existe
     cliente_id_param = request.args.get('cliente_id', type=int)
     
-    # Cargar opciones para los selectores
-    clientes = Cliente.query.order_by(Cliente.nombre).all()
-    form.cliente.choices = [(c.id, f"{c.nombre} - {c.cedula}") for c in clientes]
+    # Los clientes se buscan con el typeahead (/clientes/buscar): el select
+    # solo lleva el cliente preseleccionado o el enviado en el formulario
+    if request.method == 'POST':
+        cliente_id_param = request.form.get('cliente', type=int)
+    cliente = Cliente.query.get(cliente_id_param) if cliente_id_param else None
+    form.cliente.choices = [(cliente.id, f"{cliente.nombre} - {cliente.cedula}")] if cliente else []
     
     # Si hay un cliente_id en la URL, preseleccionarlo
-    if cliente_id_param and request.method == 'GET':
-        cliente = Cliente.query.get(cliente_id_param)
-        if cliente:
-            form.cliente.data = cliente.id
+    if cliente and request.method == 'GET':
+        form.cliente.data = cliente.id
     
     # Cargar opciones para los selectores de caja
     cajas = Caja.query.all()
     form.caja.choices = [(c.id, c.nombre) for c in cajas]
     
-    # Obtener productos disponibles para la vista
-    productos_disponibles = Producto.query.filter(Producto.stock > 0).order_by(Producto.nombre).all()
+    # Los productos no se incrustan en la página: el formulario usa el
+    # catálogo versionado (/productos/catalogo) y su copia local
     
     # Log para depuración
     if request.method == 'POST':
@@ -124,10 +161,23 @@ def crear():
             # Verificar si hay productos seleccionados
             if not productos_seleccionados:
                 flash('No se seleccionaron productos para la venta.', 'danger')
-                return render_template('ventas/crear.html', form=form, productos=productos_disponibles)
+                return render_template('ventas/crear.html', form=form)
             
             current_app.logger.info(f"Productos decodificados: {productos_seleccionados}")
             
+            items = [(int(item.get('id', 0)), int(item.get('cantidad', 0)), float(item.get('precio_venta', 0)))
+                     for item in productos_seleccionados]
+            cantidades = agrupar_cantidades((producto_id, cantidad) for producto_id, cantidad, _ in items)
+            
+            # Verificar stock disponible: todos los productos en una consulta,
+            # bloqueados hasta el commit para que otra venta no los descuente
+            productos_db = bloquear_productos(cantidades.keys())
+            error_stock = validar_stock(productos_db, cantidades)
+            if error_stock:
+                flash(error_stock, 'danger')
+                db.session.rollback()
+                return render_template('ventas/crear.html', form=form)
+            
             # Crear nueva venta
             nueva_venta = Venta(
                 cliente_id=form.cliente.data,
@@ -150,23 +200,7 @@ def crear():
             # Procesar los productos seleccionados
             total_venta_calculado = 0
             
-            for item in productos_seleccionados:
-                producto_id = int(item.get('id', 0))
-                cantidad = int(item.get('cantidad', 0))
-                precio_venta = float(item.get('precio_venta', 0))
-                
-                # Verificar stock disponible
-                producto_db = Producto.query.get(producto_id)
-                if not producto_db:
-                    flash(f"Producto no encontrado.", 'danger')
-                    db.session.rollback()
-                    return render_template('ventas/crear.html', form=form, productos=productos_disponibles)
-                
-                if producto_db.stock < cantidad:
-                    flash(f"Stock insuficiente para {producto_db.nombre}. Disponible: {producto_db.stock}", 'danger')
-                    db.session.rollback()
-                    return render_template('ventas/crear.html', form=form, productos=productos_disponibles)
-                
+            for producto_id, cantidad, precio_venta in items:
                 # Crear detalle de venta
                 subtotal = cantidad * precio_venta
                 detalle = DetalleVenta(
@@ -178,17 +212,21 @@ def crear():
                 )
                 db.session.add(detalle)
                 
-                # Actualizar stock
-                producto_db.stock -= cantidad
-                
                 # Sumar al total
                 total_venta_calculado += subtotal
             
+            # Actualizar stock con un único UPDATE condicional
+            if not descontar_stock(cantidades):
+                flash('El stock de algún producto cambió mientras se registraba la venta. Intente de nuevo.', 'danger')
+                db.session.rollback()
+                return render_template('ventas/crear.html', form=form)
+            
             # Actualizar total y saldo pendiente
             nueva_venta.total = total_venta_calculado
             
             if form.tipo.data == 'credito':
                 nueva_venta.saldo_pendiente = total_venta_calculado
+                ajustar_saldo_cliente(nueva_venta.cliente_id, total_venta_calculado)
             else:  # contado
                 nueva_venta.saldo_pendiente = 0
                 
@@ -214,6 +252,7 @@ def crear():
             
             # Confirmar cambios
             db.session.commit()
+            invalidar_kpis('venta creada')
             flash(f'Venta #{nueva_venta.id} creada exitosamente!', 'success')
             
             # Redireccionar al detalle de la venta en lugar de la lista
@@ -222,7 +261,7 @@ def crear():
         except json.JSONDecodeError as e:
             current_app.logger.error(f"Error al decodificar JSON: {e}")
             flash('Error en el formato de productos seleccionados.', 'danger')
-            return render_template('ventas/crear.html', form=form, productos=productos_disponibles)
+            return render_template('ventas/crear.html', form=form)
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Error al crear venta: {e}")
@@ -233,12 +272,12 @@ def crear():
         current_app.logger.warning(f"Errores de validación: {form.errors}")
         flash('Por favor corrija los errores en el formulario.', 'warning')
     
-    return render_template('ventas/crear.html', form=form, productos=productos_disponibles)
+    return render_template('ventas/crear.html', form=form)
 
 @ventas_bp.route('/<int:id>')
 @login_required
 def detalle(id):
-    venta = Venta.query.get_or_404(id)
+    venta = Venta.query.options(*perfil('venta_detalle')).filter(Venta.id == id).first_or_404()
     
     # Si es vendedor y no administrador, verificar que sea su venta
     if current_user.is_vendedor() and not current_user.is_admin():
@@ -269,19 +308,21 @@ def eliminar(id):
     venta = Venta.query.get_or_404(id)
     try:
         # Restaurar stock de productos
-        for detalle in venta.detalles:
-            producto = Producto.query.get(detalle.producto_id)
-            if producto:
-                producto.stock += detalle.cantidad
+        devolver_stock(agrupar_cantidades((d.producto_id, d.cantidad) for d in venta.detalles))
         
-        # Eliminar movimientos de caja asociados
-        MovimientoCaja.query.filter_by(venta_id=id).delete()
+        # Eliminar movimientos de caja asociados (por el ORM, para descontarlos de los resúmenes diarios)
+        for movimiento in MovimientoCaja.query.filter_by(venta_id=id):
+            db.session.delete(movimiento)
         
         # Eliminar detalles y luego la venta
         DetalleVenta.query.filter_by(venta_id=id).delete()
         
+        if venta.tipo == 'credito':
+            ajustar_saldo_cliente(venta.cliente_id, -(venta.saldo_pendiente or 0))
+        
         db.session.delete(venta)
         db.session.commit()
+        invalidar_kpis('venta eliminada')
         flash(f'Venta #{id} eliminada exitosamente y stock restaurado.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,138 @@
+# app/dashboard_metrics.py
+"""
+Métricas del dashboard calculadas en la base de datos.
+
+Cada bloque de KPIs es una subconsulta agregada de una sola fila (count/sum con
+agregación condicional) y todas se unen en un único SELECT, así que el costo en
+memoria de Python no depende del volumen de ventas, créditos o abonos. Las
+ventas y abonos del mes se suman desde los resúmenes diarios (app/resumenes.py).
+"""
+from sqlalchemy import select, func, case, true
+from app import db
+from app.models import Cliente, Producto, Venta, Caja, Comision, ResumenVentasDia, ResumenAbonosDia
+from app.utils import periodo_comision_actual
+
+# KPIs monetarios (el resto son conteos)
+MONTOS = ('total_ventas_mes', 'total_creditos', 'total_abonos_mes', 'total_cajas', 'total_comision')
+
+def _sumar(condicion, columna):
+    """SUM condicional que retorna 0 en lugar de NULL"""
+    return func.coalesce(func.sum(case((condicion, columna), else_=0)), 0)
+
+def _contar(condicion):
+    """COUNT condicional"""
+    return func.count(case((condicion, 1)))
+
+def _agregado_clientes(usuario):
+    if usuario.is_admin():
+        consulta = select(func.count(Cliente.id).label('total_clientes'))
+    elif usuario.is_vendedor():
+        # Clientes a los que el vendedor les ha vendido
+        consulta = select(func.count(Venta.cliente_id.distinct()).label('total_clientes')).where(
+            Venta.vendedor_id == usuario.id
+        )
+    else:
+        # Clientes con créditos pendientes por cobrar
+        consulta = select(func.count(Venta.cliente_id.distinct()).label('total_clientes')).where(
+            Venta.tipo == 'credito',
+            Venta.saldo_pendiente > 0
+        )
+    return consulta.subquery('agg_clientes')
+
+def _agregado_productos():
+    consulta = select(
+        func.count(Producto.id).label('total_productos'),
+        _contar(Producto.stock <= 0).label('productos_agotados'),
+        _contar((Producto.stock <= Producto.stock_minimo) & (Producto.stock > 0)).label('productos_stock_bajo')
+    )
+    return consulta.subquery('agg_productos')
+
+def _agregado_ventas(usuario):
+    credito_activo = (Venta.tipo == 'credito') & (Venta.saldo_pendiente > 0)
+    consulta = select(
+        _contar(credito_activo).label('creditos_activos'),
+        _sumar(credito_activo, Venta.saldo_pendiente).label('total_creditos')
+    )
+    if usuario.is_vendedor() and not usuario.is_admin():
+        consulta = consulta.where(Venta.vendedor_id == usuario.id)
+    return consulta.subquery('agg_ventas')
+
+def _agregado_ventas_mes(usuario, desde):
+    consulta = select(
+        func.coalesce(func.sum(ResumenVentasDia.cantidad), 0).label('ventas_mes'),
+        func.coalesce(func.sum(ResumenVentasDia.total), 0).label('total_ventas_mes')
+    ).where(ResumenVentasDia.fecha >= desde.date())
+    if usuario.is_vendedor() and not usuario.is_admin():
+        consulta = consulta.where(ResumenVentasDia.vendedor_id == usuario.id)
+    return consulta.subquery('agg_ventas_mes')
+
+def _agregado_abonos(usuario, desde):
+    consulta = select(
+        func.coalesce(func.sum(ResumenAbonosDia.cantidad), 0).label('abonos_mes'),
+        func.coalesce(func.sum(ResumenAbonosDia.total), 0).label('total_abonos_mes')
+    ).where(ResumenAbonosDia.fecha >= desde.date())
+    if usuario.is_cobrador() and not usuario.is_admin():
+        consulta = consulta.where(ResumenAbonosDia.cobrador_id == usuario.id)
+    return consulta.subquery('agg_abonos')
+
+def _agregado_cajas():
+    consulta = select(func.coalesce(func.sum(Caja.saldo_actual), 0).label('total_cajas'))
+    return consulta.subquery('agg_cajas')
+
+def _agregado_comisiones(usuario):
+    fecha_inicio, fecha_fin = periodo_comision_actual()
+    consulta = select(
+        func.coalesce(func.sum(Comision.monto_comision), 0).label('total_comision')
+    ).where(
+        Comision.usuario_id == usuario.id,
+        Comision.fecha_generacion >= fecha_inicio,
+        Comision.fecha_generacion <= fecha_fin
+    )
+    return consulta.subquery('agg_comisiones')
+
+def calcular_metricas_dashboard(usuario, desde):
+    """
+    Calcula los KPIs del dashboard visibles para el rol del usuario, con valores
+    numéricos sin formatear. 'desde' es el inicio del período (primer día del mes).
+    """
+    metricas = {
+        'total_clientes': 0,
+        'total_productos': 0,
+        'productos_agotados': 0,
+        'productos_stock_bajo': 0,
+        'ventas_mes': 0,
+        'total_ventas_mes': 0,
+        'creditos_activos': 0,
+        'total_creditos': 0,
+        'abonos_mes': 0,
+        'total_abonos_mes': 0,
+        'total_cajas': 0,
+        'total_comision': 0
+    }
+
+    ve_ventas = usuario.is_vendedor() or usuario.is_admin()
+    ve_abonos = usuario.is_cobrador() or usuario.is_admin()
+
+    subconsultas = [_agregado_clientes(usuario), _agregado_ventas(usuario)]
+    if ve_ventas:
+        subconsultas.append(_agregado_ventas_mes(usuario, desde))
+        subconsultas.append(_agregado_productos())
+    if ve_abonos:
+        subconsultas.append(_agregado_abonos(usuario, desde))
+    if usuario.is_admin():
+        subconsultas.append(_agregado_cajas())
+    if usuario.is_vendedor() or usuario.is_cobrador():
+        subconsultas.append(_agregado_comisiones(usuario))
+
+    # Cada subconsulta retorna exactamente una fila: el JOIN ON TRUE las combina en una
+    origen = subconsultas[0]
+    for subconsulta in subconsultas[1:]:
+        origen = origen.join(subconsulta, true())
+
+    columnas = [columna for subconsulta in subconsultas for columna in subconsulta.c]
+    fila = db.session.execute(select(*columnas).select_from(origen)).mappings().one()
+
+    for clave, valor in fila.items():
+        metricas[clave] = float(valor) if clave in MONTOS else int(valor)
+
+    return metricas
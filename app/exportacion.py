@@ -0,0 +1,320 @@
+# app/exportacion.py
+"""
+Exportación de reportes a CSV y Excel sin cargar el período completo en memoria.
+
+Cada exportación se define como una Exportacion: nombre de archivo, hoja,
+encabezados y una función que genera las filas ya formateadas. Las filas salen
+de consultas proyectadas (solo las columnas necesarias, con los JOIN de los
+nombres) leídas por lotes con un cursor del lado del servidor (yield_per), sin
+hidratar objetos del ORM ni armar listas intermedias.
+
+- CSV: respuesta por partes (stream_with_context), los primeros bytes salen
+  con el primer lote.
+- XLSX: openpyxl en modo write-only, que escribe cada fila al archivo temporal
+  de la hoja en lugar de mantenerla en memoria; el libro terminado se envía
+  por bloques desde un archivo temporal.
+"""
+import csv
+import io
+import tempfile
+from collections import namedtuple
+from datetime import datetime
+
+from flask import Response, current_app, stream_with_context
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import Venta, Abono, Cliente, Usuario, Caja, MovimientoCaja, Comision
+
+# filas: función sin argumentos que retorna un iterador de listas (una por fila)
+Exportacion = namedtuple('Exportacion', 'archivo hoja encabezados filas anchos')
+
+TIPO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def iterar_consulta(consulta):
+    """Recorre una consulta Core por lotes con cursor del lado del servidor"""
+    lote = current_app.config['EXPORTACION_LOTE']
+    resultado = db.session.execute(consulta.execution_options(yield_per=lote))
+    try:
+        for fila in resultado:
+            yield fila
+    finally:
+        resultado.close()
+
+def _sufijo_periodo(fecha_inicio, fecha_fin):
+    return f"{fecha_inicio.strftime('%Y%m%d')}-{fecha_fin.strftime('%Y%m%d')}"
+
+def _fecha(valor):
+    return valor.strftime('%d/%m/%Y %H:%M') if valor else ''
+
+def _entero(valor):
+    return int(valor) if valor else 0
+
+# --- Motores de salida ---
+
+def _generar_csv(exportacion):
+    lote = current_app.config['EXPORTACION_LOTE']
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    # BOM para que Excel reconozca UTF-8 al abrir el CSV
+    buffer.write('\ufeff')
+    escritor.writerow(exportacion.encabezados)
+
+    for numero, fila in enumerate(exportacion.filas(), start=1):
+        escritor.writerow(fila)
+        if numero % lote == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    yield buffer.getvalue()
+
+def escribir_csv(exportacion, destino):
+    """Escribe el CSV completo en la ruta 'destino' (exportaciones en segundo plano)"""
+    with open(destino, 'w', encoding='utf-8', newline='') as archivo:
+        for bloque in _generar_csv(exportacion):
+            archivo.write(bloque)
+
+def escribir_xlsx(exportacion, destino):
+    """Escribe el libro en modo write-only sobre 'destino' (ruta o archivo binario)"""
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(exportacion.hoja)
+
+    for indice, ancho in enumerate(exportacion.anchos or [], start=1):
+        hoja.column_dimensions[get_column_letter(indice)].width = ancho
+
+    negrita = Font(bold=True)
+    encabezados = []
+    for encabezado in exportacion.encabezados:
+        celda = WriteOnlyCell(hoja, value=encabezado)
+        celda.font = negrita
+        encabezados.append(celda)
+    hoja.append(encabezados)
+
+    for fila in exportacion.filas():
+        hoja.append(fila)
+
+    libro.save(destino)
+
+def _leer_en_bloques(archivo, tamano=64 * 1024):
+    try:
+        archivo.seek(0)
+        while True:
+            bloque = archivo.read(tamano)
+            if not bloque:
+                break
+            yield bloque
+    finally:
+        archivo.close()
+
+def responder_exportacion(exportacion, formato='xlsx'):
+    """Respuesta HTTP con la exportación en CSV (streaming) o XLSX"""
+    if formato == 'csv':
+        response = Response(stream_with_context(_generar_csv(exportacion)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename={exportacion.archivo}.csv'
+        # Evitar que un proxy (nginx) acumule la respuesta completa antes de enviarla
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    archivo = tempfile.TemporaryFile()
+    try:
+        escribir_xlsx(exportacion, archivo)
+        tamano = archivo.tell()
+    except Exception:
+        archivo.close()
+        raise
+
+    response = Response(_leer_en_bloques(archivo), mimetype=TIPO_XLSX, direct_passthrough=True)
+    response.headers['Content-Disposition'] = f'attachment; filename={exportacion.archivo}.xlsx'
+    response.headers['Content-Length'] = str(tamano)
+    return response
+
+# --- Definiciones de las exportaciones de reportes ---
+
+def exportacion_ventas(fecha_inicio, fecha_fin, vendedor_id=None, solo_credito=False):
+    """Ventas (o solo créditos) del período, fecha_fin inclusive; vendedor_id restringe a las suyas"""
+    vendedor = aliased(Usuario)
+    consulta = select(
+        Venta.id, Venta.fecha, Cliente.nombre.label('cliente'), vendedor.nombre.label('vendedor'),
+        Venta.tipo, Venta.total, Venta.saldo_pendiente, Venta.estado
+    ).join(Cliente, Venta.cliente_id == Cliente.id).join(
+        vendedor, Venta.vendedor_id == vendedor.id
+    ).where(
+        Venta.fecha >= fecha_inicio,
+        Venta.fecha <= datetime.combine(fecha_fin, datetime.max.time())
+    ).order_by(Venta.fecha, Venta.id)
+
+    if solo_credito:
+        consulta = consulta.where(Venta.tipo == 'credito')
+    if vendedor_id:
+        consulta = consulta.where(Venta.vendedor_id == vendedor_id)
+
+    if solo_credito:
+        ahora = datetime.now()
+
+        def filas():
+            for v in iterar_consulta(consulta):
+                yield [v.id, _fecha(v.fecha), v.cliente, v.vendedor, _entero(v.total),
+                       _entero(v.saldo_pendiente), (v.estado or '').title(), (ahora - v.fecha).days]
+
+        return Exportacion(
+            f'creditos_{_sufijo_periodo(fecha_inicio, fecha_fin)}', 'Créditos',
+            ['ID', 'Fecha', 'Cliente', 'Vendedor', 'Total', 'Saldo Pendiente', 'Estado', 'Días Transcurridos'],
+            filas, None
+        )
+
+    def filas():
+        for v in iterar_consulta(consulta):
+            yield [v.id, _fecha(v.fecha), v.cliente, v.vendedor, (v.tipo or '').title(),
+                   _entero(v.total), _entero(v.saldo_pendiente), (v.estado or '').title()]
+
+    return Exportacion(
+        f'ventas_{_sufijo_periodo(fecha_inicio, fecha_fin)}', 'Ventas',
+        ['ID', 'Fecha', 'Cliente', 'Vendedor', 'Tipo', 'Total', 'Saldo Pendiente', 'Estado'],
+        filas, None
+    )
+
+def exportacion_abonos(fecha_inicio, fecha_fin, vendedor_id=None):
+    """Abonos del período, fecha_fin inclusive; vendedor_id restringe a los abonos de sus ventas"""
+    cobrador = aliased(Usuario)
+    consulta = select(
+        Abono.id, Abono.fecha, Cliente.nombre.label('cliente'), Abono.venta_id, Abono.monto,
+        cobrador.nombre.label('cobrador'), Caja.nombre.label('caja'), Abono.notas
+    ).outerjoin(Venta, Abono.venta_id == Venta.id).outerjoin(
+        Cliente, Venta.cliente_id == Cliente.id
+    ).outerjoin(cobrador, Abono.cobrador_id == cobrador.id).outerjoin(
+        Caja, Abono.caja_id == Caja.id
+    ).where(
+        Abono.fecha >= fecha_inicio,
+        Abono.fecha <= datetime.combine(fecha_fin, datetime.max.time())
+    ).order_by(Abono.fecha, Abono.id)
+
+    if vendedor_id:
+        consulta = consulta.where(Venta.vendedor_id == vendedor_id)
+
+    def filas():
+        for a in iterar_consulta(consulta):
+            yield [a.id, _fecha(a.fecha), a.cliente or 'N/A',
+                   f"#{a.venta_id}" if a.venta_id else 'N/A', _entero(a.monto),
+                   a.cobrador or '', a.caja or 'N/A', a.notas or 'Sin notas']
+
+    return Exportacion(
+        f'abonos_{_sufijo_periodo(fecha_inicio, fecha_fin)}', 'Abonos',
+        ['ID', 'Fecha', 'Cliente', 'Factura', 'Monto', 'Cobrador', 'Caja', 'Notas'],
+        filas, None
+    )
+
+def exportacion_egresos(fecha_inicio, fecha_fin):
+    """Salidas de caja del período (fecha_fin incluye todo el día)"""
+    fecha_fin_completa = datetime.combine(fecha_fin, datetime.max.time())
+    consulta = select(
+        MovimientoCaja.id, MovimientoCaja.fecha, Caja.nombre.label('caja'),
+        MovimientoCaja.monto, MovimientoCaja.descripcion
+    ).join(Caja, MovimientoCaja.caja_id == Caja.id).where(
+        MovimientoCaja.tipo == 'salida',
+        MovimientoCaja.fecha >= fecha_inicio,
+        MovimientoCaja.fecha <= fecha_fin_completa
+    ).order_by(MovimientoCaja.fecha, MovimientoCaja.id)
+
+    def filas():
+        for e in iterar_consulta(consulta):
+            yield [e.id, _fecha(e.fecha), e.caja, _entero(e.monto), e.descripcion or 'Sin descripcion']
+
+    return Exportacion(
+        f'egresos_{_sufijo_periodo(fecha_inicio, fecha_fin)}', 'Egresos',
+        ['ID', 'Fecha', 'Caja', 'Monto', 'Descripcion'],
+        filas, None
+    )
+
+def filtros_comisiones(fecha_inicio, fecha_fin, usuario_id=None):
+    """Condiciones de las comisiones generadas en el período (fecha_fin inclusive), de un usuario o de todos (0/None)"""
+    filtros = [
+        Comision.fecha_generacion >= fecha_inicio,
+        Comision.fecha_generacion <= datetime.combine(fecha_fin, datetime.max.time())
+    ]
+    if usuario_id:
+        filtros.append(Comision.usuario_id == usuario_id)
+    return filtros
+
+def exportacion_comisiones(fecha_inicio, fecha_fin, usuario_id=None):
+    """Comisiones generadas en el período (fecha_fin inclusive), con el origen (venta o abono)"""
+    venta = aliased(Venta)
+    abono = aliased(Abono)
+    consulta = select(
+        Comision.id, Comision.fecha_generacion, Usuario.nombre.label('usuario'),
+        Comision.monto_base, Comision.porcentaje, Comision.monto_comision, Comision.periodo,
+        Comision.pagado, Comision.venta_id, Comision.abono_id,
+        Cliente.nombre.label('cliente'), abono.venta_id.label('abono_venta_id')
+    ).join(Usuario, Comision.usuario_id == Usuario.id).outerjoin(
+        venta, Comision.venta_id == venta.id
+    ).outerjoin(Cliente, venta.cliente_id == Cliente.id).outerjoin(
+        abono, Comision.abono_id == abono.id
+    ).where(*filtros_comisiones(fecha_inicio, fecha_fin, usuario_id)).order_by(Comision.fecha_generacion, Comision.id)
+
+    def filas():
+        for c in iterar_consulta(consulta):
+            origen = "N/A"
+            if c.venta_id and c.cliente is not None:
+                origen = f"Venta #{c.venta_id} - {c.cliente}"
+            elif c.abono_id and c.abono_venta_id is not None:
+                origen = f"Abono #{c.abono_id} - Venta #{c.abono_venta_id}"
+            yield [c.id, _fecha(c.fecha_generacion), c.usuario, _entero(c.monto_base),
+                   f"{c.porcentaje}%", _entero(c.monto_comision), c.periodo, origen,
+                   'Si' if c.pagado else 'No']
+
+    return Exportacion(
+        f'comisiones_{_sufijo_periodo(fecha_inicio, fecha_fin)}', 'Comisiones',
+        ['ID', 'Fecha', 'Usuario', 'Monto Base', 'Porcentaje', 'Monto Comision', 'Periodo', 'Origen', 'Pagado'],
+        filas, None
+    )
+
+def exportacion_liquidacion(fecha_inicio, fecha_fin, usuario_id=None):
+    """
+    Liquidación de comisiones pendientes por empleado: una fila de total por
+    empleado seguida de sus comisiones. Los totales salen de un GROUP BY y el
+    detalle se recorre ordenado por empleado.
+    """
+    filtros = filtros_comisiones(fecha_inicio, fecha_fin, usuario_id) + [Comision.pagado == False]
+
+    totales = select(
+        Comision.usuario_id, func.count(Comision.id).label('cantidad'),
+        func.coalesce(func.sum(Comision.monto_comision), 0).label('total')
+    ).where(*filtros).group_by(Comision.usuario_id)
+
+    detalle = select(
+        Comision.usuario_id, Usuario.nombre, Comision.venta_id, Comision.abono_id,
+        Comision.porcentaje, Comision.monto_comision, Comision.fecha_generacion
+    ).join(Usuario, Comision.usuario_id == Usuario.id).where(*filtros).order_by(
+        Usuario.nombre, Comision.usuario_id, Comision.fecha_generacion, Comision.id
+    )
+
+    periodo = f"{fecha_inicio.strftime('%d/%m/%Y')} - {fecha_fin.strftime('%d/%m/%Y')}"
+
+    def filas():
+        resumen = {t.usuario_id: t for t in db.session.execute(totales)}
+        actual = None
+        for c in iterar_consulta(detalle):
+            if c.usuario_id != actual:
+                if actual is not None:
+                    # Fila vacía entre empleados
+                    yield ['', '', '', '', '']
+                actual = c.usuario_id
+                t = resumen[c.usuario_id]
+                yield [c.nombre, 'TOTAL A PAGAR', t.cantidad, f"${t.total:,.0f}", periodo]
+            origen = "Venta" if c.venta_id else "Abono" if c.abono_id else "N/A"
+            yield ['', f"{origen} #{c.venta_id or c.abono_id or 'N/A'}", f"{c.porcentaje}%",
+                   f"${c.monto_comision:,.0f}", c.fecha_generacion.strftime('%d/%m/%Y')]
+        if actual is not None:
+            yield ['', '', '', '', '']
+
+    return Exportacion(
+        f'liquidacion_comisiones_{_sufijo_periodo(fecha_inicio, fecha_fin)}', 'Liquidación Comisiones',
+        ['EMPLEADO', 'CONCEPTO', 'CANTIDAD', 'MONTO', 'PERIODO'],
+        filas, [20, 25, 15, 15, 20]
+    )
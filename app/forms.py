@@ -186,7 +186,8 @@ class ConfiguracionForm(FlaskForm):
 
 # --- Formulario de Reportes de Comisiones ---
 class ReporteComisionesForm(FlaskForm):
-    usuario_id = SelectField('Usuario', coerce=int, validators=[DataRequired()])
+    # InputRequired: 0 es la opción 'Todos'
+    usuario_id = SelectField('Usuario', coerce=int, validators=[InputRequired()])
     fecha_inicio = StringField('Fecha Inicio', validators=[DataRequired()])
     fecha_fin = StringField('Fecha Fin', validators=[DataRequired()])
     submit = SubmitField('Generar Reporte')
@@ -0,0 +1,214 @@
+# app/instrumentation.py
+"""
+Instrumentación de requests: consultas SQL y latencia por endpoint.
+
+- Eventos before/after_cursor_execute de SQLAlchemy acumulan en flask.g, por
+  request: número de sentencias, tiempo total en base de datos, la sentencia
+  más lenta y filas afectadas/retornadas (cuando el driver informa rowcount;
+  psycopg2 lo hace para SELECT, sqlite3 no).
+- Cada respuesta lleva un header Server-Timing y se escribe una línea de log
+  JSON (REQUEST_METRICS_LOG).
+- Si un request supera su presupuesto de consultas (QUERY_BUDGETS por
+  endpoint o REQUEST_QUERY_BUDGET por defecto) se registra una advertencia.
+- /metrics expone en formato de texto de Prometheus los percentiles p50/p95/p99
+  por endpoint sobre las últimas METRICS_WINDOW muestras. Requiere un
+  administrador con sesión o el header Authorization: Bearer METRICS_TOKEN.
+
+Las muestras viven en memoria de cada worker de gunicorn; la etiqueta 'worker'
+(pid) permite sumar o comparar lo que reporta cada uno.
+"""
+import hmac
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from flask import g, request, current_app, has_request_context, Response, abort
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CUANTILES = (0.5, 0.95, 0.99)
+
+class _EstadisticasEndpoint:
+    """Muestras recientes y acumulados de un endpoint"""
+
+    def __init__(self, ventana):
+        self.duraciones = deque(maxlen=ventana)
+        self.consultas = deque(maxlen=ventana)
+        self.tiempos_db = deque(maxlen=ventana)
+        self.total = 0
+        self.suma_duracion = 0.0
+        self.suma_consultas = 0
+        self.suma_tiempo_db = 0.0
+        self.presupuesto_excedido = 0
+
+_estadisticas = {}
+_lock = threading.Lock()
+
+def _percentil(valores, cuantil):
+    """Percentil por el método del rango más cercano"""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0
+    indice = max(0, min(len(ordenados) - 1, math.ceil(cuantil * len(ordenados)) - 1))
+    return ordenados[indice]
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('inicio_consulta', []).append(time.perf_counter())
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get('inicio_consulta')
+    if not inicios:
+        return
+    duracion = time.perf_counter() - inicios.pop()
+
+    if not has_request_context():
+        return
+    metricas = g.get('metricas_sql')
+    if metricas is None:
+        return
+
+    metricas['consultas'] += 1
+    metricas['tiempo_db'] += duracion
+    if cursor.rowcount is not None and cursor.rowcount > 0:
+        metricas['filas'] += cursor.rowcount
+    if duracion > metricas['mas_lenta']:
+        metricas['mas_lenta'] = duracion
+        metricas['sql_mas_lenta'] = ' '.join(statement.split())[:200]
+
+def _error_de_consulta(contexto):
+    # La sentencia falló: after_cursor_execute no se ejecutará
+    if contexto.connection is not None:
+        inicios = contexto.connection.info.get('inicio_consulta')
+        if inicios:
+            inicios.pop()
+
+def _iniciar_request():
+    g.metricas_sql = {
+        'inicio': time.perf_counter(),
+        'consultas': 0,
+        'tiempo_db': 0.0,
+        'mas_lenta': 0.0,
+        'sql_mas_lenta': None,
+        'filas': 0
+    }
+
+def _registrar_request(response):
+    metricas = g.pop('metricas_sql', None)
+    if metricas is None or request.endpoint == 'static':
+        return response
+
+    config = current_app.config
+    endpoint = request.endpoint or 'desconocido'
+    duracion = time.perf_counter() - metricas['inicio']
+
+    response.headers.add(
+        'Server-Timing',
+        f'db;desc="{metricas["consultas"]} consultas";dur={metricas["tiempo_db"] * 1000:.1f}, '
+        f'db-max;dur={metricas["mas_lenta"] * 1000:.1f}, '
+        f'app;dur={duracion * 1000:.1f}'
+    )
+
+    presupuesto = config.get('QUERY_BUDGETS', {}).get(endpoint, config.get('REQUEST_QUERY_BUDGET', 50))
+    excedido = presupuesto is not None and metricas['consultas'] > presupuesto
+
+    with _lock:
+        estadisticas = _estadisticas.get(endpoint)
+        if estadisticas is None:
+            estadisticas = _estadisticas[endpoint] = _EstadisticasEndpoint(config.get('METRICS_WINDOW', 1000))
+        estadisticas.duraciones.append(duracion)
+        estadisticas.consultas.append(metricas['consultas'])
+        estadisticas.tiempos_db.append(metricas['tiempo_db'])
+        estadisticas.total += 1
+        estadisticas.suma_duracion += duracion
+        estadisticas.suma_consultas += metricas['consultas']
+        estadisticas.suma_tiempo_db += metricas['tiempo_db']
+        if excedido:
+            estadisticas.presupuesto_excedido += 1
+
+    if config.get('REQUEST_METRICS_LOG', True):
+        current_app.logger.info('request_metrics ' + json.dumps({
+            'metodo': request.method,
+            'ruta': request.path,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'duracion_ms': round(duracion * 1000, 1),
+            'consultas': metricas['consultas'],
+            'tiempo_db_ms': round(metricas['tiempo_db'] * 1000, 1),
+            'consulta_mas_lenta_ms': round(metricas['mas_lenta'] * 1000, 1),
+            'filas': metricas['filas']
+        }))
+
+    if excedido:
+        current_app.logger.warning(
+            f"{endpoint} ejecutó {metricas['consultas']} consultas (presupuesto {presupuesto}); "
+            f"más lenta: {metricas['sql_mas_lenta']}"
+        )
+
+    return response
+
+def _autorizado_metricas():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        enviado = request.headers.get('Authorization', '').replace('Bearer ', '')
+        if enviado and hmac.compare_digest(enviado, token):
+            return True
+    return current_user.is_authenticated and current_user.is_admin()
+
+def exportar_prometheus():
+    """Texto de exposición de Prometheus con las estadísticas de este worker"""
+    worker = os.getpid()
+    series = {
+        'creditapp_request_duration_seconds': ('Duración de los requests', 'duraciones', 'suma_duracion'),
+        'creditapp_request_db_queries': ('Sentencias SQL por request', 'consultas', 'suma_consultas'),
+        'creditapp_request_db_seconds': ('Tiempo en base de datos por request', 'tiempos_db', 'suma_tiempo_db'),
+    }
+
+    with _lock:
+        instantanea = {
+            endpoint: (
+                {atributo: list(getattr(e, atributo)) for _, atributo, _ in series.values()},
+                {suma: getattr(e, suma) for _, _, suma in series.values()},
+                e.total,
+                e.presupuesto_excedido
+            )
+            for endpoint, e in _estadisticas.items()
+        }
+
+    lineas = []
+    for nombre, (ayuda, atributo, suma) in series.items():
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} summary')
+        for endpoint, (muestras, sumas, total, _) in sorted(instantanea.items()):
+            etiquetas = f'endpoint="{endpoint}",worker="{worker}"'
+            for cuantil in CUANTILES:
+                valor = _percentil(muestras[atributo], cuantil)
+                lineas.append(f'{nombre}{{{etiquetas},quantile="{cuantil}"}} {valor:.6g}')
+            lineas.append(f'{nombre}_sum{{{etiquetas}}} {sumas[suma]:.6g}')
+            lineas.append(f'{nombre}_count{{{etiquetas}}} {total}')
+
+    lineas.append('# HELP creditapp_query_budget_exceeded_total Requests que superaron su presupuesto de consultas')
+    lineas.append('# TYPE creditapp_query_budget_exceeded_total counter')
+    for endpoint, (_, _, _, excedidos) in sorted(instantanea.items()):
+        lineas.append(f'creditapp_query_budget_exceeded_total{{endpoint="{endpoint}",worker="{worker}"}} {excedidos}')
+
+    return '\n'.join(lineas) + '\n'
+
+def metrics():
+    """Endpoint /metrics (solo administradores o METRICS_TOKEN)"""
+    if not _autorizado_metricas():
+        abort(403)
+    return Response(exportar_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def init_instrumentacion(app):
+    """Registra los eventos de SQLAlchemy, los hooks de request y /metrics"""
+    if not event.contains(Engine, 'before_cursor_execute', _antes_de_ejecutar):
+        event.listen(Engine, 'before_cursor_execute', _antes_de_ejecutar)
+        event.listen(Engine, 'after_cursor_execute', _despues_de_ejecutar)
+        event.listen(Engine, 'handle_error', _error_de_consulta)
+
+    app.before_request(_iniciar_request)
+    app.after_request(_registrar_request)
+    app.add_url_rule('/metrics', 'metrics', metrics)
@@ -0,0 +1,89 @@
+# app/inventario.py
+"""
+Validación y movimiento de stock por lotes para las ventas.
+
+En lugar de una consulta y un UPDATE por producto:
+
+- bloquear_productos carga todos los productos de la venta con un único
+  SELECT ... WHERE id IN (...) FOR UPDATE, en orden de id para que dos ventas
+  concurrentes con productos en común no se bloqueen mutuamente.
+- validar_stock revisa en memoria existencia y stock suficiente.
+- descontar_stock aplica todos los descuentos con un único UPDATE condicional
+  (stock = stock - cantidad WHERE stock >= cantidad). Si alguna fila no cumple
+  la condición no se actualiza y el llamador debe deshacer la transacción; en
+  PostgreSQL el bloqueo ya lo impide, en SQLite (sin FOR UPDATE) es la única
+  garantía de no dejar stock negativo.
+- devolver_stock suma las cantidades al eliminar una venta.
+"""
+from sqlalchemy import case, update
+from sqlalchemy.orm.util import identity_key
+from app import db
+from app.models import Producto
+
+def agrupar_cantidades(items):
+    """{producto_id: cantidad total} a partir de [(producto_id, cantidad)], sumando repetidos"""
+    cantidades = {}
+    for producto_id, cantidad in items:
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+    return cantidades
+
+def bloquear_productos(producto_ids):
+    """Carga y bloquea los productos indicados; retorna {id: Producto}"""
+    ids = sorted(set(producto_ids))
+    if not ids:
+        return {}
+    productos = Producto.query.filter(
+        Producto.id.in_(ids)
+    ).order_by(Producto.id).with_for_update().populate_existing().all()
+    return {p.id: p for p in productos}
+
+def validar_stock(productos, cantidades):
+    """Retorna el mensaje de error del primer producto inexistente o sin stock suficiente, o None"""
+    for producto_id, cantidad in cantidades.items():
+        producto = productos.get(producto_id)
+        if not producto:
+            return "Producto no encontrado."
+        if cantidad <= 0:
+            return f"Cantidad inválida para {producto.nombre}."
+        if producto.stock < cantidad:
+            return f"Stock insuficiente para {producto.nombre}. Disponible: {producto.stock}"
+    return None
+
+def _cantidad_por_producto(cantidades):
+    return case(cantidades, value=Producto.id, else_=0)
+
+def _expirar_stock(producto_ids):
+    for producto_id in producto_ids:
+        objeto = db.session.identity_map.get(identity_key(Producto, producto_id))
+        if objeto is not None:
+            db.session.expire(objeto, ['stock', 'updated_at'])
+
+def descontar_stock(cantidades):
+    """
+    Descuenta {producto_id: cantidad} con un único UPDATE condicional, sin
+    confirmar la transacción. Retorna False si algún producto no tenía stock
+    suficiente (en ese caso hay que hacer rollback).
+    """
+    if not cantidades:
+        return True
+    cantidad = _cantidad_por_producto(cantidades)
+    resultado = db.session.execute(
+        update(Producto)
+        .where(Producto.id.in_(cantidades.keys()), Producto.stock >= cantidad)
+        .values(stock=Producto.stock - cantidad)
+        .execution_options(synchronize_session=False)
+    )
+    _expirar_stock(cantidades.keys())
+    return resultado.rowcount == len(cantidades)
+
+def devolver_stock(cantidades):
+    """Suma {producto_id: cantidad} al stock con un único UPDATE, sin confirmar la transacción"""
+    if not cantidades:
+        return
+    db.session.execute(
+        update(Producto)
+        .where(Producto.id.in_(cantidades.keys()))
+        .values(stock=Producto.stock + _cantidad_por_producto(cantidades))
+        .execution_options(synchronize_session=False)
+    )
+    _expirar_stock(cantidades.keys())
@@ -0,0 +1,158 @@
+# app/kpi_cache.py
+"""
+Caché de KPIs del dashboard compartida entre workers de gunicorn.
+
+Se guarda en un archivo SQLite local (KPI_CACHE_PATH) con una entrada por
+usuario/rol y período. Las entradas expiran por TTL (KPI_CACHE_TTL) y se
+invalidan explícitamente con invalidar_kpis() después de cada commit que
+cambia ventas, abonos, cajas o comisiones.
+
+Una generación global evita guardar valores calculados antes de una
+invalidación: si la generación cambió mientras se calculaba, el resultado se
+sirve pero no se guarda.
+
+La caché nunca debe romper el dashboard: cualquier error del almacenamiento se
+registra y se recalcula directamente contra la base de datos.
+"""
+import json
+import sqlite3
+import time
+from flask import current_app
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS kpi_cache (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL,
+    creado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS kpi_estado (
+    nombre TEXT PRIMARY KEY,
+    valor REAL NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO kpi_estado (nombre, valor) VALUES
+    ('generacion', 0), ('hits', 0), ('misses', 0), ('invalidaciones', 0),
+    ('edad_servida_total', 0), ('edad_servida_max', 0);
+"""
+
+_inicializadas = set()
+
+def _conectar():
+    ruta = current_app.config['KPI_CACHE_PATH']
+    conexion = sqlite3.connect(ruta, timeout=5, isolation_level=None)
+    if ruta not in _inicializadas:
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.executescript(_ESQUEMA)
+        _inicializadas.add(ruta)
+    return conexion
+
+def _clave(usuario, desde):
+    """Los administradores ven los mismos KPIs: comparten una entrada"""
+    if usuario.is_admin():
+        return f"administrador:{desde.date().isoformat()}"
+    return f"{usuario.rol}:{usuario.id}:{desde.date().isoformat()}"
+
+def _generacion(conexion):
+    return conexion.execute("SELECT valor FROM kpi_estado WHERE nombre = 'generacion'").fetchone()[0]
+
+def obtener_kpis(usuario, desde, calcular):
+    """
+    Retorna los KPIs del usuario desde la caché o, si no están o expiraron,
+    los calcula con calcular(usuario, desde) y los guarda.
+    """
+    if not current_app.config.get('KPI_CACHE_ENABLED', True):
+        return calcular(usuario, desde)
+
+    clave = _clave(usuario, desde)
+    ttl = current_app.config.get('KPI_CACHE_TTL', 300)
+
+    try:
+        conexion = _conectar()
+        try:
+            ahora = time.time()
+            fila = conexion.execute(
+                "SELECT valor, creado FROM kpi_cache WHERE clave = ?", (clave,)
+            ).fetchone()
+
+            if fila and ahora - fila[1] < ttl:
+                edad = ahora - fila[1]
+                conexion.execute(
+                    "UPDATE kpi_estado SET valor = CASE nombre "
+                    "WHEN 'hits' THEN valor + 1 "
+                    "WHEN 'edad_servida_total' THEN valor + ? "
+                    "ELSE MAX(valor, ?) END "
+                    "WHERE nombre IN ('hits', 'edad_servida_total', 'edad_servida_max')",
+                    (edad, edad)
+                )
+                return json.loads(fila[0])
+
+            conexion.execute("UPDATE kpi_estado SET valor = valor + 1 WHERE nombre = 'misses'")
+            generacion = _generacion(conexion)
+        finally:
+            conexion.close()
+    except sqlite3.Error as e:
+        current_app.logger.warning(f"Caché de KPIs no disponible: {str(e)}")
+        return calcular(usuario, desde)
+
+    metricas = calcular(usuario, desde)
+
+    try:
+        conexion = _conectar()
+        try:
+            # Solo guardar si nadie invalidó mientras se calculaba
+            conexion.execute(
+                "INSERT OR REPLACE INTO kpi_cache (clave, valor, creado) "
+                "SELECT ?, ?, ? WHERE (SELECT valor FROM kpi_estado WHERE nombre = 'generacion') = ?",
+                (clave, json.dumps(metricas), time.time(), generacion)
+            )
+        finally:
+            conexion.close()
+    except sqlite3.Error as e:
+        current_app.logger.warning(f"No se pudo guardar la caché de KPIs: {str(e)}")
+
+    return metricas
+
+def invalidar_kpis(motivo=None):
+    """Descarta todas las entradas (llamar después del commit que cambió los datos)"""
+    if not current_app.config.get('KPI_CACHE_ENABLED', True):
+        return
+    try:
+        conexion = _conectar()
+        try:
+            conexion.execute("BEGIN IMMEDIATE")
+            conexion.execute(
+                "UPDATE kpi_estado SET valor = valor + 1 WHERE nombre IN ('generacion', 'invalidaciones')"
+            )
+            conexion.execute("DELETE FROM kpi_cache")
+            conexion.execute("COMMIT")
+        finally:
+            conexion.close()
+        if motivo:
+            current_app.logger.debug(f"Caché de KPIs invalidada: {motivo}")
+    except sqlite3.Error as e:
+        current_app.logger.warning(f"No se pudo invalidar la caché de KPIs: {str(e)}")
+
+def estadisticas_kpis():
+    """Hits, misses, tasa de aciertos, invalidaciones y antigüedad de lo servido"""
+    conexion = _conectar()
+    try:
+        estado = dict(conexion.execute("SELECT nombre, valor FROM kpi_estado").fetchall())
+        entradas, mas_antigua = conexion.execute(
+            "SELECT COUNT(*), MIN(creado) FROM kpi_cache"
+        ).fetchone()
+    finally:
+        conexion.close()
+
+    hits = int(estado.get('hits', 0))
+    misses = int(estado.get('misses', 0))
+    consultas = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / consultas, 4) if consultas else None,
+        'invalidaciones': int(estado.get('invalidaciones', 0)),
+        'entradas': entradas,
+        'ttl_segundos': current_app.config.get('KPI_CACHE_TTL', 300),
+        'edad_entrada_mas_antigua': round(time.time() - mas_antigua, 1) if mas_antigua else None,
+        'edad_servida_promedio': round(estado.get('edad_servida_total', 0) / hits, 1) if hits else None,
+        'edad_servida_max': round(estado.get('edad_servida_max', 0), 1)
+    }
@@ -12,7 +12,8 @@ class SyncMixin:
     """Mixin que agrega campos requeridos para sincronización offline"""
     uuid = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid_lib.uuid4()))
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Indexado: los catálogos de la API calculan max(updated_at) y filtran ?since= por él
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
     sync_version = db.Column(db.Integer, default=1, nullable=False)
 
 @login_manager.user_loader
@@ -73,17 +74,29 @@ class Cliente(db.Model, SyncMixin):
     direccion = db.Column(db.String(200), nullable=True)
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)  # NUEVO CAMPO
+    # Suma de ventas.saldo_pendiente a crédito, mantenida por app/saldos.py
+    saldo_pendiente_total = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
 
     ventas = db.relationship('Venta', back_populates='cliente', lazy=True, cascade='all, delete-orphan')
     creditos = db.relationship('Credito', backref='cliente', lazy=True, cascade='all, delete-orphan')
     creador = db.relationship('Usuario', foreign_keys=[created_by], backref='clientes_creados')  # NUEVA RELACIÓN
 
     def saldo_pendiente(self):
-        return sum(v.saldo_pendiente for v in self.ventas if v.tipo == 'credito')
+        return self.saldo_pendiente_total or 0
 
 
 class Venta(db.Model, SyncMixin):
     __tablename__ = 'ventas'
+    __table_args__ = (
+        # Listados ordenados por (fecha, id) y filtrados por vendedor o cliente
+        db.Index('ix_ventas_fecha_id', 'fecha', 'id'),
+        db.Index('ix_ventas_vendedor_fecha', 'vendedor_id', 'fecha'),
+        db.Index('ix_ventas_cliente_fecha', 'cliente_id', 'fecha'),
+        # Créditos con saldo: solo indexa las ventas que aún se cobran
+        db.Index('ix_ventas_credito_pendiente', 'fecha',
+                 postgresql_where=db.text("tipo = 'credito' AND saldo_pendiente > 0"),
+                 sqlite_where=db.text("tipo = 'credito' AND saldo_pendiente > 0")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
@@ -101,34 +114,42 @@ class Venta(db.Model, SyncMixin):
     abonos = db.relationship('Abono', back_populates='venta', foreign_keys='Abono.venta_id', lazy=True)
 
 
+def _saldo_inicial_credito(context):
+    """Un crédito nuevo debe todo su monto"""
+    return context.get_current_parameters().get('monto') or 0
+
+
 class Credito(db.Model, SyncMixin):
     __tablename__ = 'creditos'
 
     id = db.Column(db.Integer, primary_key=True)
-    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False, index=True)
     monto = db.Column(db.Integer, nullable=False)
     plazo = db.Column(db.Integer, nullable=False)
     tasa = db.Column(db.Integer, nullable=False)
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
+    # Monto menos la suma de sus abonos, mantenido por app/saldos.py.
+    # Al ser columna se puede filtrar y sumar en SQL (Credito.saldo_pendiente > 0)
+    saldo_pendiente = db.Column(db.Numeric(precision=15, scale=2), nullable=False,
+                                default=_saldo_inicial_credito, server_default='0', index=True)
 
     # relación con abonos
     abonos = db.relationship('Abono', backref='credito', lazy=True, cascade='all, delete-orphan')
 
-    @property
-    def saldo_pendiente(self):
-        pagado = sum(a.monto for a in self.abonos)
-        return self.monto - pagado
-
     def __repr__(self):
         return f"<Credito #{self.id} Cliente:{self.cliente_id} Monto:{self.monto}>"
 
 
 class Abono(db.Model, SyncMixin):
     __tablename__ = 'abonos'
+    __table_args__ = (
+        db.Index('ix_abonos_fecha_id', 'fecha', 'id'),
+        db.Index('ix_abonos_cobrador_fecha', 'cobrador_id', 'fecha'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    venta_id = db.Column(db.Integer, db.ForeignKey('ventas.id'), nullable=True)
-    credito_id = db.Column(db.Integer, db.ForeignKey('creditos.id'), nullable=True)
+    venta_id = db.Column(db.Integer, db.ForeignKey('ventas.id'), nullable=True, index=True)
+    credito_id = db.Column(db.Integer, db.ForeignKey('creditos.id'), nullable=True, index=True)
     credito_venta_id = db.Column(db.Integer, db.ForeignKey('creditos_venta.id'), nullable=True)
     monto = db.Column(db.Numeric(precision=15, scale=2), nullable=False)
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
@@ -169,6 +190,9 @@ class Caja(db.Model, SyncMixin):
 
 class MovimientoCaja(db.Model, SyncMixin):
     __tablename__ = 'movimiento_caja'
+    __table_args__ = (
+        db.Index('ix_movimiento_caja_caja_fecha', 'caja_id', 'fecha'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     caja_id = db.Column(db.Integer, db.ForeignKey('cajas.id'), nullable=False)
@@ -178,7 +202,7 @@ class MovimientoCaja(db.Model, SyncMixin):
     descripcion = db.Column(db.String(200), nullable=True)
     
     # Añadir campo venta_id
-    venta_id = db.Column(db.Integer, db.ForeignKey('ventas.id'), nullable=True)
+    venta_id = db.Column(db.Integer, db.ForeignKey('ventas.id'), nullable=True, index=True)
     venta = db.relationship('Venta', backref='movimientos_caja', foreign_keys=[venta_id])
     
     # relación con abono existente
@@ -225,7 +249,7 @@ class DetalleVenta(db.Model, SyncMixin):
     __tablename__ = 'detalle_ventas'
 
     id = db.Column(db.Integer, primary_key=True)
-    venta_id = db.Column(db.Integer, db.ForeignKey('ventas.id'), nullable=False)
+    venta_id = db.Column(db.Integer, db.ForeignKey('ventas.id'), nullable=False, index=True)
     producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), nullable=False)
     cantidad = db.Column(db.Integer, nullable=False)
     precio_unitario = db.Column(db.Integer, nullable=False)
@@ -234,6 +258,9 @@ class DetalleVenta(db.Model, SyncMixin):
 
 class Comision(db.Model, SyncMixin):
     __tablename__ = 'comisiones'
+    __table_args__ = (
+        db.Index('ix_comisiones_usuario_fecha', 'usuario_id', 'fecha_generacion'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
@@ -297,3 +324,64 @@ class Producto(db.Model, SyncMixin):
         
     def stock_bajo(self):
         return self.stock > 0 and self.stock <= self.stock_minimo
+
+
+class TrabajoReporte(db.Model):
+    """Exportación de reporte encolada, procesada por worker_reportes.py (ver app/trabajos.py)"""
+    __tablename__ = 'trabajos_reporte'
+    __table_args__ = (
+        # El worker toma el pendiente más antiguo
+        db.Index('ix_trabajos_reporte_estado_id', 'estado', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(30), nullable=False)
+    formato = db.Column(db.String(10), nullable=False, default='xlsx')
+    parametros = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')  # pendiente, en_proceso, completado, error
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False, index=True)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    nombre_archivo = db.Column(db.String(150), nullable=True)
+    ruta_resultado = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    creado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    iniciado = db.Column(db.DateTime, nullable=True)
+    terminado = db.Column(db.DateTime, nullable=True)
+
+    usuario = db.relationship('Usuario', foreign_keys=[usuario_id])
+
+
+# Resúmenes diarios para reportes (mantenidos por app/resumenes.py)
+
+class ResumenVentasDia(db.Model):
+    """Ventas por día, vendedor y tipo"""
+    __tablename__ = 'resumen_ventas_dia'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    vendedor_id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(20), primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.BigInteger, nullable=False, default=0)
+    saldo_pendiente = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class ResumenAbonosDia(db.Model):
+    """Abonos por día, cobrador y caja"""
+    __tablename__ = 'resumen_abonos_dia'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    cobrador_id = db.Column(db.Integer, primary_key=True)
+    caja_id = db.Column(db.Integer, primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Numeric(precision=15, scale=2), nullable=False, default=0)
+
+
+class ResumenMovimientosDia(db.Model):
+    """Movimientos de caja por día, caja y tipo"""
+    __tablename__ = 'resumen_movimientos_dia'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    caja_id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(20), primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.BigInteger, nullable=False, default=0)
@@ -175,3 +175,140 @@ def crear_triggers_change_log():
                     print(f"✗ Error creando trigger para tabla {tabla}: {str(e)}")
     except Exception as e:
         print(f"Error general en crear_triggers_change_log: {str(e)}")
+
+def _agregar_columna_saldo(connection, tabla, columna, tipo_sql, indice):
+    """Agrega la columna de saldo y su índice si faltan (válido en PostgreSQL y SQLite)"""
+    columnas = {c['name'] for c in db.inspect(connection).get_columns(tabla)}
+    if columna not in columnas:
+        connection.execute(db.text(f"""
+            ALTER TABLE {tabla} 
+            ADD COLUMN {columna} {tipo_sql} DEFAULT 0 NOT NULL
+        """))
+        print(f"✓ Campo {columna} agregado a tabla {tabla}")
+    
+    connection.execute(db.text(f"""
+        CREATE INDEX IF NOT EXISTS {indice} 
+        ON {tabla} ({columna})
+    """))
+
+def agregar_saldo_clientes():
+    """Agrega clientes.saldo_pendiente_total con su índice y lo llena desde las ventas"""
+    from sqlalchemy import update
+    from app.models import Cliente
+    from app.saldos import _saldo_real_cliente
+    
+    try:
+        with db.engine.begin() as connection:
+            _agregar_columna_saldo(connection, 'clientes', 'saldo_pendiente_total', 'INTEGER',
+                                   'ix_clientes_saldo_pendiente_total')
+            
+            # Llenar (o corregir) el saldo en un solo UPDATE con subconsulta correlacionada
+            saldo = _saldo_real_cliente()
+            resultado = connection.execute(
+                update(Cliente.__table__)
+                .values(saldo_pendiente_total=saldo)
+                .where(Cliente.saldo_pendiente_total.is_distinct_from(saldo))
+            )
+            print(f"✓ Saldo pendiente recalculado para {resultado.rowcount} clientes")
+    except Exception as e:
+        print(f"Error general en agregar_saldo_clientes: {str(e)}")
+
+def agregar_saldo_creditos():
+    """Agrega creditos.saldo_pendiente con su índice y lo llena desde los abonos"""
+    from sqlalchemy import update
+    from app.models import Credito
+    from app.saldos import _saldo_real_credito
+    
+    try:
+        with db.engine.begin() as connection:
+            _agregar_columna_saldo(connection, 'creditos', 'saldo_pendiente', 'NUMERIC(15, 2)',
+                                   'ix_creditos_saldo_pendiente')
+            
+            # Llenar (o corregir) el saldo: monto menos la suma de sus abonos
+            saldo = _saldo_real_credito()
+            resultado = connection.execute(
+                update(Credito.__table__)
+                .values(saldo_pendiente=saldo)
+                .where(Credito.saldo_pendiente.is_distinct_from(saldo))
+            )
+            print(f"✓ Saldo pendiente recalculado para {resultado.rowcount} créditos")
+    except Exception as e:
+        print(f"Error general en agregar_saldo_creditos: {str(e)}")
+
+def crear_indices_rendimiento():
+    """
+    Crea en bases existentes los índices declarados en los modelos
+    (index=True y __table_args__), que db.create_all() solo crea junto con
+    tablas nuevas. En PostgreSQL usa CREATE INDEX CONCURRENTLY para no
+    bloquear escrituras, por eso cada índice va en autocommit.
+    """
+    from sqlalchemy.schema import CreateIndex
+    
+    try:
+        es_postgres = db.engine.dialect.name == 'postgresql'
+        tablas_existentes = set(db.inspect(db.engine).get_table_names())
+        
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            for tabla in db.metadata.sorted_tables:
+                if tabla.name not in tablas_existentes:
+                    continue
+                
+                for indice in sorted(tabla.indexes, key=lambda i: i.name):
+                    try:
+                        sql = str(CreateIndex(indice, if_not_exists=True).compile(dialect=db.engine.dialect))
+                        if es_postgres:
+                            sql = sql.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+                        connection.execute(db.text(sql))
+                        print(f"✓ Índice {indice.name} verificado en tabla {tabla.name}")
+                    except Exception as e:
+                        print(f"✗ Error creando índice {indice.name}: {str(e)}")
+                        continue
+    except Exception as e:
+        print(f"Error general en crear_indices_rendimiento: {str(e)}")
+
+def habilitar_busqueda_clientes():
+    """
+    Habilita pg_trgm y crea índices GIN de trigramas sobre nombre, cédula y
+    teléfono de clientes: sirven a ILIKE '%texto%' y a la similitud que usa
+    app/busqueda_clientes.py. En SQLite la búsqueda crea su propia tabla FTS5.
+    """
+    
+    if db.engine.dialect.name != 'postgresql':
+        return
+    
+    try:
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(db.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            print("✓ Extensión pg_trgm habilitada")
+            
+            for columna in ('nombre', 'cedula', 'telefono'):
+                try:
+                    connection.execute(db.text(f"""
+                        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_clientes_{columna}_trgm 
+                        ON clientes USING gin ({columna} gin_trgm_ops)
+                    """))
+                    print(f"✓ Índice de trigramas verificado para clientes.{columna}")
+                except Exception as e:
+                    print(f"✗ Error creando índice de trigramas para clientes.{columna}: {str(e)}")
+    except Exception as e:
+        print(f"Error general en habilitar_busqueda_clientes: {str(e)}")
+
+def poblar_resumenes():
+    """
+    Llena por primera vez los resúmenes diarios (app/resumenes.py) en bases
+    existentes: db.create_all() crea las tablas vacías y desde entonces los
+    eventos de escritura solo suman lo nuevo. Los que ya tienen filas no se
+    tocan; para reconstruirlos use reconstruir_resumenes.py.
+    """
+    from app.resumenes import poblar_resumenes_vacios
+    
+    try:
+        filas = poblar_resumenes_vacios()
+        db.session.commit()
+        if filas:
+            print(f"✓ Resúmenes diarios poblados ({filas} filas)")
+        else:
+            print("✓ Resúmenes diarios ya poblados")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error poblando resúmenes diarios: {str(e)}")
@@ -0,0 +1,64 @@
+# app/paginas.py
+"""
+Paginación por keyset para los listados y reportes en pantalla.
+
+La consulta se ordena por columnas que identifican cada fila (la última es la
+clave primaria, por ejemplo (fecha, id)) y el cursor es el valor de esas
+columnas en la última fila de la página anterior, como texto separado por '_':
+"2024-03-01T10:00:00_1234". A diferencia de OFFSET, cada página cuesta lo
+mismo sin importar cuántas haya antes.
+
+    filas, siguiente_cursor = paginar(query, (Venta.fecha, Venta.id), cursor, 50, descendente=True)
+
+Un cursor que no corresponde a las columnas lanza ValueError; los
+controladores lo revisan antes con cursor_valido, avisan y muestran la
+primera página.
+"""
+from datetime import datetime
+from sqlalchemy import tuple_
+
+def _a_texto(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else str(valor)
+
+def _desde_texto(columna, texto):
+    tipo = columna.type.python_type
+    return datetime.fromisoformat(texto) if tipo is datetime else tipo(texto)
+
+def leer_cursor(columnas, cursor):
+    """Valores del cursor convertidos al tipo de cada columna"""
+    partes = cursor.split('_')
+    if len(partes) != len(columnas):
+        raise ValueError(f'Cursor inválido: {cursor}')
+    return tuple(_desde_texto(columna, parte) for columna, parte in zip(columnas, partes))
+
+def cursor_valido(columnas, cursor):
+    """Indica si el cursor corresponde a las columnas ('' es la primera página)"""
+    try:
+        if cursor:
+            leer_cursor(columnas, cursor)
+        return True
+    except ValueError:
+        return False
+
+def consulta_pagina(query, columnas, cursor, por_pagina, descendente=False):
+    """
+    La consulta de la página que sigue al cursor ('' para la primera), con una
+    fila extra para saber si hay más, sin ejecutarla
+    """
+    if cursor:
+        clave = tuple_(*columnas)
+        valores = tuple_(*leer_cursor(columnas, cursor))
+        query = query.filter(clave < valores if descendente else clave > valores)
+    orden = [columna.desc() for columna in columnas] if descendente else list(columnas)
+    return query.order_by(*orden).limit(por_pagina + 1)
+
+def paginar(query, columnas, cursor, por_pagina, descendente=False):
+    """
+    Ejecuta la página que sigue al cursor. Retorna (filas, siguiente_cursor);
+    siguiente_cursor es None en la última página.
+    """
+    filas = consulta_pagina(query, columnas, cursor, por_pagina, descendente).all()
+    if len(filas) <= por_pagina:
+        return filas, None
+    filas = filas[:por_pagina]
+    return filas, '_'.join(_a_texto(getattr(filas[-1], columna.key)) for columna in columnas)
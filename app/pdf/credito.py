@@ -55,16 +55,17 @@ def generar_pdf_credito(credito):
     fecha_cuota = credito.fecha
     monto_cuota = total_pagar / 3  # 3 cuotas como ejemplo
     
+    # Lo abonado sale del saldo guardado, sin cargar los abonos
+    total_abonado = credito.monto - credito.saldo_pendiente
+    
     fill = False
     for i in range(3):  # 3 cuotas como ejemplo
         fecha_cuota = fecha_cuota + timedelta(days=30)
         estado = "PENDIENTE"  # Por defecto todas pendientes
         
-        # Si hay abonos, verificar si esta cuota está pagada
-        if hasattr(credito, 'abonos') and credito.abonos:
-            total_abonado = sum(a.monto for a in credito.abonos)
-            if total_abonado >= monto_cuota * (i + 1):
-                estado = "PAGADO"
+        # Verificar si esta cuota está pagada
+        if total_abonado >= monto_cuota * (i + 1):
+            estado = "PAGADO"
         
         datos = [
             f"{i+1}",
@@ -1,7 +1,7 @@
 from fpdf import FPDF
 import os
 from datetime import datetime
-from app.models import Configuracion
+from app.utils import get_configuracion
 
 class CreditAppPDF(FPDF):
     """Clase base para todos los PDFs de CreditApp con estilo unificado"""
@@ -15,7 +15,7 @@ class CreditAppPDF(FPDF):
         
         # Obtener configuración de la empresa
         try:
-            self.config = Configuracion.query.first()
+            self.config = get_configuracion()
         except:
             # Si hay error, usar valores por defecto
             self.config = None
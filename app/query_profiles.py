@@ -0,0 +1,65 @@
+# app/query_profiles.py
+"""
+Perfiles de carga con nombre para las consultas de los listados.
+
+Todas las relaciones de app/models.py son lazy=True: si una plantilla recorre
+venta.cliente o abono.cobrador fila por fila, cada acceso es un SELECT. Cada
+controlador aplica el perfil de lo que su plantilla muestra:
+
+    query.options(*perfil('venta_lista'))
+
+- joinedload para relaciones muchos-a-uno (una sola consulta con JOIN)
+- selectinload para colecciones (una consulta extra por página, no por fila)
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import Venta, Abono, Credito, DetalleVenta
+
+PERFILES_CARGA = {
+    # ventas/index.html y creditos/index.html: cliente y vendedor por fila
+    'venta_lista': (
+        joinedload(Venta.cliente),
+        joinedload(Venta.vendedor),
+    ),
+    # ventas/detalle.html: además los productos vendidos y los abonos
+    'venta_detalle': (
+        joinedload(Venta.cliente),
+        joinedload(Venta.vendedor),
+        selectinload(Venta.detalles).joinedload(DetalleVenta.producto),
+        selectinload(Venta.abonos),
+    ),
+    # abonos/index.html: cliente de la venta o del crédito y cobrador
+    'abono_lista': (
+        joinedload(Abono.venta).joinedload(Venta.cliente),
+        joinedload(Abono.credito).joinedload(Credito.cliente),
+        joinedload(Abono.cobrador),
+    ),
+    # clientes/index.html solo muestra columnas propias del cliente
+    'cliente_lista': (),
+}
+
+def perfil(nombre):
+    """Opciones de carga del perfil indicado"""
+    return PERFILES_CARGA[nombre]
+
+@contextmanager
+def contar_consultas(engine):
+    """
+    Cuenta las sentencias SQL ejecutadas dentro del bloque:
+
+        with contar_consultas(db.engine) as consultas:
+            ...
+        consultas['total'], consultas['sql']
+    """
+    consultas = {'total': 0, 'sql': []}
+
+    def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+        consultas['total'] += 1
+        consultas['sql'].append(statement)
+
+    event.listen(engine, 'before_cursor_execute', _antes_de_ejecutar)
+    try:
+        yield consultas
+    finally:
+        event.remove(engine, 'before_cursor_execute', _antes_de_ejecutar)
@@ -0,0 +1,86 @@
+# app/reportes_datos.py
+"""
+Capa de datos tabulares para los cálculos de reportes.
+
+Las consultas se ejecutan como SELECT de columnas (sin instancias del ORM ni
+identity map) y las filas pasan directo a un DataFrame de pandas; los totales,
+agrupaciones y pivotes se calculan vectorizados con pandas/NumPy en lugar de
+bucles de Python sobre objetos.
+
+- leer_dataframe: cualquier select() de Core a DataFrame
+- comisiones_dataframe: comisiones que cumplen los filtros (ver
+  exportacion.filtros_comisiones) con el nombre y rol del usuario
+- totales / totales_por_usuario / pivote: agregaciones sobre el DataFrame
+
+Ver bench_reportes.py para la comparación con los bucles sobre el ORM.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from app import db
+from app.models import Comision, Usuario
+
+def leer_dataframe(consulta, conexion=None):
+    """Ejecuta un select() y retorna sus filas como DataFrame (una columna por etiqueta del select)"""
+    resultado = (conexion if conexion is not None else db.session).execute(consulta)
+    return pd.DataFrame.from_records(resultado.all(), columns=list(resultado.keys()))
+
+def consulta_comisiones(filtros):
+    """select() de las columnas de las comisiones que cumplen los filtros, ordenadas por usuario y fecha"""
+    return select(
+        Comision.id, Comision.usuario_id, Usuario.nombre.label('usuario'), Usuario.rol,
+        Comision.monto_base, Comision.porcentaje, Comision.monto_comision, Comision.periodo,
+        Comision.pagado, Comision.fecha_generacion, Comision.venta_id, Comision.abono_id
+    ).join(Usuario, Comision.usuario_id == Usuario.id).where(*filtros).order_by(
+        Usuario.nombre, Comision.usuario_id, Comision.fecha_generacion, Comision.id
+    )
+
+def comisiones_dataframe(filtros, conexion=None):
+    """Comisiones que cumplen los filtros con el nombre y rol de su usuario, como DataFrame"""
+    return leer_dataframe(consulta_comisiones(filtros), conexion)
+
+def totales(df, columnas):
+    """{columna: suma} como enteros de Python (0 si el DataFrame está vacío)"""
+    return {columna: int(np.sum(df[columna].to_numpy(dtype=np.int64))) for columna in columnas}
+
+def totales_por_usuario(df):
+    """
+    Una fila por usuario (en el orden en que aparece) con cantidad, total_base
+    y total_comision de sus comisiones
+    """
+    if df.empty:
+        return pd.DataFrame(columns=['usuario_id', 'usuario', 'rol', 'cantidad', 'total_base', 'total_comision'])
+    return df.groupby(['usuario_id', 'usuario', 'rol'], sort=False).agg(
+        cantidad=('id', 'size'),
+        total_base=('monto_base', 'sum'),
+        total_comision=('monto_comision', 'sum')
+    ).reset_index()
+
+def pivote(df, indice, columnas, valores):
+    """Tabla cruzada con la suma de valores por indice x columnas (0 donde no hay datos)"""
+    if df.empty:
+        return pd.DataFrame()
+    return df.pivot_table(index=indice, columns=columnas, values=valores, aggfunc='sum', fill_value=0)
+
+def registros_por_usuario(df_usuarios):
+    """Filas de totales_por_usuario como {usuario_id: dict} para las plantillas"""
+    return {
+        int(fila.usuario_id): {
+            'usuario': {'id': int(fila.usuario_id), 'nombre': fila.usuario, 'rol': fila.rol},
+            'cantidad': int(fila.cantidad),
+            'total_base': int(fila.total_base),
+            'total_comision': int(fila.total_comision)
+        }
+        for fila in df_usuarios.itertuples(index=False)
+    }
+
+def columnas_pivote(tabla, registros, clave):
+    """
+    Agrega a cada registro de registros_por_usuario la lista de valores de su
+    fila del pivote bajo `clave`; retorna las columnas del pivote en orden
+    """
+    columnas = [str(columna) for columna in tabla.columns]
+    for usuario_id, valores in zip(tabla.index, tabla.to_numpy(dtype=np.int64)):
+        registros[int(usuario_id)][clave] = [int(valor) for valor in valores]
+    return columnas
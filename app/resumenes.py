@@ -0,0 +1,308 @@
+# app/resumenes.py
+"""
+Resúmenes diarios (tablas de hechos pre-agregadas) para reportes y gráficos.
+
+- resumen_ventas_dia: ventas por día, vendedor y tipo (cantidad, total y saldo
+  pendiente)
+- resumen_abonos_dia: abonos por día, cobrador y caja (cantidad y total)
+- resumen_movimientos_dia: movimientos de caja por día, caja y tipo
+
+Un rango de varios meses se responde con cientos de filas de resumen en lugar
+de recorrer cientos de miles de ventas, abonos o movimientos.
+
+Se mantienen en la misma transacción que modifica los datos:
+
+- Los eventos de mapper (after_insert/update/delete) de Venta, Abono y
+  MovimientoCaja aplican un UPSERT relativo (cantidad = cantidad + delta) a la
+  fila del día, de modo que dos transacciones concurrentes no se pisen. Un
+  UPDATE resta el aporte anterior y suma el nuevo.
+- Lo que no pasa por el ORM (los INSERT por lotes de la sincronización)
+  recalcula los días afectados con recalcular_resumenes.
+
+recalcular_resumenes reconstruye por completo los días indicados (o todos) con
+un DELETE y un INSERT ... SELECT agrupado; ver reconstruir_resumenes.py. Al
+iniciar, create_app llena con poblar_resumenes_vacios los resúmenes recién
+creados en una base que ya tiene datos.
+Los reportes leen los totales con resumen_ventas, resumen_abonos y
+resumen_movimientos. Los días son los de la columna fecha tal como se guarda.
+"""
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event, func, insert, inspect, or_, select, Numeric
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import (Venta, Abono, MovimientoCaja, ResumenVentasDia, ResumenAbonosDia,
+                        ResumenMovimientosDia)
+
+# modelo: tabla origen; claves: dimensiones además del día;
+# medidas: {columna del resumen: columna del origen}, además de 'cantidad'
+Resumen = namedtuple('Resumen', 'modelo tabla claves medidas')
+
+RESUMENES = (
+    Resumen(Venta, ResumenVentasDia, ('vendedor_id', 'tipo'),
+            {'total': 'total', 'saldo_pendiente': 'saldo_pendiente'}),
+    Resumen(Abono, ResumenAbonosDia, ('cobrador_id', 'caja_id'), {'total': 'monto'}),
+    Resumen(MovimientoCaja, ResumenMovimientosDia, ('caja_id', 'tipo'), {'total': 'monto'}),
+)
+
+_INSERT_CON_CONFLICTO = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+def _dia(valor):
+    """Día (date) de una fecha guardada como datetime, date o texto ISO"""
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    return valor.date() if isinstance(valor, datetime) else valor
+
+def _atributos(resumen):
+    return ('fecha',) + resumen.claves + tuple(resumen.medidas.values())
+
+def _valores(objeto, resumen, anteriores):
+    """Valores del objeto (o los que tenía antes del flush) que determinan su aporte"""
+    estado = inspect(objeto)
+    valores = {}
+    for atributo in _atributos(resumen):
+        historia = estado.attrs[atributo].history
+        if anteriores and historia.deleted:
+            valores[atributo] = historia.deleted[0]
+        elif anteriores and historia.unchanged:
+            valores[atributo] = historia.unchanged[0]
+        else:
+            valores[atributo] = getattr(objeto, atributo)
+    return valores
+
+def _convertir(columna, valor):
+    if isinstance(columna.type, Numeric):
+        return Decimal(str(valor or 0))
+    return int(round(float(valor or 0)))
+
+def _aporte(resumen, valores, signo):
+    """(clave de la fila de resumen, {medida: delta}) del registro, o None si no tiene fecha"""
+    dia = _dia(valores['fecha'])
+    if dia is None:
+        return None
+    clave = (dia,) + tuple(valores[c] if valores[c] is not None else 0 for c in resumen.claves)
+    columnas = resumen.tabla.__table__.c
+    deltas = {'cantidad': signo}
+    for medida, origen in resumen.medidas.items():
+        deltas[medida] = signo * _convertir(columnas[medida], valores[origen])
+    return clave, deltas
+
+def _sumar(conexion, resumen, clave, deltas):
+    """UPSERT relativo sobre la fila de resumen; elimina la fila si queda vacía"""
+    tabla = resumen.tabla.__table__
+    nombres = ('fecha',) + resumen.claves
+    construir = _INSERT_CON_CONFLICTO.get(conexion.dialect.name)
+    if construir is None:
+        # Motor sin INSERT ... ON CONFLICT: recalcular el día completo
+        recalcular_resumenes(fechas=[clave[0]], modelos=[resumen.modelo], conexion=conexion)
+        return
+
+    consulta = construir(tabla).values(dict(zip(nombres, clave), **deltas))
+    consulta = consulta.on_conflict_do_update(
+        index_elements=list(nombres),
+        set_={medida: tabla.c[medida] + consulta.excluded[medida] for medida in deltas}
+    )
+    conexion.execute(consulta)
+
+    if deltas['cantidad'] < 0:
+        conexion.execute(tabla.delete().where(
+            *[tabla.c[nombre] == valor for nombre, valor in zip(nombres, clave)],
+            tabla.c.cantidad <= 0
+        ))
+
+def _aplicar(conexion, resumen, aportes):
+    """Combina los aportes por fila (un UPDATE dentro del mismo día y clave se anula) y los aplica"""
+    filas = {}
+    for aporte in aportes:
+        if aporte is None:
+            continue
+        clave, deltas = aporte
+        acumulado = filas.setdefault(clave, dict.fromkeys(deltas, 0))
+        for medida, delta in deltas.items():
+            acumulado[medida] += delta
+    for clave, deltas in filas.items():
+        if any(deltas.values()):
+            _sumar(conexion, resumen, clave, deltas)
+
+_POR_MODELO = {resumen.modelo: resumen for resumen in RESUMENES}
+
+def _despues_de_insertar(mapper, conexion, objeto):
+    resumen = _POR_MODELO[mapper.class_]
+    _aplicar(conexion, resumen, [_aporte(resumen, _valores(objeto, resumen, False), 1)])
+
+def _despues_de_actualizar(mapper, conexion, objeto):
+    resumen = _POR_MODELO[mapper.class_]
+    estado = inspect(objeto)
+    if not any(estado.attrs[a].history.has_changes() for a in _atributos(resumen)):
+        return
+    _aplicar(conexion, resumen, [
+        _aporte(resumen, _valores(objeto, resumen, True), -1),
+        _aporte(resumen, _valores(objeto, resumen, False), 1)
+    ])
+
+def _despues_de_eliminar(mapper, conexion, objeto):
+    resumen = _POR_MODELO[mapper.class_]
+    _aplicar(conexion, resumen, [_aporte(resumen, _valores(objeto, resumen, True), -1)])
+
+def _conservar_anterior(objeto, valor, anterior, iniciador):
+    """Sin efecto: con active_history el ORM carga el valor anterior antes de reemplazarlo"""
+
+def init_resumenes():
+    """Registra los eventos que mantienen los resúmenes al escribir ventas, abonos y movimientos"""
+    for resumen in RESUMENES:
+        modelo = resumen.modelo
+        if event.contains(modelo, 'after_insert', _despues_de_insertar):
+            continue
+        event.listen(modelo, 'after_insert', _despues_de_insertar)
+        event.listen(modelo, 'after_update', _despues_de_actualizar)
+        event.listen(modelo, 'after_delete', _despues_de_eliminar)
+        # Para restar el aporte anterior hace falta conocer los valores reemplazados
+        for atributo in _atributos(resumen):
+            event.listen(getattr(modelo, atributo), 'set', _conservar_anterior, active_history=True)
+
+def _rangos(fechas):
+    """Agrupa días consecutivos en rangos [(desde, hasta)]"""
+    rangos = []
+    for dia in sorted(set(fechas)):
+        if rangos and dia - rangos[-1][1] == timedelta(days=1):
+            rangos[-1][1] = dia
+        else:
+            rangos.append([dia, dia])
+    return rangos
+
+def _en_rango(columna, desde, hasta):
+    return (columna >= datetime.combine(desde, time.min)) & \
+           (columna < datetime.combine(hasta + timedelta(days=1), time.min))
+
+def recalcular_resumenes(fechas=None, desde=None, hasta=None, modelos=None, conexion=None):
+    """
+    Reconstruye los resúmenes de los días indicados (fechas, o el rango
+    desde/hasta inclusive; sin ninguno, todos) a partir de los registros, sin
+    confirmar la transacción. modelos limita el recálculo a Venta, Abono o
+    MovimientoCaja. Retorna el número de filas de resumen escritas.
+    """
+    ejecutor = conexion if conexion is not None else db.session
+    if fechas is not None:
+        fechas = {_dia(f) for f in fechas if f is not None}
+        if not fechas:
+            return 0
+        rangos = _rangos(fechas)
+    elif desde is not None or hasta is not None:
+        rangos = [(_dia(desde) or date.min, _dia(hasta) or date.max - timedelta(days=1))]
+    else:
+        rangos = None
+
+    escritas = 0
+    for resumen in RESUMENES:
+        if modelos is not None and resumen.modelo not in modelos:
+            continue
+        modelo = resumen.modelo
+        tabla = resumen.tabla.__table__
+
+        if rangos is None:
+            condicion_origen = modelo.fecha.isnot(None)
+            condicion_resumen = None
+        else:
+            condicion_origen = or_(*[_en_rango(modelo.fecha, d, h) for d, h in rangos])
+            condicion_resumen = or_(*[tabla.c.fecha.between(d, h) for d, h in rangos])
+
+        borrar = tabla.delete()
+        if condicion_resumen is not None:
+            borrar = borrar.where(condicion_resumen)
+        ejecutor.execute(borrar)
+
+        dia = func.date(modelo.fecha)
+        claves = [func.coalesce(getattr(modelo, c), 0) if c.endswith('_id') else getattr(modelo, c)
+                  for c in resumen.claves]
+        agregados = [func.count()] + [func.coalesce(func.sum(getattr(modelo, origen)), 0)
+                                      for origen in resumen.medidas.values()]
+        consulta = select(dia, *claves, *agregados).where(condicion_origen).group_by(dia, *claves)
+        columnas = ['fecha', *resumen.claves, 'cantidad', *resumen.medidas]
+        escritas += ejecutor.execute(insert(tabla).from_select(columnas, consulta)).rowcount or 0
+
+    return escritas
+
+def poblar_resumenes_vacios(conexion=None):
+    """
+    Reconstruye los resúmenes vacíos cuya tabla de origen sí tiene registros,
+    como queda una base con datos cuando db.create_all() crea las tablas de
+    resumen. Retorna el número de filas de resumen escritas (0 si no hizo falta).
+    """
+    ejecutor = conexion if conexion is not None else db.session
+    escritas = 0
+    for resumen in RESUMENES:
+        if ejecutor.execute(select(resumen.tabla.fecha).limit(1)).first() is not None:
+            continue
+        origen = select(resumen.modelo.id).where(resumen.modelo.fecha.isnot(None)).limit(1)
+        if ejecutor.execute(origen).first() is not None:
+            escritas += recalcular_resumenes(modelos=[resumen.modelo], conexion=conexion)
+    return escritas
+
+# --- Consultas de los reportes ---
+
+def _totales_por_dia(modelo, desde, hasta, condiciones, grupo=None):
+    """
+    Filas {fecha, cantidad, <medidas>} por día del rango (inclusive) y los
+    totales del período; con grupo (columna del resumen) además los totales
+    por cada valor del grupo.
+    """
+    medidas = [c.name for c in modelo.__table__.c if not c.primary_key and c.name != 'cantidad']
+    columnas = [modelo.fecha, func.sum(modelo.cantidad).label('cantidad')]
+    columnas += [func.sum(getattr(modelo, m)).label(m) for m in medidas]
+    agrupar = [modelo.fecha]
+    if grupo is not None:
+        columnas.append(grupo.label('grupo'))
+        agrupar.append(grupo)
+
+    filas = db.session.execute(
+        select(*columnas).where(modelo.fecha.between(_dia(desde), _dia(hasta)), *condiciones)
+        .group_by(*agrupar).order_by(modelo.fecha)
+    ).all()
+
+    def vacio():
+        return dict.fromkeys(['cantidad'] + medidas, 0)
+
+    totales = vacio()
+    por_dia = {}
+    por_grupo = {}
+    for fila in filas:
+        dia = por_dia.setdefault(fila.fecha, dict(vacio(), fecha=_dia(fila.fecha)))
+        destinos = [totales, dia]
+        if grupo is not None:
+            destinos.append(por_grupo.setdefault(fila.grupo, vacio()))
+        for clave in ['cantidad'] + medidas:
+            for destino in destinos:
+                destino[clave] += getattr(fila, clave) or 0
+
+    totales['por_dia'] = list(por_dia.values())
+    if grupo is not None:
+        totales['por_grupo'] = por_grupo
+    return totales
+
+def resumen_ventas(desde, hasta, vendedor_id=None, tipo=None):
+    """Cantidad, total y saldo pendiente de las ventas del período, por día y por tipo"""
+    condiciones = []
+    if vendedor_id:
+        condiciones.append(ResumenVentasDia.vendedor_id == vendedor_id)
+    if tipo:
+        condiciones.append(ResumenVentasDia.tipo == tipo)
+    return _totales_por_dia(ResumenVentasDia, desde, hasta, condiciones, grupo=ResumenVentasDia.tipo)
+
+def resumen_abonos(desde, hasta, cobrador_id=None):
+    """Cantidad y total de los abonos del período, por día"""
+    condiciones = [ResumenAbonosDia.cobrador_id == cobrador_id] if cobrador_id else []
+    return _totales_por_dia(ResumenAbonosDia, desde, hasta, condiciones)
+
+def resumen_movimientos(desde, hasta, tipo=None, caja_id=None):
+    """Cantidad y total de los movimientos de caja del período, por día"""
+    condiciones = []
+    if tipo:
+        condiciones.append(ResumenMovimientosDia.tipo == tipo)
+    if caja_id:
+        condiciones.append(ResumenMovimientosDia.caja_id == caja_id)
+    return _totales_por_dia(ResumenMovimientosDia, desde, hasta, condiciones)
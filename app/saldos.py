@@ -0,0 +1,127 @@
+# app/saldos.py
+"""
+Saldos pendientes guardados en lugar de calculados al leer.
+
+- clientes.saldo_pendiente_total: suma de ventas.saldo_pendiente de las ventas
+  a crédito del cliente.
+- creditos.saldo_pendiente: monto del crédito menos la suma de sus abonos.
+
+Ambos se mantienen dentro de la misma transacción que los modifica:
+
+- crear una venta a crédito suma su saldo al cliente
+- registrar un abono resta lo efectivamente abonado a la venta o al crédito
+- eliminar una venta a crédito resta su saldo al cliente
+- la sincronización por lotes recalcula los clientes y créditos afectados
+
+Los ajustes usan un UPDATE relativo (saldo = saldo + delta) para que dos
+transacciones concurrentes sobre la misma fila no se pisen. Las funciones
+reconciliar_* comparan lo guardado con la suma real en una sola consulta y
+opcionalmente corrigen las diferencias (ver reconciliar_saldos.py).
+"""
+from decimal import Decimal
+from sqlalchemy import func, select, update
+from sqlalchemy.orm.util import identity_key
+from app import db
+from app.models import Cliente, Venta, Credito, Abono
+
+def _saldo_real_cliente():
+    """Subconsulta correlacionada con la suma de saldos a crédito del cliente"""
+    return select(func.coalesce(func.sum(Venta.saldo_pendiente), 0)).where(
+        Venta.cliente_id == Cliente.id,
+        Venta.tipo == 'credito'
+    ).scalar_subquery()
+
+def _saldo_real_credito():
+    """Monto del crédito menos sus abonos (subconsulta correlacionada)"""
+    abonado = select(func.coalesce(func.sum(Abono.monto), 0)).where(
+        Abono.credito_id == Credito.id
+    ).scalar_subquery()
+    return Credito.monto - abonado
+
+def _ajustar(columna, registro_id, delta):
+    """UPDATE relativo de una columna de saldo, sin confirmar la transacción"""
+    modelo = columna.class_
+    db.session.execute(
+        update(modelo)
+        .where(modelo.id == registro_id)
+        .values({columna.key: columna + delta})
+        .execution_options(synchronize_session=False)
+    )
+    # Mantener coherente la instancia si ya está cargada en la sesión
+    objeto = db.session.identity_map.get(identity_key(modelo, registro_id))
+    if objeto is not None:
+        db.session.expire(objeto, [columna.key])
+
+def _recalcular(columna, valor, ids):
+    """Recalcula la columna de los registros indicados (o de todos) con un único UPDATE"""
+    modelo = columna.class_
+    consulta = update(modelo).values({columna.key: valor})
+    if ids is not None:
+        ids = {i for i in ids if i}
+        if not ids:
+            return 0
+        consulta = consulta.where(modelo.id.in_(ids))
+    resultado = db.session.execute(consulta.execution_options(synchronize_session=False))
+    for objeto in list(db.session.identity_map.values()):
+        if isinstance(objeto, modelo) and (ids is None or objeto.id in ids):
+            db.session.expire(objeto, [columna.key])
+    return resultado.rowcount
+
+def ajustar_saldo_cliente(cliente_id, delta):
+    """Suma delta al saldo del cliente sin confirmar la transacción"""
+    delta = int(round(delta or 0))
+    if cliente_id and delta:
+        _ajustar(Cliente.saldo_pendiente_total, cliente_id, delta)
+
+def ajustar_saldo_credito(credito_id, delta):
+    """Suma delta (normalmente -monto del abono) al saldo del crédito"""
+    delta = Decimal(str(delta or 0))
+    if credito_id and delta:
+        _ajustar(Credito.saldo_pendiente, credito_id, delta)
+
+def recalcular_saldos_clientes(cliente_ids=None):
+    """Recalcula el saldo de los clientes indicados (o de todos) a partir de sus ventas"""
+    return _recalcular(Cliente.saldo_pendiente_total, _saldo_real_cliente(), cliente_ids)
+
+def recalcular_saldos_creditos(credito_ids=None):
+    """Recalcula el saldo de los créditos indicados (o de todos) a partir de sus abonos"""
+    return _recalcular(Credito.saldo_pendiente, _saldo_real_credito(), credito_ids)
+
+def reconciliar_saldos(corregir=False):
+    """
+    Retorna [(cliente_id, nombre, saldo_guardado, saldo_real)] de los clientes
+    cuyo saldo guardado no coincide con sus ventas. Con corregir=True además
+    los recalcula y confirma la transacción.
+    """
+    saldo_real = _saldo_real_cliente().label('saldo_real')
+    diferencias = db.session.query(
+        Cliente.id, Cliente.nombre, Cliente.saldo_pendiente_total, saldo_real
+    ).filter(
+        Cliente.saldo_pendiente_total != _saldo_real_cliente()
+    ).order_by(Cliente.id).all()
+
+    if corregir and diferencias:
+        recalcular_saldos_clientes([d.id for d in diferencias])
+        db.session.commit()
+
+    return [(d.id, d.nombre, int(d.saldo_pendiente_total), int(d.saldo_real)) for d in diferencias]
+
+def reconciliar_saldos_creditos(corregir=False):
+    """
+    Retorna [(credito_id, cliente_id, saldo_guardado, saldo_real)] de los
+    créditos cuyo saldo guardado no coincide con monto - abonos. Con
+    corregir=True además los recalcula y confirma la transacción.
+    """
+    saldo_real = _saldo_real_credito().label('saldo_real')
+    diferencias = db.session.query(
+        Credito.id, Credito.cliente_id, Credito.saldo_pendiente, saldo_real
+    ).filter(
+        Credito.saldo_pendiente != _saldo_real_credito()
+    ).order_by(Credito.id).all()
+
+    if corregir and diferencias:
+        recalcular_saldos_creditos([d.id for d in diferencias])
+        db.session.commit()
+
+    return [(d.id, d.cliente_id, Decimal(str(d.saldo_pendiente)), Decimal(str(d.saldo_real)))
+            for d in diferencias]
@@ -41,4 +41,128 @@ class Utils {
             }
         }, 5000);
     }
+
+    /**
+     * Typeahead de clientes: al escribir en `input` consulta /clientes/buscar
+     * y reemplaza las opciones de `select` con los resultados (a lo sumo
+     * `limite`). Si queda un solo resultado lo selecciona y dispara 'change'.
+     * Opciones: conSaldo (solo clientes con créditos pendientes), limite, espera (ms).
+     */
+    static typeaheadClientes(input, select, opciones = {}) {
+        const { conSaldo = false, limite = 20, espera = 250 } = opciones;
+        let temporizador = null;
+        let peticion = null;
+
+        function mostrar(clientes, termino) {
+            const seleccionado = select.value;
+            select.innerHTML = '';
+
+            const placeholder = document.createElement('option');
+            placeholder.value = '';
+            placeholder.textContent = clientes.length
+                ? `Seleccione un cliente (${clientes.length}${clientes.length >= limite ? '+' : ''})`
+                : 'No se encontraron clientes';
+            select.appendChild(placeholder);
+
+            clientes.forEach(cliente => {
+                const option = document.createElement('option');
+                option.value = cliente.id;
+                option.textContent = cliente.texto;
+                option.selected = String(cliente.id) === seleccionado;
+                select.appendChild(option);
+            });
+
+            if (clientes.length === 1 && termino.length > 2) {
+                select.value = String(clientes[0].id);
+                select.dispatchEvent(new Event('change'));
+            }
+        }
+
+        function buscar() {
+            const termino = input.value.trim();
+            const params = new URLSearchParams({ q: termino, limite: limite });
+            if (conSaldo) params.set('con_saldo', '1');
+
+            if (peticion) peticion.abort();
+            peticion = new AbortController();
+
+            fetch(`/clientes/buscar?${params}`, { signal: peticion.signal, credentials: 'same-origin' })
+                .then(res => res.ok ? res.json() : Promise.reject(new Error(`HTTP ${res.status}`)))
+                .then(clientes => mostrar(clientes, termino))
+                .catch(err => {
+                    if (err.name !== 'AbortError') console.error('Error buscando clientes:', err);
+                });
+        }
+
+        input.addEventListener('input', function() {
+            clearTimeout(temporizador);
+            temporizador = setTimeout(buscar, espera);
+        });
+
+        return buscar;
+    }
+
+    /**
+     * Catálogo de productos con copia en localStorage. Pide /productos/catalogo
+     * con If-None-Match (304 si no cambió) y ?since= (solo los modificados) y
+     * aplica el delta sobre la copia local. Sin conexión retorna la copia.
+     * Retorna una promesa con la lista de productos.
+     */
+    static async catalogoProductos() {
+        const CLAVE = 'catalogoProductos';
+        let copia = null;
+        try {
+            copia = JSON.parse(localStorage.getItem(CLAVE));
+        } catch (e) {
+            copia = null;
+        }
+
+        async function pedir(base) {
+            const params = new URLSearchParams();
+            if (base && base.watermark) params.set('since', base.watermark);
+            const headers = base && base.etag ? { 'If-None-Match': base.etag } : {};
+
+            const res = await fetch(`/productos/catalogo?${params}`, { headers, credentials: 'same-origin', cache: 'no-store' });
+            if (res.status === 304) return base;
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+            const respuesta = await res.json();
+            const productos = base ? Object.assign({}, base.productos) : {};
+            respuesta.data.forEach(p => { productos[p.id] = p; });
+            return {
+                etag: res.headers.get('ETag'),
+                watermark: respuesta.watermark,
+                total: respuesta.total,
+                productos
+            };
+        }
+
+        try {
+            let actual = await pedir(copia);
+            // Si la cantidad no coincide hubo eliminaciones: pedir el catálogo completo
+            if (Object.keys(actual.productos).length !== actual.total) {
+                actual = await pedir(null);
+            }
+            if (actual !== copia) {
+                try {
+                    localStorage.setItem(CLAVE, JSON.stringify(actual));
+                } catch (e) {
+                    console.warn('No se pudo guardar el catálogo de productos:', e);
+                }
+            }
+            copia = actual;
+        } catch (err) {
+            console.warn('Usando catálogo de productos guardado:', err);
+        }
+
+        return copia ? Object.values(copia.productos) : [];
+    }
+
+    /** Busca un producto por código exacto (lector de código de barras); null si no existe */
+    static async productoPorCodigo(codigo) {
+        const res = await fetch(`/productos/codigo/${encodeURIComponent(codigo)}`, { credentials: 'same-origin' });
+        if (res.status === 404) return null;
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        return res.json();
+    }
 }
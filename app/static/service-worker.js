@@ -1,5 +1,5 @@
 // Service Worker simplificado y robusto para CreditApp
-const CACHE_VERSION = 'creditapp-v1';
+const CACHE_VERSION = 'creditapp-v4';
 const STATIC_CACHE = `static-${CACHE_VERSION}`;
 const PAGES_CACHE = `pages-${CACHE_VERSION}`;
 
@@ -27,6 +27,15 @@ const CRITICAL_ASSETS = [
     'https://code.jquery.com/jquery-3.7.1.min.js'
 ];
 
+// Respuestas que cambian con cada búsqueda, abono o exportación
+const SIN_CACHE = [
+    '/clientes/buscar',
+    '/abonos/cargar-ventas/',
+    '/productos/catalogo',
+    '/productos/codigo/',
+    '/reportes/trabajos/'
+];
+
 // Instalación - Cachear assets críticos
 self.addEventListener('install', event => {
     console.log('[SW] Instalando...');
@@ -71,6 +80,12 @@ self.addEventListener('fetch', event => {
         return;
     }
 
+    // Consultas de los formularios (typeahead, catálogo versionado con su propia
+    // copia en localStorage): siempre a la red, nunca en caché
+    if (SIN_CACHE.some(prefijo => url.pathname.startsWith(prefijo))) {
+        return;
+    }
+
     event.respondWith(handleRequest(request));
 });
 
@@ -0,0 +1,175 @@
+# app/trabajos.py
+"""
+Cola de trabajos en segundo plano para las exportaciones de reportes.
+
+Las exportaciones grandes no se generan dentro del worker web (sync, con
+timeout de 120 s): la vista registra un TrabajoReporte 'pendiente' y redirige
+a una página que consulta su estado. El proceso worker_reportes.py (iniciado
+por gunicorn, ver gunicorn_config.py, o por separado) toma los pendientes,
+escribe el archivo en TRABAJOS_DIR y lo marca 'completado'; la descarga se
+sirve desde ese archivo.
+
+- La cola vive en la base de datos, así que sobrevive a reinicios de los
+  workers web y del propio worker.
+- Tomar un trabajo es un UPDATE condicional (estado = 'pendiente'), de modo
+  que varios workers no procesan el mismo.
+- Un trabajo 'en_proceso' por más de TRABAJOS_TIMEOUT segundos (el worker
+  murió) vuelve a 'pendiente' hasta TRABAJOS_MAX_INTENTOS veces.
+- Los trabajos y archivos más antiguos que TRABAJOS_RETENCION_HORAS se
+  eliminan.
+
+El worker y la aplicación web deben compartir TRABAJOS_DIR (mismo servidor o
+disco compartido).
+"""
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update
+
+from app import db
+from app.models import TrabajoReporte
+from app.exportacion import (escribir_csv, escribir_xlsx, exportacion_ventas, exportacion_abonos,
+                             exportacion_egresos, exportacion_comisiones, exportacion_liquidacion)
+
+def _fecha(valor):
+    return valor if isinstance(valor, datetime) else datetime.fromisoformat(valor)
+
+# tipo -> función que arma la Exportacion a partir de los parámetros (JSON) del trabajo
+EXPORTACIONES = {
+    'ventas': lambda p: exportacion_ventas(_fecha(p['fecha_inicio']), _fecha(p['fecha_fin']), p.get('vendedor_id')),
+    'creditos': lambda p: exportacion_ventas(_fecha(p['fecha_inicio']), _fecha(p['fecha_fin']), p.get('vendedor_id'),
+                                             solo_credito=True),
+    'abonos': lambda p: exportacion_abonos(_fecha(p['fecha_inicio']), _fecha(p['fecha_fin']), p.get('vendedor_id')),
+    'egresos': lambda p: exportacion_egresos(_fecha(p['fecha_inicio']), _fecha(p['fecha_fin'])),
+    'comisiones': lambda p: exportacion_comisiones(_fecha(p['fecha_inicio']), _fecha(p['fecha_fin']),
+                                                   p.get('usuario_id')),
+    'liquidacion': lambda p: exportacion_liquidacion(_fecha(p['fecha_inicio']), _fecha(p['fecha_fin']),
+                                                     p.get('usuario_id')),
+}
+
+def construir_exportacion(tipo, parametros):
+    """Exportacion del tipo indicado; las fechas pueden venir como datetime o en ISO 8601"""
+    return EXPORTACIONES[tipo](parametros)
+
+def _directorio():
+    directorio = current_app.config['TRABAJOS_DIR']
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+def encolar(tipo, parametros, formato, usuario_id):
+    """Registra un trabajo pendiente y confirma la transacción; retorna el TrabajoReporte"""
+    if tipo not in EXPORTACIONES:
+        raise ValueError(f"Tipo de exportación desconocido: {tipo}")
+
+    trabajo = TrabajoReporte(
+        tipo=tipo,
+        formato='csv' if formato == 'csv' else 'xlsx',
+        parametros=json.dumps(parametros, default=lambda v: v.isoformat()),
+        usuario_id=usuario_id
+    )
+    db.session.add(trabajo)
+    db.session.commit()
+    current_app.logger.info(f"Trabajo de reporte #{trabajo.id} encolado ({tipo}, {trabajo.formato})")
+    return trabajo
+
+def tomar_siguiente():
+    """Marca como 'en_proceso' el pendiente más antiguo y lo retorna, o None si no hay"""
+    while True:
+        candidato = db.session.query(TrabajoReporte.id).filter(
+            TrabajoReporte.estado == 'pendiente'
+        ).order_by(TrabajoReporte.id).limit(1).scalar()
+        if candidato is None:
+            db.session.commit()
+            return None
+
+        tomado = db.session.execute(
+            update(TrabajoReporte)
+            .where(TrabajoReporte.id == candidato, TrabajoReporte.estado == 'pendiente')
+            .values(estado='en_proceso', iniciado=datetime.utcnow(), intentos=TrabajoReporte.intentos + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+
+        # Otro worker lo tomó primero: intentar con el siguiente
+        if tomado:
+            return db.session.get(TrabajoReporte, candidato)
+
+def ejecutar(trabajo):
+    """Genera el archivo del trabajo y actualiza su estado (completado o error)"""
+    try:
+        exportacion = construir_exportacion(trabajo.tipo, json.loads(trabajo.parametros))
+        ruta = os.path.join(_directorio(), f"{trabajo.id}_{uuid.uuid4().hex}.{trabajo.formato}")
+
+        if trabajo.formato == 'csv':
+            escribir_csv(exportacion, ruta)
+        else:
+            escribir_xlsx(exportacion, ruta)
+
+        # La lectura por lotes deja abierta la transacción de solo lectura
+        db.session.rollback()
+        trabajo.ruta_resultado = ruta
+        trabajo.nombre_archivo = f"{exportacion.archivo}.{trabajo.formato}"
+        trabajo.estado = 'completado'
+        trabajo.error = None
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error en trabajo de reporte #{trabajo.id}: {e}")
+        trabajo.estado = 'error'
+        trabajo.error = str(e)
+
+    trabajo.terminado = datetime.utcnow()
+    db.session.commit()
+    return trabajo
+
+def recuperar_abandonados():
+    """Reencola (o marca con error) los trabajos que quedaron 'en_proceso' tras morir un worker"""
+    limite = datetime.utcnow() - timedelta(seconds=current_app.config['TRABAJOS_TIMEOUT'])
+    max_intentos = current_app.config['TRABAJOS_MAX_INTENTOS']
+    abandonados = TrabajoReporte.query.filter(
+        TrabajoReporte.estado == 'en_proceso',
+        TrabajoReporte.iniciado < limite
+    ).all()
+
+    for trabajo in abandonados:
+        if trabajo.intentos >= max_intentos:
+            trabajo.estado = 'error'
+            trabajo.error = 'El trabajo se interrumpió demasiadas veces'
+            trabajo.terminado = datetime.utcnow()
+        else:
+            trabajo.estado = 'pendiente'
+    db.session.commit()
+    return len(abandonados)
+
+def limpiar_antiguos():
+    """Elimina los trabajos terminados (y sus archivos) más antiguos que la retención"""
+    limite = datetime.utcnow() - timedelta(hours=current_app.config['TRABAJOS_RETENCION_HORAS'])
+    antiguos = TrabajoReporte.query.filter(
+        TrabajoReporte.estado.in_(['completado', 'error']),
+        TrabajoReporte.creado < limite
+    ).all()
+
+    for trabajo in antiguos:
+        if trabajo.ruta_resultado and os.path.exists(trabajo.ruta_resultado):
+            try:
+                os.remove(trabajo.ruta_resultado)
+            except OSError as e:
+                current_app.logger.warning(f"No se pudo eliminar {trabajo.ruta_resultado}: {e}")
+        db.session.delete(trabajo)
+    db.session.commit()
+    return len(antiguos)
+
+def serializar_trabajo(trabajo):
+    """Estado del trabajo para la consulta periódica de la página de espera"""
+    return {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'formato': trabajo.formato,
+        'estado': trabajo.estado,
+        'error': trabajo.error,
+        'nombre_archivo': trabajo.nombre_archivo,
+        'creado': trabajo.creado.isoformat() if trabajo.creado else None,
+        'terminado': trabajo.terminado.isoformat() if trabajo.terminado else None
+    }
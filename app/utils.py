@@ -7,17 +7,64 @@ from app import db
 from app.models import Configuracion, Comision, Venta, Abono, MovimientoCaja
 import logging
 import base64
+import threading
+import time
+from types import SimpleNamespace
+from app.kpi_cache import invalidar_kpis
+
+# Caché de la configuración por proceso: se invalida al guardar en config.editar
+# y, como cada worker tiene su propia copia, expira tras CONFIG_CACHE_TTL segundos
+_config_cache = {'valor': None, 'cargado': 0}
+_config_lock = threading.Lock()
+
+def get_configuracion():
+    """
+    Retorna la configuración de la empresa (copia de solo lectura con los mismos
+    atributos que Configuracion) o None si no existe, consultando la base de
+    datos solo cuando la caché está vacía o expiró.
+    """
+    ttl = current_app.config.get('CONFIG_CACHE_TTL', 60)
+    if _config_cache['cargado'] and time.time() - _config_cache['cargado'] < ttl:
+        return _config_cache['valor']
+
+    with _config_lock:
+        if _config_cache['cargado'] and time.time() - _config_cache['cargado'] < ttl:
+            return _config_cache['valor']
 
-def format_currency(amount):
-    """Formatea un monto como moneda (sin decimales)"""
-    from decimal import Decimal, InvalidOperation
-    
-    # Obtener símbolo de moneda de la configuración
-    try:
         config = Configuracion.query.first()
-        moneda = config.moneda if config else "$"
+        # Copia desacoplada de la sesión para poder compartirla entre requests
+        valor = SimpleNamespace(**{
+            columna.name: getattr(config, columna.name)
+            for columna in Configuracion.__table__.columns
+        }) if config else None
+
+        _config_cache['valor'] = valor
+        _config_cache['cargado'] = time.time()
+        return valor
+
+def invalidar_configuracion():
+    """Descarta la configuración cacheada (llamar después de guardarla)"""
+    with _config_lock:
+        _config_cache['valor'] = None
+        _config_cache['cargado'] = 0
+
+def simbolo_moneda():
+    """Símbolo de moneda configurado, '$' por defecto"""
+    try:
+        config = get_configuracion()
+        return config.moneda if config and config.moneda else "$"
     except Exception:
-        moneda = "$"
+        return "$"
+
+def format_currency(amount, moneda=None):
+    """
+    Formatea un monto como moneda (sin decimales). Para formatear muchos valores
+    obtenga el símbolo una vez con simbolo_moneda() y páselo en 'moneda'.
+    """
+    from decimal import Decimal, InvalidOperation
+    
+    if moneda is None:
+        moneda = simbolo_moneda()
         
     # Si amount es None o vacío, devolver cero formateado
     if amount is None:
@@ -53,7 +100,7 @@ def calcular_comision(monto, usuario_id, venta_id=None, abono_id=None):
     """Calcula la comisión sobre un monto para un usuario según su rol"""
     from app.models import Usuario
     
-    config = Configuracion.query.first()
+    config = get_configuracion()
     usuario = Usuario.query.get(usuario_id)
     
     if not config or not usuario:
@@ -83,37 +130,44 @@ def calcular_comision(monto, usuario_id, venta_id=None, abono_id=None):
 
     db.session.add(comision)
     db.session.commit()
+    invalidar_kpis('comisión registrada')
 
     return monto_comision
 
 
+def periodo_comision_actual():
+    """Retorna (fecha_inicio, fecha_fin) del período de comisión vigente según la configuración"""
+    try:
+        config = get_configuracion()
+        periodo = config.periodo_comision if config else 'mensual'
+    except Exception:
+        periodo = 'mensual'
+
+    today = datetime.now()
+    if periodo == 'mensual':
+        fecha_inicio = datetime(today.year, today.month, 1)
+        if today.month == 12:
+            fecha_fin = datetime(today.year + 1, 1, 1) - timedelta(days=1)
+        else:
+            fecha_fin = datetime(today.year, today.month + 1, 1) - timedelta(days=1)
+    else:  # quincenal
+        if today.day <= 15:
+            fecha_inicio = datetime(today.year, today.month, 1)
+            fecha_fin = datetime(today.year, today.month, 15)
+        else:
+            fecha_inicio = datetime(today.year, today.month, 16)
+            if today.month == 12:
+                fecha_fin = datetime(today.year + 1, 1, 1) - timedelta(days=1)
+            else:
+                fecha_fin = datetime(today.year, today.month + 1, 1) - timedelta(days=1)
+
+    return fecha_inicio, fecha_fin
+
 def get_comisiones_periodo(usuario_id=None, fecha_inicio=None, fecha_fin=None):
     """Obtiene las comisiones para un período determinado"""
     try:
         if not fecha_inicio:
-            try:
-                config = Configuracion.query.first()
-                periodo = config.periodo_comision if config else 'mensual'
-            except Exception:
-                periodo = 'mensual'
-
-            today = datetime.now()
-            if periodo == 'mensual':
-                fecha_inicio = datetime(today.year, today.month, 1)
-                if today.month == 12:
-                    fecha_fin = datetime(today.year + 1, 1, 1) - timedelta(days=1)
-                else:
-                    fecha_fin = datetime(today.year, today.month + 1, 1) - timedelta(days=1)
-            else:  # quincenal
-                if today.day <= 15:
-                    fecha_inicio = datetime(today.year, today.month, 1)
-                    fecha_fin = datetime(today.year, today.month, 15)
-                else:
-                    fecha_inicio = datetime(today.year, today.month, 16)
-                    if today.month == 12:
-                        fecha_fin = datetime(today.year + 1, 1, 1) - timedelta(days=1)
-                    else:
-                        fecha_fin = datetime(today.year, today.month + 1, 1) - timedelta(days=1)
+            fecha_inicio, fecha_fin = periodo_comision_actual()
 
         # Crear nueva sesión para evitar problemas de transacciones abortadas
         query = Comision.query.filter(
@@ -232,6 +286,7 @@ def registrar_movimiento_caja(
 
         db.session.add(movimiento)
         db.session.commit()
+        invalidar_kpis('movimiento de caja')
 
         logging.info(f"Movimiento registrado exitosamente: ID {movimiento.id}")
         return movimiento
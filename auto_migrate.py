@@ -179,6 +179,44 @@ with app.app_context():
         except Exception as e:
             logger.error(f"  ✗ Error creando tablas: {e}")
 
+        # PASO 3.1: Columnas desnormalizadas (antes de recrear los triggers de sync
+        # para que el llenado inicial no genere entradas en change_log)
+        logger.info("\n=== PASO 3.1: SALDOS PENDIENTES GUARDADOS ===")
+        try:
+            from app.models_update import agregar_saldo_clientes, agregar_saldo_creditos
+            agregar_saldo_clientes()
+            logger.info("  ✓ clientes.saldo_pendiente_total verificado")
+            agregar_saldo_creditos()
+            logger.info("  ✓ creditos.saldo_pendiente verificado")
+        except Exception as e:
+            logger.error(f"  ✗ Error agregando saldos guardados: {e}")
+
+        # PASO 3.2: Índices declarados en los modelos para bases existentes
+        logger.info("\n=== PASO 3.2: ÍNDICES DE CONSULTAS FRECUENTES ===")
+        try:
+            from app.models_update import crear_indices_rendimiento
+            crear_indices_rendimiento()
+            logger.info("  ✓ Índices verificados")
+        except Exception as e:
+            logger.error(f"  ✗ Error creando índices: {e}")
+
+        # PASO 3.3: Búsqueda de clientes por trigramas
+        logger.info("\n=== PASO 3.3: BÚSQUEDA DE CLIENTES (pg_trgm) ===")
+        try:
+            from app.models_update import habilitar_busqueda_clientes
+            habilitar_busqueda_clientes()
+            logger.info("  ✓ Índices de búsqueda de clientes verificados")
+        except Exception as e:
+            logger.error(f"  ✗ Error habilitando la búsqueda de clientes: {e}")
+
+        # PASO 3.4: Resúmenes diarios para reportes
+        logger.info("\n=== PASO 3.4: RESÚMENES DIARIOS DE REPORTES ===")
+        try:
+            from app.models_update import poblar_resumenes
+            poblar_resumenes()
+        except Exception as e:
+            logger.error(f"  ✗ Error poblando resúmenes diarios: {e}")
+
         # PASO 4: Crear función y triggers de sincronización mejorados
         logger.info("\n=== PASO 4: CREANDO TRIGGERS DE SINCRONIZACIÓN MEJORADOS ===")
         with db.engine.begin() as connection:
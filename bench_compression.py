@@ -0,0 +1,128 @@
+# bench_compression.py - Bytes en la red y costo de CPU de la compresión de /api/v1
+"""
+Uso:
+    python bench_compression.py [repeticiones]
+
+Genera payloads JSON con la misma forma que /api/v1/clientes, /api/v1/ventas,
+/api/v1/abonos y sync/pull para distintos tamaños y mide, por cada encoding
+soportado, el tamaño comprimido y el tiempo de CPU de comprimir y descomprimir.
+"""
+import sys
+import json
+import gzip
+import time
+import random
+from datetime import datetime, timedelta
+
+from app.api.compression import comprimir, ENCODINGS_SOPORTADOS, brotli
+
+TAMANOS = [10, 100, 1000, 10000]
+NOMBRES = ['María', 'José', 'Luis', 'Ana', 'Carlos', 'Lucía', 'Andrés', 'Sofía']
+APELLIDOS = ['Gómez', 'Rodríguez', 'Martínez', 'López', 'Hernández', 'Díaz']
+
+
+def _fecha(i):
+    return (datetime(2024, 1, 1) + timedelta(minutes=37 * i)).isoformat()
+
+
+def payload_clientes(n):
+    return {'success': True, 'count': n, 'data': [{
+        'id': i,
+        'uuid': f'{random.getrandbits(128):032x}',
+        'nombre': f'{random.choice(NOMBRES)} {random.choice(APELLIDOS)}',
+        'cedula': str(10000000 + i),
+        'telefono': f'300{random.randint(1000000, 9999999)}',
+        'email': '',
+        'direccion': f'Calle {random.randint(1, 200)} # {random.randint(1, 99)}-{random.randint(1, 99)}',
+        'fecha_registro': _fecha(i)
+    } for i in range(n)]}
+
+
+def payload_ventas(n):
+    return {'success': True, 'count': n, 'data': [{
+        'id': i,
+        'uuid': f'{random.getrandbits(128):032x}',
+        'cliente_id': random.randint(1, 5000),
+        'vendedor_id': random.randint(1, 20),
+        'total': float(random.randint(10, 5000) * 1000),
+        'tipo': random.choice(['contado', 'credito']),
+        'saldo_pendiente': float(random.randint(0, 300) * 1000),
+        'estado': random.choice(['pendiente', 'pagado']),
+        'fecha': _fecha(i)
+    } for i in range(n)]}
+
+
+def payload_abonos(n):
+    return {'success': True, 'count': n, 'data': [{
+        'id': i,
+        'uuid': f'{random.getrandbits(128):032x}',
+        'venta_id': random.randint(1, 50000),
+        'credito_id': None,
+        'monto': float(random.randint(5, 500) * 1000),
+        'cobrador_id': random.randint(1, 20),
+        'caja_id': random.randint(1, 4),
+        'notas': random.choice(['', 'Pago semanal', 'Abono en efectivo']),
+        'fecha': _fecha(i)
+    } for i in range(n)]}
+
+
+def payload_sync_pull(n):
+    ventas = payload_ventas(n)['data']
+    return {'success': True, 'has_more': False, 'next_cursor': str(n), 'changes': [{
+        'uuid': f'{random.getrandbits(128):032x}',
+        'tabla': 'ventas',
+        'registro_uuid': v['uuid'],
+        'operacion': 'INSERT',
+        'datos': v,
+        'timestamp': v['fecha'],
+        'version': 1
+    } for v in ventas]}
+
+
+PAYLOADS = {
+    'clientes': payload_clientes,
+    'ventas': payload_ventas,
+    'abonos': payload_abonos,
+    'sync/pull': payload_sync_pull,
+}
+
+
+def _cpu_ms(funcion, repeticiones):
+    inicio = time.process_time()
+    for _ in range(repeticiones):
+        resultado = funcion()
+    return (time.process_time() - inicio) * 1000 / repeticiones, resultado
+
+
+def _descomprimir(datos, encoding):
+    if encoding == 'br':
+        return brotli.decompress(datos)
+    return gzip.decompress(datos)
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    random.seed(2025)
+
+    print(f"Encodings soportados: {', '.join(ENCODINGS_SOPORTADOS)}"
+          + ('' if brotli else ' (instale "brotli" para medir br)'))
+    print(f"{'payload':<10} {'filas':>6} {'json':>11} {'encoding':<8} {'comprimido':>11} "
+          f"{'ratio':>6} {'comp ms':>8} {'desc ms':>8}")
+
+    for nombre, generador in PAYLOADS.items():
+        for n in TAMANOS:
+            datos = json.dumps(generador(n)).encode('utf-8')
+            for encoding in ENCODINGS_SOPORTADOS:
+                for nivel in ([1, 6, 9] if encoding == 'gzip' else [None]):
+                    etiqueta = f'{encoding}-{nivel}' if nivel else encoding
+                    comp_ms, comprimido = _cpu_ms(
+                        lambda: comprimir(datos, encoding, nivel or 6), repeticiones)
+                    desc_ms, _ = _cpu_ms(
+                        lambda: _descomprimir(comprimido, encoding), repeticiones)
+                    print(f"{nombre:<10} {n:>6} {len(datos):>11,} {etiqueta:<8} "
+                          f"{len(comprimido):>11,} {len(datos) / len(comprimido):>6.1f} "
+                          f"{comp_ms:>8.2f} {desc_ms:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
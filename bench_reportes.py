@@ -0,0 +1,135 @@
+# bench_reportes.py - Bucles sobre el ORM vs. DataFrames para los totales de reportes
+"""
+Uso:
+    python bench_reportes.py                   # 10k, 100k y 1M comisiones
+    python bench_reportes.py 10000 50000       # tamaños a medir
+
+Carga N comisiones sintéticas en una base SQLite en memoria y calcula lo que
+muestran reportes.comisiones y liquidar_masiva (totales por usuario y
+generales, más un pivote usuario x período) de dos formas:
+
+- orm: Query(Comision, Usuario).all() y bucles de Python que arman los
+  diccionarios, como hacían las vistas
+- pandas: SELECT de columnas a DataFrame (app/reportes_datos.py) y groupby,
+  pivot_table y sumas vectorizadas
+
+Mide por separado la lectura y el cálculo, y verifica que ambos resultados
+coincidan. Con 1M de filas el camino orm necesita varios GB de memoria.
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.exportacion import filtros_comisiones
+from app.models import Comision, Usuario
+from app.reportes_datos import comisiones_dataframe, totales, totales_por_usuario, pivote
+
+TAMANOS = [10000, 100000, 1000000]
+USUARIOS = 50
+INICIO = datetime(2024, 1, 1)
+FIN = datetime(2024, 6, 30)
+LOTE = 50000
+
+
+def crear_base(n):
+    """Base SQLite en memoria con USUARIOS usuarios y n comisiones"""
+    engine = create_engine('sqlite://')
+    Usuario.__table__.create(engine)
+    Comision.__table__.create(engine)
+    rnd = random.Random(n)
+    ahora = datetime.utcnow()
+    with engine.begin() as conexion:
+        conexion.execute(insert(Usuario.__table__), [{
+            'id': i, 'nombre': f'Usuario {i:03d}', 'email': f'u{i}@ejemplo.com', 'password': 'x',
+            'rol': rnd.choice(['vendedor', 'cobrador']), 'uuid': f'u-{i}', 'created_at': ahora,
+            'updated_at': ahora, 'sync_version': 1
+        } for i in range(1, USUARIOS + 1)])
+
+        for desde in range(0, n, LOTE):
+            filas = []
+            for i in range(desde, min(desde + LOTE, n)):
+                base = rnd.randint(10, 5000) * 1000
+                porcentaje = rnd.choice([3, 5, 10])
+                fecha = INICIO + timedelta(minutes=rnd.randint(0, 260000))
+                filas.append({
+                    'id': i + 1, 'usuario_id': rnd.randint(1, USUARIOS), 'monto_base': base,
+                    'porcentaje': porcentaje, 'monto_comision': base * porcentaje // 100,
+                    'periodo': fecha.strftime('%Y-%m'), 'pagado': rnd.random() < 0.3,
+                    'fecha_generacion': fecha, 'uuid': f'c-{i}', 'created_at': ahora,
+                    'updated_at': ahora, 'sync_version': 1
+                })
+            conexion.execute(insert(Comision.__table__), filas)
+    return engine
+
+
+def con_orm(session):
+    inicio = time.perf_counter()
+    filas = session.query(Comision, Usuario).join(Usuario, Comision.usuario_id == Usuario.id).filter(
+        *filtros_comisiones(INICIO, FIN)
+    ).all()
+    lectura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    por_usuario = {}
+    por_periodo = {}
+    total_base = 0
+    total_comision = 0
+    for comision, usuario in filas:
+        if usuario.id not in por_usuario:
+            por_usuario[usuario.id] = {'cantidad': 0, 'total_base': 0, 'total_comision': 0}
+        por_usuario[usuario.id]['cantidad'] += 1
+        por_usuario[usuario.id]['total_base'] += comision.monto_base
+        por_usuario[usuario.id]['total_comision'] += comision.monto_comision
+        clave = (usuario.id, comision.periodo)
+        por_periodo[clave] = por_periodo.get(clave, 0) + comision.monto_comision
+        total_base += comision.monto_base
+        total_comision += comision.monto_comision
+    calculo = time.perf_counter() - inicio
+
+    return lectura, calculo, (por_usuario, por_periodo, total_base, total_comision)
+
+
+def con_pandas(session):
+    inicio = time.perf_counter()
+    df = comisiones_dataframe(filtros_comisiones(INICIO, FIN), conexion=session)
+    lectura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    df_usuarios = totales_por_usuario(df)
+    tabla = pivote(df, 'usuario_id', 'periodo', 'monto_comision')
+    suma = totales(df, ['monto_base', 'monto_comision'])
+    calculo = time.perf_counter() - inicio
+
+    por_usuario = {
+        int(f.usuario_id): {'cantidad': int(f.cantidad), 'total_base': int(f.total_base),
+                            'total_comision': int(f.total_comision)}
+        for f in df_usuarios.itertuples(index=False)
+    }
+    por_periodo = {(int(u), p): int(v) for (u, p), v in tabla.stack().items() if v}
+    return lectura, calculo, (por_usuario, por_periodo, suma['monto_base'], suma['monto_comision'])
+
+
+def main():
+    tamanos = [int(t) for t in sys.argv[1:]] or TAMANOS
+    print(f"{'filas':>10} {'método':>8} {'lectura s':>10} {'cálculo s':>10} {'total s':>9}")
+
+    for n in tamanos:
+        engine = crear_base(n)
+        resultados = {}
+        for nombre, funcion in (('orm', con_orm), ('pandas', con_pandas)):
+            with Session(engine) as session:
+                lectura, calculo, resultados[nombre] = funcion(session)
+            print(f"{n:>10,} {nombre:>8} {lectura:>10.3f} {calculo:>10.3f} {lectura + calculo:>9.3f}")
+
+        if resultados['orm'] != resultados['pandas']:
+            print(f"  ✗ Los resultados no coinciden con {n:,} filas")
+            sys.exit(1)
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
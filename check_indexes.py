@@ -0,0 +1,156 @@
+# check_indexes.py - Verifica con EXPLAIN que las consultas frecuentes usan índices
+"""
+Uso:
+    python check_indexes.py
+
+Usa la base configurada en DATABASE_URL (PostgreSQL en producción, SQLite en
+desarrollo) y obtiene el plan de cada consulta de los controladores sin
+ejecutarla. Las consultas se arman con las mismas funciones que usan las
+vistas (ventas_visibles, consulta_pagina, consulta_movimientos, ...), así
+que un cambio en el controlador se refleja aquí sin copiarlo. Falla (código de salida 1) si el plan no usa ninguno de los
+índices esperados, por ejemplo porque la migración (auto_migrate.py, PASO 3.2)
+no se aplicó o porque un cambio en la consulta dejó de ser indexable.
+
+En PostgreSQL se desactiva enable_seqscan dentro de la transacción: con tablas
+pequeñas el planificador prefiere leer la tabla completa aunque el índice
+exista, y lo que se verifica aquí es que el índice sea utilizable.
+"""
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import with_parent
+
+from app.config import Config
+
+# Las opciones del pool/SSL (connect_timeout, sslmode) son de PostgreSQL
+if not Config.SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+    Config.SQLALCHEMY_ENGINE_OPTIONS = {}
+
+from app import create_app, db
+from app.models import Venta, Abono, MovimientoCaja, Comision, Usuario
+from app.paginas import consulta_pagina
+from app.dashboard_metrics import _agregado_abonos, _agregado_comisiones
+from app.controllers.ventas import ventas_visibles, ORDEN_VENTAS, VENTAS_POR_PAGINA
+from app.controllers.abonos import ventas_pendientes_cliente, ORDEN_ABONOS, ABONOS_POR_PAGINA
+from app.controllers.creditos import creditos_pendientes
+from app.controllers.cajas import consulta_movimientos
+from app.controllers.clientes import clientes_visibles
+from app.controllers.productos import producto_por_codigo, consulta_catalogo
+from app.controllers.reportes import (ventas_del_periodo, ORDEN_COMISIONES,
+                                      COMISIONES_POR_PAGINA, REPORTES_POR_PAGINA)
+from app.exportacion import filtros_comisiones
+from app.reportes_datos import consulta_comisiones
+
+DESDE = datetime(2024, 1, 1)
+HASTA = DESDE + timedelta(days=30)
+
+
+def consultas():
+    """
+    (descripción, consulta, índices aceptados). Las consultas salen de las mismas
+    funciones que usan los controladores, con usuarios y registros sin guardar
+    para elegir la rama de cada rol; requiere el contexto de la aplicación.
+    """
+    admin = Usuario(id=1, rol='administrador')
+    vendedor = Usuario(id=1, rol='vendedor')
+    cobrador = Usuario(id=1, rol='cobrador')
+    venta = Venta(id=1)
+
+    return [
+        ('ventas.index: página por (fecha, id)',
+         consulta_pagina(ventas_visibles(admin), ORDEN_VENTAS, '', VENTAS_POR_PAGINA, descendente=True),
+         {'ix_ventas_fecha_id'}),
+        ('ventas.index: ventas del vendedor',
+         consulta_pagina(ventas_visibles(vendedor), ORDEN_VENTAS, '', VENTAS_POR_PAGINA, descendente=True),
+         {'ix_ventas_vendedor_fecha'}),
+        ('reportes.ventas: detalle del período',
+         consulta_pagina(ventas_del_periodo(DESDE, HASTA), ORDEN_VENTAS, '', REPORTES_POR_PAGINA, descendente=True),
+         {'ix_ventas_fecha_id', 'ix_ventas_credito_pendiente'}),
+        ('creditos.index: créditos con saldo',
+         creditos_pendientes(admin).order_by(Venta.fecha.desc()),
+         {'ix_ventas_credito_pendiente'}),
+        ('abonos.crear: ventas a crédito del cliente',
+         ventas_pendientes_cliente(1, admin),
+         {'ix_ventas_cliente_fecha', 'ix_ventas_credito_pendiente'}),
+        ('ventas.detalle: detalles de la venta',
+         select(Venta.detalles.property.mapper).where(with_parent(venta, Venta.detalles)),
+         {'ix_detalle_ventas_venta_id'}),
+        ('abonos.index: página por (fecha, id)',
+         consulta_pagina(Abono.query, ORDEN_ABONOS, '', ABONOS_POR_PAGINA, descendente=True),
+         {'ix_abonos_fecha_id'}),
+        ('ventas.detalle: abonos de la venta',
+         select(Abono).where(with_parent(venta, Venta.abonos)),
+         {'ix_abonos_venta_id'}),
+        ('dashboard: abonos del mes del cobrador (resumen diario)',
+         select(_agregado_abonos(cobrador, DESDE)),
+         {'resumen_abonos_dia_pkey', 'sqlite_autoindex_resumen_abonos_dia_1'}),
+        ('cajas.movimientos: movimientos de la caja',
+         consulta_movimientos(1, DESDE),
+         {'ix_movimiento_caja_caja_fecha'}),
+        ('ventas.eliminar: movimientos de la venta',
+         MovimientoCaja.query.filter(with_parent(venta, Venta.movimientos_caja)),
+         {'ix_movimiento_caja_venta_id'}),
+        ('reportes.comisiones: comisiones del usuario',
+         consulta_pagina(Comision.query.filter(*filtros_comisiones(DESDE, HASTA, 1)), ORDEN_COMISIONES, '',
+                         COMISIONES_POR_PAGINA),
+         {'ix_comisiones_usuario_fecha'}),
+        ('reportes.comisiones / liquidar_masiva: columnas del usuario para los totales',
+         consulta_comisiones(filtros_comisiones(DESDE, HASTA, 1)),
+         {'ix_comisiones_usuario_fecha'}),
+        ('dashboard: comisiones del período',
+         select(_agregado_comisiones(admin)),
+         {'ix_comisiones_usuario_fecha'}),
+        ('clientes.index: clientes con saldo (cobrador)',
+         clientes_visibles(cobrador),
+         {'ix_clientes_saldo_pendiente_total'}),
+        ('productos.por_codigo: producto por código de barras',
+         producto_por_codigo('P-001'),
+         {'productos_codigo_key', 'sqlite_autoindex_productos_1'}),
+        ('productos.catalogo: catálogo ?since=',
+         consulta_catalogo(DESDE),
+         {'ix_productos_updated_at'}),
+    ]
+
+
+def plan(connection, consulta):
+    """Texto del plan de la consulta (select() o Query del ORM) según el motor"""
+    consulta = getattr(consulta, 'statement', consulta)
+    sql = str(consulta.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    if connection.dialect.name == 'postgresql':
+        filas = connection.exec_driver_sql('EXPLAIN ' + sql).fetchall()
+        return '\n'.join(fila[0] for fila in filas)
+    filas = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    return '\n'.join(str(fila[-1]) for fila in filas)
+
+
+def main():
+    app = create_app()
+    fallas = 0
+
+    with app.app_context():
+        with db.engine.connect() as connection:
+            transaccion = connection.begin()
+            try:
+                if connection.dialect.name == 'postgresql':
+                    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+
+                print(f"Motor: {connection.dialect.name}")
+                for descripcion, consulta, indices in consultas():
+                    texto = plan(connection, consulta)
+                    usados = sorted(i for i in indices if i in texto)
+                    if usados:
+                        print(f"  ✓ {descripcion}: {', '.join(usados)}")
+                    else:
+                        fallas += 1
+                        print(f"  ✗ {descripcion}: no usa {' / '.join(sorted(indices))}")
+                        for linea in texto.splitlines():
+                            print(f"      {linea}")
+            finally:
+                transaccion.rollback()
+
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == '__main__':
+    main()
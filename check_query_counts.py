@@ -0,0 +1,171 @@
+# check_query_counts.py - Presupuesto de consultas SQL por página
+"""
+Uso:
+    python check_query_counts.py
+
+Crea una base SQLite temporal, la llena con dos volúmenes de datos y renderiza
+las páginas de listado como administrador contando las sentencias SQL de cada
+request. Falla (código de salida 1) si una página supera su presupuesto o si
+el número de consultas crece con el volumen de datos, que es la señal de un
+N+1 (una relación lazy recorrida fila por fila en la plantilla).
+
+También envía a POST /api/v1/sync/push lotes de 100 y 1000 cambios (clientes,
+ventas y abonos) y falla si alguno supera su presupuesto o no se aplica completo.
+"""
+import os
+import sys
+import tempfile
+
+_db_tmp = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+_db_tmp.close()
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_tmp.name}'
+
+from app.config import Config
+
+# Las opciones del pool/SSL son de PostgreSQL
+Config.SQLALCHEMY_ENGINE_OPTIONS = {}
+Config.KPI_CACHE_ENABLED = False
+Config.REQUEST_METRICS_LOG = False
+
+from app import create_app, db
+from app.models import Usuario, Cliente, Producto, Venta, DetalleVenta, Abono, Caja
+from app.query_profiles import contar_consultas
+from app.api.sync_data import TEST_TOKEN
+
+# Máximo de consultas por página (incluye cargar el usuario de la sesión)
+PRESUPUESTO = {
+    '/': 4,
+    '/ventas/': 4,
+    '/ventas/?busqueda=cliente': 4,
+    '/abonos/': 4,
+    '/abonos/?busqueda=cliente': 4,
+    '/creditos/': 3,
+    '/clientes/': 3,
+    '/ventas/1': 5,
+    '/clientes/buscar?q=cliente': 2,
+    '/productos/catalogo': 3,
+}
+
+VOLUMENES = [20, 200]
+
+# POST /api/v1/sync/push: máximo de consultas por cantidad de cambios del lote
+PRESUPUESTO_SYNC_PUSH = {100: 25, 1000: 25}
+
+
+def sembrar(hasta):
+    """Agrega clientes con una venta a crédito, su detalle y un abono hasta 'hasta' clientes"""
+    admin = Usuario.query.filter_by(rol='administrador').first()
+    caja = Caja.query.first()
+    if not caja:
+        caja = Caja(nombre='Caja Principal', tipo='efectivo', saldo_inicial=0, saldo_actual=0)
+        db.session.add(caja)
+    producto = Producto.query.first()
+    if not producto:
+        producto = Producto(codigo='P-001', nombre='Producto', precio_venta=1000, stock=10 ** 6)
+        db.session.add(producto)
+    db.session.flush()
+
+    for i in range(Cliente.query.count(), hasta):
+        cliente = Cliente(nombre=f'cliente {i}', cedula=f'{10000000 + i}')
+        db.session.add(cliente)
+        db.session.flush()
+        venta = Venta(cliente_id=cliente.id, vendedor_id=admin.id, total=3000,
+                      tipo='credito', saldo_pendiente=2000, estado='pendiente')
+        db.session.add(venta)
+        db.session.flush()
+        db.session.add(DetalleVenta(venta_id=venta.id, producto_id=producto.id,
+                                    cantidad=3, precio_unitario=1000, subtotal=3000))
+        db.session.add(Abono(venta_id=venta.id, monto=1000, cobrador_id=admin.id, caja_id=caja.id))
+    db.session.commit()
+
+
+def medir(app):
+    cliente_http = app.test_client()
+    with cliente_http.session_transaction() as sesion:
+        sesion['_user_id'] = '1'
+        sesion['_fresh'] = True
+
+    resultados = {}
+    for url in PRESUPUESTO:
+        # Primera visita para calentar las cachés por proceso (configuración)
+        cliente_http.get(url)
+        with app.app_context():
+            with contar_consultas(db.engine) as consultas:
+                respuesta = cliente_http.get(url)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f'{url} respondió {respuesta.status_code}')
+        resultados[url] = consultas['total']
+    return resultados
+
+
+def cambios_sync(cantidad, cliente_id, venta_id):
+    """Cambios CREATE alternando cliente, venta a crédito y abono"""
+    cambios = []
+    for i in range(cantidad):
+        if i % 3 == 0:
+            cambios.append({'type': 'cliente', 'data': {'nombre': f'sync {i}', 'cedula': f'S{cantidad}-{i}'}})
+        elif i % 3 == 1:
+            cambios.append({'type': 'venta', 'data': {'cliente_id': cliente_id, 'total': 3000, 'tipo': 'credito'}})
+        else:
+            cambios.append({'type': 'abono', 'data': {'venta_id': venta_id, 'monto': 100}})
+    return cambios
+
+
+def medir_sync_push(app):
+    cliente_http = app.test_client()
+    with app.app_context():
+        cliente_id = Cliente.query.first().id
+        venta_id = Venta.query.first().id
+
+    resultados = {}
+    for cantidad in PRESUPUESTO_SYNC_PUSH:
+        cambios = cambios_sync(cantidad, cliente_id, venta_id)
+        with app.app_context():
+            with contar_consultas(db.engine) as consultas:
+                respuesta = cliente_http.post('/api/v1/sync/push', json={'changes': cambios},
+                                              headers={'Authorization': f'Bearer {TEST_TOKEN}'})
+        datos = respuesta.get_json()
+        if respuesta.status_code != 200 or datos['processed'] != cantidad or datos['failed']:
+            raise RuntimeError(f'/api/v1/sync/push con {cantidad} cambios respondió {respuesta.status_code}: {datos}')
+        resultados[cantidad] = consultas['total']
+    return resultados
+
+
+def main():
+    app = create_app()
+    mediciones = []
+    try:
+        for volumen in VOLUMENES:
+            with app.app_context():
+                sembrar(volumen)
+            mediciones.append(medir(app))
+        mediciones_push = medir_sync_push(app)
+    finally:
+        os.unlink(_db_tmp.name)
+
+    fallas = 0
+    print(f"{'página':<30} " + ' '.join(f'{v:>8}' for v in VOLUMENES) + f" {'máximo':>8}")
+    for url, maximo in PRESUPUESTO.items():
+        conteos = [m[url] for m in mediciones]
+        estado = 'ok'
+        if max(conteos) > maximo:
+            estado = 'EXCEDE PRESUPUESTO'
+        elif len(set(conteos)) > 1:
+            estado = 'CRECE CON LOS DATOS'
+        if estado != 'ok':
+            fallas += 1
+        print(f"{url:<30} " + ' '.join(f'{c:>8}' for c in conteos) + f" {maximo:>8}  {estado}")
+
+    print()
+    print(f"{'sync/push (cambios)':<30} {'consultas':>8} {'máximo':>8}")
+    for cantidad, maximo in PRESUPUESTO_SYNC_PUSH.items():
+        estado = 'ok' if mediciones_push[cantidad] <= maximo else 'EXCEDE PRESUPUESTO'
+        if estado != 'ok':
+            fallas += 1
+        print(f"{cantidad:<30} {mediciones_push[cantidad]:>8} {maximo:>8}  {estado}")
+
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == '__main__':
+    main()
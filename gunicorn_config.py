@@ -14,3 +14,62 @@ loglevel = 'info'
 
 # Sin preload para evitar problemas
 preload_app = False
+
+# Worker de exportaciones en segundo plano (worker_reportes.py): proceso hijo del
+# master, de modo que no ocupa workers web y sigue vivo cuando estos se reinician.
+# Un hilo del master lo vigila cada TRABAJOS_WORKER_INTERVALO segundos y lo vuelve
+# a iniciar si terminó; si muere apenas arranca, la espera se duplica (hasta 5 min).
+# Desactivar con TRABAJOS_WORKER_EN_GUNICORN=false si se ejecuta como servicio aparte
+# (en ese caso lo debe supervisar el sistema, p. ej. systemd con Restart=always).
+_worker_reportes = None
+_detener_vigilancia = None
+_vigilancia = None
+
+def _iniciar_worker_reportes(server):
+    global _worker_reportes
+    import subprocess
+    import sys
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'worker_reportes.py')
+    _worker_reportes = subprocess.Popen([sys.executable, script])
+    server.log.info(f"Worker de reportes iniciado (pid {_worker_reportes.pid})")
+
+def _vigilar_worker_reportes(server, detener):
+    import time
+    intervalo = float(os.environ.get('TRABAJOS_WORKER_INTERVALO', 10))
+    espera = intervalo
+    inicio = time.monotonic()
+    while not detener.wait(espera):
+        codigo = _worker_reportes.poll()
+        if codigo is None:
+            espera = intervalo
+            continue
+        # Si murió antes de un minuto de iniciado, esperar más antes del siguiente intento
+        espera = min(espera * 2, 300) if time.monotonic() - inicio < 60 else intervalo
+        server.log.warning(f"Worker de reportes terminó (código {codigo}); reiniciando")
+        try:
+            _iniciar_worker_reportes(server)
+            inicio = time.monotonic()
+        except Exception as e:
+            server.log.error(f"No se pudo reiniciar el worker de reportes: {e}")
+
+def when_ready(server):
+    global _detener_vigilancia, _vigilancia
+    if os.environ.get('TRABAJOS_WORKER_EN_GUNICORN', 'True').lower() not in ('true', '1', 't'):
+        return
+    import threading
+    _iniciar_worker_reportes(server)
+    _detener_vigilancia = threading.Event()
+    _vigilancia = threading.Thread(target=_vigilar_worker_reportes, args=(server, _detener_vigilancia),
+                                   name='vigilancia-worker-reportes', daemon=True)
+    _vigilancia.start()
+
+def on_exit(server):
+    if _detener_vigilancia is not None:
+        _detener_vigilancia.set()
+        _vigilancia.join(timeout=30)
+    if _worker_reportes and _worker_reportes.poll() is None:
+        _worker_reportes.terminate()
+        try:
+            _worker_reportes.wait(timeout=30)
+        except Exception:
+            _worker_reportes.kill()
@@ -0,0 +1,45 @@
+# reconciliar_saldos.py - Verifica los saldos pendientes guardados
+"""
+Uso:
+    python reconciliar_saldos.py             # solo reporta diferencias
+    python reconciliar_saldos.py --corregir  # además las corrige
+
+Compara, con una consulta por tabla:
+- clientes.saldo_pendiente_total contra la suma de saldos de sus ventas a crédito
+- creditos.saldo_pendiente contra el monto menos la suma de sus abonos
+
+Sale con código 1 si encontró diferencias y no se pidió corregirlas.
+"""
+import sys
+
+from app import create_app, db
+from app.saldos import reconciliar_saldos, reconciliar_saldos_creditos
+
+app = create_app()
+
+with app.app_context():
+    corregir = '--corregir' in sys.argv[1:]
+    print("== RECONCILIANDO SALDOS PENDIENTES ==")
+
+    try:
+        diferencias_clientes = reconciliar_saldos(corregir=corregir)
+        diferencias_creditos = reconciliar_saldos_creditos(corregir=corregir)
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR: {e}")
+        sys.exit(2)
+
+    for cliente_id, nombre, guardado, real in diferencias_clientes:
+        print(f"  ✗ Cliente #{cliente_id} {nombre}: guardado {guardado:,} / real {real:,} (diferencia {guardado - real:+,})")
+
+    for credito_id, cliente_id, guardado, real in diferencias_creditos:
+        print(f"  ✗ Crédito #{credito_id} (cliente #{cliente_id}): guardado {guardado:,} / real {real:,} (diferencia {guardado - real:+,})")
+
+    total = len(diferencias_clientes) + len(diferencias_creditos)
+    if not total:
+        print("¡Todos los saldos coinciden!")
+    elif corregir:
+        print(f"✓ {len(diferencias_clientes)} clientes y {len(diferencias_creditos)} créditos corregidos")
+    else:
+        print(f"{total} saldos con diferencias (use --corregir para recalcularlos)")
+        sys.exit(1)
@@ -0,0 +1,41 @@
+# reconstruir_resumenes.py - Reconstruye los resúmenes diarios de reportes
+"""
+Uso:
+    python reconstruir_resumenes.py                                   # todos los días
+    python reconstruir_resumenes.py --desde 2024-01-01 --hasta 2024-03-31
+
+Recalcula resumen_ventas_dia, resumen_abonos_dia y resumen_movimientos_dia a
+partir de ventas, abonos y movimientos de caja (ver app/resumenes.py). Sirve
+para poblarlos la primera vez, después de cargas masivas por SQL o si se
+sospecha de alguna diferencia. Fechas inclusive, en formato YYYY-MM-DD.
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from app import create_app, db
+from app.resumenes import recalcular_resumenes
+
+def _fecha(valor):
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+parser = argparse.ArgumentParser(description='Reconstruye los resúmenes diarios de reportes')
+parser.add_argument('--desde', type=_fecha, help='Primer día a reconstruir (YYYY-MM-DD)')
+parser.add_argument('--hasta', type=_fecha, help='Último día a reconstruir (YYYY-MM-DD)')
+args = parser.parse_args()
+
+app = create_app()
+
+with app.app_context():
+    print("== RECONSTRUYENDO RESÚMENES DIARIOS ==")
+
+    try:
+        filas = recalcular_resumenes(desde=args.desde, hasta=args.hasta)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR: {e}")
+        sys.exit(2)
+
+    rango = f"{args.desde or 'inicio'} a {args.hasta or 'hoy'}"
+    print(f"✓ {filas} filas de resumen escritas ({rango})")
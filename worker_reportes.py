@@ -0,0 +1,79 @@
+# worker_reportes.py - Procesa las exportaciones de reportes encoladas
+"""
+Uso:
+    python worker_reportes.py             # procesa trabajos hasta recibir SIGTERM/SIGINT
+    python worker_reportes.py --una-vez   # procesa los pendientes y termina
+
+Toma los TrabajoReporte pendientes de la base de datos (ver app/trabajos.py),
+genera el archivo en TRABAJOS_DIR y los marca completados o con error. Cada
+TRABAJOS_INTERVALO segundos consulta si hay nuevos y, cada minuto, reencola los
+abandonados por un worker que murió y elimina los trabajos y archivos vencidos.
+
+gunicorn lo inicia junto al servidor (gunicorn_config.py); también se puede
+ejecutar como proceso aparte en el mismo servidor.
+"""
+import signal
+import sys
+import time
+
+from app import create_app, db
+from app.trabajos import tomar_siguiente, ejecutar, recuperar_abandonados, limpiar_antiguos
+
+# Segundos entre tareas de mantenimiento
+MANTENIMIENTO_CADA = 60
+
+detener = False
+
+def _senal(signum, frame):
+    global detener
+    detener = True
+
+def mantenimiento(app):
+    try:
+        reencolados = recuperar_abandonados()
+        eliminados = limpiar_antiguos()
+        if reencolados or eliminados:
+            app.logger.info(f"Trabajos reencolados: {reencolados}, eliminados: {eliminados}")
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error en mantenimiento de trabajos: {e}")
+
+def main():
+    una_vez = '--una-vez' in sys.argv[1:]
+    signal.signal(signal.SIGTERM, _senal)
+    signal.signal(signal.SIGINT, _senal)
+
+    app = create_app()
+    with app.app_context():
+        intervalo = app.config['TRABAJOS_INTERVALO']
+        app.logger.info("Worker de reportes iniciado")
+        mantenimiento(app)
+        ultimo_mantenimiento = time.monotonic()
+
+        while not detener:
+            try:
+                trabajo = tomar_siguiente()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Error tomando trabajo de reporte: {e}")
+                trabajo = None
+
+            if trabajo:
+                inicio = time.monotonic()
+                ejecutar(trabajo)
+                app.logger.info(f"Trabajo de reporte #{trabajo.id} {trabajo.estado} "
+                                f"en {time.monotonic() - inicio:.1f} s")
+                continue
+
+            if una_vez:
+                break
+            if time.monotonic() - ultimo_mantenimiento >= MANTENIMIENTO_CADA:
+                mantenimiento(app)
+                ultimo_mantenimiento = time.monotonic()
+            time.sleep(intervalo)
+
+        db.session.remove()
+        app.logger.info("Worker de reportes detenido")
+
+if __name__ == '__main__':
+    main()